@@ -1,44 +1,159 @@
+"""
+Authentication — verifies Supabase access tokens.
+
+Tokens are checked locally: HS256 tokens against SUPABASE_JWT_SECRET, and
+asymmetric ones (RS256/ES256) against the project's JWKS, which is fetched
+once and cached. Verified users are cached by token hash until the token
+expires, so repeat requests skip verification entirely. AUTH_MODE=remote
+keeps the old round trip to Supabase's /auth/v1/user, over one pooled client.
+"""
+
+import asyncio
+import hashlib
+import time
+
+import httpx
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import httpx
+from jose import JWTError, jwt
+
+from app.core.cache import TTLCache
 from app.core.config import get_settings
 
 security = HTTPBearer()
 
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256"}
+JWKS_REFRESH_SECONDS = 60  # at most one refetch per minute when an unknown key id shows up
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-) -> dict:
-    """Verify the Supabase JWT by calling Supabase's auth API."""
+_http_client: httpx.AsyncClient | None = None
+_user_cache: TTLCache | None = None
+_jwks: dict[str, dict] = {}
+_jwks_fetched_at = 0.0
+_jwks_lock = asyncio.Lock()
+
+
+def _unauthorized() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired token",
+    )
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=10.0, limits=httpx.Limits(max_keepalive_connections=20))
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _get_user_cache() -> TTLCache:
+    global _user_cache
+    if _user_cache is None:
+        settings = get_settings()
+        _user_cache = TTLCache(settings.auth_cache_entries, settings.auth_cache_ttl_seconds)
+    return _user_cache
+
+
+async def _get_jwk(kid: str | None) -> dict:
+    """Return the signing key `kid` from the project's JWKS, refetching it if the key is unknown."""
+    global _jwks, _jwks_fetched_at
+    if kid in _jwks:
+        return _jwks[kid]
+
+    async with _jwks_lock:
+        if kid not in _jwks and time.monotonic() - _jwks_fetched_at > JWKS_REFRESH_SECONDS:
+            settings = get_settings()
+            response = await _get_http_client().get(f"{settings.supabase_url}/auth/v1/.well-known/jwks.json")
+            _jwks_fetched_at = time.monotonic()
+            if response.status_code == 200:
+                _jwks = {key.get("kid"): key for key in response.json().get("keys", [])}
+
+    if kid not in _jwks:
+        raise _unauthorized()
+    return _jwks[kid]
+
+
+async def _verify_local(token: str) -> tuple[dict, float]:
+    """Verify the token's signature and claims; return the user and its expiry timestamp."""
     settings = get_settings()
+    try:
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
+        if algorithm == "HS256" and settings.supabase_jwt_secret:
+            key = settings.supabase_jwt_secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            key = await _get_jwk(header.get("kid"))
+        else:
+            raise _unauthorized()
+        claims = jwt.decode(token, key, algorithms=[algorithm], audience=settings.supabase_jwt_audience)
+    except JWTError:
+        raise _unauthorized()
 
-    print(f"[AUTH DEBUG] Supabase URL: {settings.supabase_url}")
-    print(f"[AUTH DEBUG] Anon key starts with: {settings.supabase_anon_key[:20]}...")
-    print(f"[AUTH DEBUG] Token starts with: {credentials.credentials[:20]}...")
+    if not claims.get("sub") or "exp" not in claims:
+        raise _unauthorized()
+    return {"sub": claims["sub"], "email": claims.get("email", "")}, float(claims["exp"])
 
-    if not settings.supabase_url:
-        return {"sub": "dev-user", "email": "dev@localhost"}
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{settings.supabase_url}/auth/v1/user",
-            headers={
-                "Authorization": f"Bearer {credentials.credentials}",
-                "apikey": settings.supabase_anon_key,
-            },
-        )
+def _unverified_expiry(token: str) -> float | None:
+    """The token's exp claim without checking the signature (Supabase has vouched for it), or None."""
+    try:
+        return float(jwt.get_unverified_claims(token)["exp"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
 
-    print(f"[AUTH DEBUG] Supabase response status: {response.status_code}")
-    print(f"[AUTH DEBUG] Supabase response body: {response.text[:200]}")
 
+async def _verify_remote(token: str) -> dict:
+    """Ask Supabase's auth API who the token belongs to."""
+    settings = get_settings()
+    response = await _get_http_client().get(
+        f"{settings.supabase_url}/auth/v1/user",
+        headers={
+            "Authorization": f"Bearer {token}",
+            "apikey": settings.supabase_anon_key,
+        },
+    )
     if response.status_code != 200:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-        )
+        raise _unauthorized()
 
     user_data = response.json()
     return {
         "sub": user_data.get("id", ""),
         "email": user_data.get("email", ""),
-    }
\ No newline at end of file
+    }
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> dict:
+    """Verify the Supabase JWT, locally by default."""
+    settings = get_settings()
+
+    if not settings.supabase_url:
+        return {"sub": "dev-user", "email": "dev@localhost"}
+
+    token = credentials.credentials
+    cache = _get_user_cache()
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    user = cache.get(cache_key)
+    if user is not None:
+        return user
+
+    if settings.auth_mode == "remote":
+        user = await _verify_remote(token)
+        expires_at = _unverified_expiry(token)
+        if expires_at is None:
+            return user  # no exp to bound the cache entry by
+    else:
+        user, expires_at = await _verify_local(token)
+    # Never cache a user past the token's exp
+    ttl = min(settings.auth_cache_ttl_seconds, expires_at - time.time())
+    if ttl > 0:
+        cache.set(cache_key, user, ttl=ttl)
+    return user
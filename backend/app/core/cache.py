@@ -0,0 +1,37 @@
+"""
+In-process caching helpers.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any
+
+
+class TTLCache:
+    """A small LRU whose entries also expire after `ttl` seconds. Not shared between workers."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._max_entries = max_entries
+        self._ttl = ttl
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        """Store `value`; `ttl` overrides the default lifetime for this entry."""
+        self._entries[key] = (time.monotonic() + (self._ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Literal
 
 
 class Settings(BaseSettings):
@@ -8,6 +9,65 @@ class Settings(BaseSettings):
     supabase_jwt_secret: str = ""
     supabase_anon_key: str = ""
     anthropic_api_key: str = ""
+    anthropic_base_url: str = ""  # override to point at a local stub server
+
+    # Database
+    db_echo: bool = False  # log every statement (development only)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout_seconds: float = 30.0
+    db_statement_cache_size: int = 100  # prepared statements cached per connection; 0 behind pgbouncer
+    sql_instrumentation: bool = True  # per-request query count / DB time headers and logs
+    sql_n_plus_one_threshold: int = 30  # warn when one request issues more statements than this
+    metrics_enabled: bool = True  # Prometheus /metrics and request latency histograms
+
+    # Auth
+    auth_mode: str = "local"  # local (verify JWTs in-process) | remote (ask Supabase per token)
+    supabase_jwt_audience: str = "authenticated"
+    auth_cache_ttl_seconds: int = 300  # upper bound; entries never outlive the token's exp
+    auth_cache_entries: int = 10000
+
+    # Ingestion
+    upload_dir: str = "uploads"
+    max_upload_mb: int = 200
+    ingest_max_workers: int = 2
+    ingest_max_attempts: int = 3
+    ingest_poll_seconds: float = 5.0
+    ingest_lease_seconds: int = 120
+    extract_workers: int = 4  # processes extracting page ranges of one long PDF (1 = extract in-line)
+    extract_shard_pages: int = 32  # pages per extraction task; shorter PDFs are extracted in-line
+    chunk_snap: Literal["", "sentence", "slide"] = ""  # "" = fixed token windows; else end chunks at a break
+
+    # Embeddings & retrieval
+    # Checked here, at startup: ingestion workers would report a bad value as an unreadable PDF
+    embedding_backend: Literal["hashing", "sentence-transformers"] = "hashing"
+    embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    retrieval_top_k: int = 12
+    retrieval_token_budget: int = 6000
+
+    # Generation
+    generation_batch_tokens: int = 50000  # max lecture-material tokens per LLM call
+    generation_concurrency: int = 4  # concurrent batch calls per generation
+
+    # Bulk generation (all documents of a subject)
+    bulk_generation_concurrency: int = 4  # default documents in flight per job
+    bulk_generation_max_concurrency: int = 16  # cap on what a job may ask for
+    bulk_generation_max_jobs: int = 2  # jobs run at once per worker
+    bulk_generation_max_attempts: int = 3  # per document, and per job claim
+    bulk_generation_poll_seconds: float = 5.0
+    bulk_generation_lease_seconds: int = 120
+
+    # Generation cache
+    generation_cache_ttl_seconds: int = 7 * 24 * 3600  # Postgres tier
+    generation_cache_memory_ttl_seconds: int = 3600  # in-process LRU tier
+    generation_cache_memory_entries: int = 256
+
+    # Anthropic client
+    llm_max_concurrency: int = 16  # in-flight LLM calls per worker; also the connection pool size
+    llm_max_retries: int = 4  # retries on 429 / 529 / connection errors
+    llm_backoff_base_seconds: float = 0.5
+    llm_backoff_max_seconds: float = 20.0
+    llm_timeout_seconds: float = 120.0
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
@@ -1,11 +1,31 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import get_settings
+from app.core.instrumentation import instrument_engine
+
+settings = get_settings()
+
+engine_options = {}
+if settings.database_url.startswith("postgresql+asyncpg"):
+    # asyncpg's own statement cache and SQLAlchemy's prepared-statement cache; set both to 0 behind pgbouncer
+    engine_options["connect_args"] = {
+        "statement_cache_size": settings.db_statement_cache_size,
+        "prepared_statement_cache_size": settings.db_statement_cache_size,
+    }
+    engine_options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_pre_ping=True,
+    )
 
 engine = create_async_engine(
-    get_settings().database_url,
-    echo=True,
+    settings.database_url,
+    echo=settings.db_echo,
+    **engine_options,
 )
+if settings.sql_instrumentation:
+    instrument_engine(engine)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
 
@@ -15,4 +35,4 @@ class Base(DeclarativeBase):
 
 async def get_db() -> AsyncSession:
     async with async_session() as session:
-        yield session
\ No newline at end of file
+        yield session
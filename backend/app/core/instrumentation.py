@@ -0,0 +1,141 @@
+"""
+Per-request SQL instrumentation.
+
+Engine events time every statement and add it to the stats of the HTTP
+request that issued it (tracked in a context variable set by
+SQLInstrumentationMiddleware). Each response carries the query count and
+total database time as headers (including Server-Timing, which browser dev
+tools display), and requests that issue more than SQL_N_PLUS_ONE_THRESHOLD
+statements are logged with the statement they repeated most — the usual
+sign of an N+1 pattern. Work outside a request (the ingestion and bulk
+generation queues) is not tracked: tasks copy the context they are created
+in, so a job submitted from a request calls untrack() before doing any work.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_LOG_CHARS = 300
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_statement: str | None = None
+    statements: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] += 1
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+
+_current_stats: ContextVar[QueryStats | None] = ContextVar("sql_query_stats", default=None)
+
+
+def current_stats() -> QueryStats | None:
+    return _current_stats.get()
+
+
+def untrack() -> None:
+    """Stop adding this task's queries to the request it was started from."""
+    _current_stats.set(None)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Attach the timing listeners to `engine`."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, 1000 * (time.perf_counter() - started))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+class SQLInstrumentationMiddleware:
+    """Track the queries of each HTTP request; report them in headers and the log."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Streaming responses may query after this point; the log line has the final numbers
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Queries"] = str(stats.count)
+                headers["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+                headers["X-DB-Slowest-Ms"] = f"{stats.slowest_ms:.1f}"
+                headers.append("Server-Timing", f"db;dur={stats.total_ms:.1f};desc=\"{stats.count} queries\"")
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                _report(scope, stats, 1000 * (time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+
+
+def _report(scope: Scope, stats: QueryStats, request_ms: float) -> None:
+    if stats.count == 0:
+        return
+    route = f"{scope['method']} {scope['path']}"
+    fields = {
+        "route": route,
+        "db_queries": stats.count,
+        "db_ms": round(stats.total_ms, 1),
+        "db_slowest_ms": round(stats.slowest_ms, 1),
+        "request_ms": round(request_ms, 1),
+    }
+    threshold = get_settings().sql_n_plus_one_threshold
+    if stats.count > threshold:
+        statement, repeats = stats.statements.most_common(1)[0]
+        logger.warning(
+            "Possible N+1: %s issued %d queries (threshold %d); repeated %d times: %s",
+            route, stats.count, threshold, repeats, statement[:STATEMENT_LOG_CHARS],
+            extra={**fields, "db_repeated_statement": statement[:STATEMENT_LOG_CHARS]},
+        )
+    else:
+        logger.info(
+            "%s: %d queries in %.1f ms (slowest %.1f ms: %s)",
+            route, stats.count, stats.total_ms, stats.slowest_ms, (stats.slowest_statement or "")[:STATEMENT_LOG_CHARS],
+            extra=fields,
+        )
@@ -0,0 +1,122 @@
+"""
+Prometheus metrics, served in text format at /metrics.
+
+HTTP latency is labelled by route template (not raw path) to keep series
+bounded. Ingestion stage timings are measured inside the worker process and
+reported back with the job result; LLM latency and token usage come from
+ai_service, labelled by generation kind. Metrics live in the process-local
+default registry, so with several uvicorn workers each one is scraped (or
+aggregated) separately.
+"""
+
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+INGEST_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "studymate_http_request_duration_seconds",
+    "HTTP request latency until the response body is complete.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("studymate_http_requests_in_flight", "HTTP requests currently being served.")
+
+INGEST_STAGE_SECONDS = Histogram(
+    "studymate_ingest_stage_seconds",
+    "Time spent in each ingestion stage per job.",
+    ["stage"],  # read | extract | tokenize | embed | persist
+    buckets=INGEST_BUCKETS,
+)
+INGEST_JOBS_FINISHED = Counter(
+    "studymate_ingest_jobs_finished_total", "Ingestion jobs that reached a final state.", ["status"]
+)
+INGEST_JOBS = Gauge("studymate_ingest_jobs", "Queued and running ingestion jobs, sampled at scrape time.", ["status"])
+
+BULK_GENERATION_JOBS = Gauge(
+    "studymate_bulk_generation_jobs", "Queued and running bulk generation jobs, sampled at scrape time.", ["status"]
+)
+BULK_GENERATION_DOCUMENTS = Counter(
+    "studymate_bulk_generation_documents_total", "Documents finished by bulk generation jobs.", ["status"]
+)  # done | skipped | error
+
+GENERATION_CACHE_LOOKUPS = Counter(
+    "studymate_generation_cache_lookups_total", "Generation cache lookups by outcome.", ["result"]
+)  # memory_hit | db_hit | miss | bypass
+GENERATION_CACHE_ENTRIES = Gauge(
+    "studymate_generation_cache_memory_entries", "Entries in this worker's in-process generation cache."
+)
+
+LLM_REQUEST_SECONDS = Histogram(
+    "studymate_llm_request_duration_seconds",
+    "Anthropic call latency, including retries.",
+    ["kind", "mode"],  # mode: complete | stream
+    buckets=LLM_BUCKETS,
+)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "studymate_llm_first_token_seconds",
+    "Time to the first streamed text delta.",
+    ["kind"],
+    buckets=LLM_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "studymate_llm_tokens_total",
+    "Tokens reported in the Anthropic usage field.",
+    ["kind", "direction"],  # direction: input | output | cache_read | cache_write
+)
+LLM_RETRIES = Counter("studymate_llm_retries_total", "Anthropic calls retried after 429/529/connection errors.")
+LLM_CONTINUATIONS = Counter(
+    "studymate_llm_continuations_total", "Extra calls made to continue a JSON reply cut off at max_tokens.", ["kind"]
+)
+LLM_SALVAGED_ITEMS = Counter(
+    "studymate_llm_salvaged_items_total", "Complete items kept from JSON replies cut off at max_tokens.", ["kind"]
+)
+
+
+def observe_llm_usage(kind: str, usage) -> None:
+    """Count the tokens from a Message.usage object."""
+    if usage is None:
+        return
+    LLM_TOKENS.labels(kind, "input").inc(usage.input_tokens or 0)
+    LLM_TOKENS.labels(kind, "output").inc(usage.output_tokens or 0)
+    LLM_TOKENS.labels(kind, "cache_read").inc(getattr(usage, "cache_read_input_tokens", None) or 0)
+    LLM_TOKENS.labels(kind, "cache_write").inc(getattr(usage, "cache_creation_input_tokens", None) or 0)
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Record in-flight requests and per-route latency."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], route.path if route is not None else "unmatched", str(status)
+            ).observe(time.perf_counter() - started)
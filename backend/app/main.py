@@ -1,12 +1,45 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import func, select
+
+from app.core import auth
+from app.core.config import get_settings
+from app.core.database import async_session
+from app.core.instrumentation import SQLInstrumentationMiddleware
+from app.core import metrics
+from app.models.models import BulkGenerationJob, IngestionJob
+from app.routers import documents, generation, flashcards, quizzes, analytics
+from app.services import ai_service
+from app.services.bulk_generation import bulk_generation_queue
+from app.services.embeddings import get_embedder
+from app.services.generation_cache import generation_cache
+from app.services.ingestion import ingestion_queue
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ai_service.init_client()
+    # Fail here on an unusable embedding model, not in every ingestion job (the API embeds queries too)
+    await asyncio.to_thread(get_embedder)
+    await ingestion_queue.start()
+    await bulk_generation_queue.start()
+    yield
+    await bulk_generation_queue.stop()
+    await ingestion_queue.stop()
+    await ai_service.close_client()
+    await auth.close_http_client()
 
-from app.routers import documents, generation, flashcards, quizzes
 
 app = FastAPI(
     title="StudyMate API",
     description="AI Study Companion — backend API",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS — allow frontend dev server
@@ -16,15 +49,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-DB-Queries", "X-DB-Time-Ms", "X-DB-Slowest-Ms", "Server-Timing"],
 )
 
+if get_settings().sql_instrumentation:
+    app.add_middleware(SQLInstrumentationMiddleware)
+if get_settings().metrics_enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Mount routers under /api prefix
 app.include_router(documents.router, prefix="/api")
 app.include_router(generation.router, prefix="/api")
 app.include_router(flashcards.router, prefix="/api")
 app.include_router(quizzes.router, prefix="/api")
+app.include_router(analytics.router, prefix="/api")
 
 
 @app.get("/api/health")
 async def health():
     return {"status": "ok", "service": "studymate"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition; queued and running job counts are sampled from the database on each scrape."""
+    async with async_session() as db:
+        for model, gauge in ((IngestionJob, metrics.INGEST_JOBS), (BulkGenerationJob, metrics.BULK_GENERATION_JOBS)):
+            result = await db.execute(
+                select(model.status, func.count())
+                .where(model.status.in_(("queued", "running")))
+                .group_by(model.status)
+            )
+            counts = dict(result.all())
+            for status in ("queued", "running"):
+                gauge.labels(status).set(counts.get(status, 0))
+    metrics.GENERATION_CACHE_ENTRIES.set(generation_cache.memory_entries)
+
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
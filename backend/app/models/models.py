@@ -1,6 +1,6 @@
 import uuid
-from datetime import datetime, timezone
-from sqlalchemy import String, Text, Integer, Float, DateTime, ForeignKey, JSON
+from datetime import date, datetime, timezone
+from sqlalchemy import BigInteger, Boolean, String, Text, Integer, Float, Date, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from pgvector.sqlalchemy import Vector
 from app.core.database import Base
@@ -16,6 +16,7 @@ def new_id() -> str:
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (Index("ix_documents_user_created", "user_id", "created_at", "id"),)  # keyset pagination
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
     user_id: Mapped[str] = mapped_column(String(255), index=True)
@@ -24,24 +25,57 @@ class Document(Base):
     page_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
     chunk_count: Mapped[int] = mapped_column(Integer, default=0)
     status: Mapped[str] = mapped_column(String(20), default="processing")  # processing | ready | error
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)  # sha256 of the PDF
+    chunk_set_id: Mapped[str | None] = mapped_column(
+        ForeignKey("chunk_sets.id", ondelete="SET NULL"), nullable=True, index=True
+    )
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
 
-    chunks: Mapped[list["DocumentChunk"]] = relationship(back_populates="document", cascade="all, delete-orphan")
+    chunk_set: Mapped["ChunkSet | None"] = relationship(back_populates="documents")
     flashcards: Mapped[list["Flashcard"]] = relationship(back_populates="document", cascade="all, delete-orphan")
     quizzes: Mapped[list["Quiz"]] = relationship(back_populates="document", cascade="all, delete-orphan")
     study_guides: Mapped[list["StudyGuide"]] = relationship(back_populates="document", cascade="all, delete-orphan")
 
 
+class ChunkSet(Base):
+    """Extracted chunks for one unique PDF, shared by every Document uploaded with the same content."""
+
+    __tablename__ = "chunk_sets"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
+    content_hash: Mapped[str] = mapped_column(String(64), unique=True)  # sha256 of the PDF
+    page_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    chunk_count: Mapped[int] = mapped_column(Integer, default=0)
+    status: Mapped[str] = mapped_column(String(20), default="processing")  # processing | ready | error
+    ref_count: Mapped[int] = mapped_column(Integer, default=0)  # number of Documents using this set
+    page_hashes: Mapped[list | None] = mapped_column(JSON, nullable=True)  # per page, see services/revisions.py
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+
+    documents: Mapped[list["Document"]] = relationship(back_populates="chunk_set")
+    chunks: Mapped[list["DocumentChunk"]] = relationship(back_populates="chunk_set", cascade="all, delete-orphan")
+
+
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        Index(
+            "ix_document_chunks_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
-    document_id: Mapped[str] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"))
+    chunk_set_id: Mapped[str] = mapped_column(ForeignKey("chunk_sets.id", ondelete="CASCADE"), index=True)
     chunk_index: Mapped[int] = mapped_column(Integer)
     content: Mapped[str] = mapped_column(Text)
-    embedding = mapped_column(Vector(1536), nullable=True)  # OpenAI ada-002 / Claude embedding size
+    page_start: Mapped[int | None] = mapped_column(Integer, nullable=True)  # 1-based source pages, for citations
+    page_end: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    embedding = mapped_column(Vector(1536), nullable=True)  # see services/embeddings.py (zero-padded to 1536)
 
-    document: Mapped["Document"] = relationship(back_populates="chunks")
+    chunk_set: Mapped["ChunkSet"] = relationship(back_populates="chunks")
 
 
 class StudyGuide(Base):
@@ -58,6 +92,11 @@ class StudyGuide(Base):
 
 class Flashcard(Base):
     __tablename__ = "flashcards"
+    __table_args__ = (
+        Index("ix_flashcards_user_next_review", "user_id", "next_review", "id"),  # pagination and the review queue
+        Index("ix_flashcards_user_document_next_review", "user_id", "document_id", "next_review", "id"),
+        Index("ix_flashcards_user_topic_next_review", "user_id", "topic", "next_review", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
     document_id: Mapped[str] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"))
@@ -78,6 +117,7 @@ class Flashcard(Base):
 
 class Quiz(Base):
     __tablename__ = "quizzes"
+    __table_args__ = (Index("ix_quizzes_user_created", "user_id", "created_at", "id"),)  # keyset pagination
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
     document_id: Mapped[str] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"))
@@ -102,3 +142,123 @@ class QuizAttempt(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
 
     quiz: Mapped["Quiz"] = relationship(back_populates="attempts")
+
+
+class TopicStat(Base):
+    """Running per-topic totals for a user, updated as quizzes and flashcard reviews come in."""
+
+    __tablename__ = "topic_stats"
+
+    user_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    topic: Mapped[str] = mapped_column(String(255), primary_key=True)
+    quiz_correct: Mapped[int] = mapped_column(Integer, default=0)
+    quiz_total: Mapped[int] = mapped_column(Integer, default=0)
+    card_correct: Mapped[int] = mapped_column(Integer, default=0)  # reviews rated 3 or better
+    card_total: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+
+
+class DailyStat(Base):
+    """Per-day totals for a user (UTC days), for accuracy over time."""
+
+    __tablename__ = "daily_stats"
+
+    user_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    quiz_correct: Mapped[int] = mapped_column(Integer, default=0)
+    quiz_total: Mapped[int] = mapped_column(Integer, default=0)
+    card_correct: Mapped[int] = mapped_column(Integer, default=0)
+    card_total: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class CollectionVersion(Base):
+    """Per-user change counter for what a list endpoint returns, see services/collection_versions.py."""
+
+    __tablename__ = "collection_versions"
+
+    user_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    collection: Mapped[str] = mapped_column(String(20), primary_key=True)  # documents | flashcards | quizzes
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
+    # NULL once a failed replacement's set has been dropped; the job stays reachable via document_id
+    chunk_set_id: Mapped[str | None] = mapped_column(
+        ForeignKey("chunk_sets.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    user_id: Mapped[str] = mapped_column(String(255), index=True)  # uploader who triggered the ingest
+    file_path: Mapped[str] = mapped_column(String(1000))
+    # Set for "replace document" jobs: the document to move onto this set, and the set it is replacing
+    document_id: Mapped[str | None] = mapped_column(
+        ForeignKey("documents.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    base_chunk_set_id: Mapped[str | None] = mapped_column(
+        ForeignKey("chunk_sets.id", ondelete="SET NULL"), nullable=True
+    )
+    result: Mapped[dict | None] = mapped_column(JSON, nullable=True)  # replace jobs: what changed, see revisions.py
+    status: Mapped[str] = mapped_column(String(20), default="queued", index=True)  # queued | running | done | error
+    stage: Mapped[str | None] = mapped_column(String(20), nullable=True)  # extracting | persisting
+    progress: Mapped[float] = mapped_column(Float, default=0.0)  # 0.0 - 1.0
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+
+
+class BulkGenerationJob(Base):
+    """Pre-generating material for every ready document of one subject, see services/bulk_generation.py."""
+
+    __tablename__ = "bulk_generation_jobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
+    user_id: Mapped[str] = mapped_column(String(255), index=True)
+    subject: Mapped[str] = mapped_column(String(255))
+    kinds: Mapped[list] = mapped_column(JSON)  # any of study_guide | flashcards | quiz
+    flashcard_count: Mapped[int] = mapped_column(Integer, default=20)
+    question_count: Mapped[int] = mapped_column(Integer, default=10)
+    concurrency: Mapped[int] = mapped_column(Integer, default=4)  # documents generated at a time
+    refresh: Mapped[bool] = mapped_column(Boolean, default=False)  # regenerate even if current material exists
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    # queued | running | done | error | cancelled
+    status: Mapped[str] = mapped_column(String(20), default="queued", index=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)  # claims since a document last finished
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)  # of the current run
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+
+    items: Mapped[list["BulkGenerationItem"]] = relationship(cascade="all, delete-orphan")
+
+
+class BulkGenerationItem(Base):
+    """One document of a bulk generation job; its status is the job's checkpoint."""
+
+    __tablename__ = "bulk_generation_items"
+    __table_args__ = (Index("ix_bulk_generation_items_job_status", "job_id", "status"),)
+
+    job_id: Mapped[str] = mapped_column(ForeignKey("bulk_generation_jobs.id", ondelete="CASCADE"), primary_key=True)
+    document_id: Mapped[str] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    position: Mapped[int] = mapped_column(Integer, default=0)  # processing order
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending | done | skipped | error
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    usage: Mapped[dict | None] = mapped_column(JSON, nullable=True)  # LLM tokens, see ai_service.Usage
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)  # sha256, see services/generation_cache.py
+    kind: Mapped[str] = mapped_column(String(20))  # study_guide | flashcards | quiz
+    model: Mapped[str] = mapped_column(String(100))
+    result: Mapped[dict] = mapped_column(JSON)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
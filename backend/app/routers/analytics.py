@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.core.database import get_db
+from app.core.auth import get_current_user
+from app.models.models import DailyStat, TopicStat, utcnow
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+def _accuracy(correct: int, total: int) -> float | None:
+    return round(100 * correct / total, 1) if total else None
+
+
+@router.get("")
+async def get_analytics(
+    days: int = Query(30, ge=1, le=365),
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Per-topic accuracy (weakest first) and daily accuracy over the last `days` days, from the aggregates."""
+    topic_rows = (await db.execute(select(TopicStat).where(TopicStat.user_id == user["sub"]))).scalars().all()
+    topics = []
+    for t in topic_rows:
+        correct, total = t.quiz_correct + t.card_correct, t.quiz_total + t.card_total
+        topics.append({
+            "topic": t.topic,
+            "correct": correct,
+            "total": total,
+            "accuracy": _accuracy(correct, total),
+            "quiz_accuracy": _accuracy(t.quiz_correct, t.quiz_total),
+            "card_accuracy": _accuracy(t.card_correct, t.card_total),
+        })
+    topics.sort(key=lambda t: (t["accuracy"] if t["accuracy"] is not None else 101, -t["total"]))
+
+    since = utcnow().date() - timedelta(days=days - 1)
+    day_rows = (
+        await db.execute(
+            select(DailyStat)
+            .where(DailyStat.user_id == user["sub"], DailyStat.day >= since)
+            .order_by(DailyStat.day)
+        )
+    ).scalars().all()
+
+    return {
+        "topics": topics,
+        "over_time": [
+            {
+                "date": d.day.isoformat(),
+                "accuracy": _accuracy(d.quiz_correct + d.card_correct, d.quiz_total + d.card_total),
+                "reviews": d.card_total,
+                "questions": d.quiz_total,
+            }
+            for d in day_rows
+        ],
+    }
@@ -1,57 +1,87 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+import asyncio
+import hashlib
+import os
+
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-import fitz  # PyMuPDF
-import tiktoken
+from sqlalchemy import select, delete, or_
 
+from app.core.config import get_settings
 from app.core.database import get_db
 from app.core.auth import get_current_user
-from app.models.models import Document, DocumentChunk
+from app.models.models import ChunkSet, Document, DocumentChunk, IngestionJob, new_id
+from app.services.chunk_store import acquire_chunk_set, release_chunk_set, retain_chunk_set
+from app.services.collection_versions import DOCUMENTS, FLASHCARDS, QUIZZES, bump_versions, not_modified
+from app.services.ingestion import ingestion_queue
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, fetch_page
+from app.services.retrieval import retrieve_chunks
+from app.services.revisions import OldChunk, find_affected, plan_revision
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
-# Chunking config
-CHUNK_SIZE = 500  # tokens
-CHUNK_OVERLAP = 50  # tokens
+
+UPLOAD_READ_SIZE = 1024 * 1024  # 1 MB
 
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> tuple[str, int]:
-    """Extract text from PDF bytes. Returns (text, page_count)."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text() + "\n"
-    page_count = len(doc)
-    doc.close()
-    return text, page_count
+def _store_upload(src, path: str, max_bytes: int) -> str:
+    """Copy an upload to `path` block by block, enforcing the size limit and PDF header. Returns its sha256."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as dst:
+        while block := src.read(UPLOAD_READ_SIZE):
+            if size == 0 and not block.startswith(b"%PDF-"):
+                raise ValueError("Could not read PDF")
+            size += len(block)
+            if size > max_bytes:
+                raise ValueError(f"File too large (max {max_bytes // (1024 * 1024)} MB)")
+            digest.update(block)
+            dst.write(block)
+    if size == 0:
+        raise ValueError("Could not read PDF")
+    return digest.hexdigest()
 
 
-def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
-    """Split text into overlapping chunks by token count."""
-    enc = tiktoken.get_encoding("cl100k_base")
-    tokens = enc.encode(text)
-    chunks = []
-    start = 0
-    while start < len(tokens):
-        end = start + chunk_size
-        chunk_tokens = tokens[start:end]
-        chunks.append(enc.decode(chunk_tokens))
-        start += chunk_size - overlap
-    return chunks
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
 
 @router.get("")
 async def list_documents(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """List all documents for the current user."""
-    result = await db.execute(
-        select(Document)
-        .where(Document.user_id == user["sub"])
-        .order_by(Document.created_at.desc())
-    )
-    docs = result.scalars().all()
+    """List the current user's documents, newest first, one page at a time. Supports If-None-Match."""
+    if (cached := await not_modified(request, response, db, user["sub"], DOCUMENTS)) is not None:
+        return cached
+    try:
+        docs, next_cursor = await fetch_page(
+            db,
+            select(
+                Document.id,
+                Document.filename,
+                Document.subject,
+                Document.page_count,
+                Document.chunk_count,
+                Document.status,
+                Document.created_at,
+            ).where(Document.user_id == user["sub"]),
+            Document.created_at,
+            Document.id,
+            cursor,
+            limit,
+            descending=True,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return [
         {
             "id": d.id,
@@ -73,54 +103,242 @@ async def upload_document(
     user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Upload a PDF, extract text, chunk it, and store."""
+    """Upload a PDF and queue it for extraction and chunking."""
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
 
-    pdf_bytes = await file.read()
-    if len(pdf_bytes) > 50 * 1024 * 1024:  # 50 MB limit
-        raise HTTPException(status_code=400, detail="File too large (max 50 MB)")
+    settings = get_settings()
+    doc_id = new_id()
 
-    # Extract text
+    # Stream the (already spooled) upload to where the ingestion workers can reach it
+    file_path = os.path.join(settings.upload_dir, f"{doc_id}.pdf")
     try:
-        text, page_count = extract_text_from_pdf(pdf_bytes)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Could not read PDF")
+        content_hash = await asyncio.to_thread(
+            _store_upload, file.file, file_path, settings.max_upload_mb * 1024 * 1024
+        )
+    except ValueError as exc:
+        await asyncio.to_thread(_remove_file, file_path)
+        raise HTTPException(status_code=400, detail=str(exc))
 
-    if not text.strip():
-        raise HTTPException(status_code=400, detail="PDF contains no extractable text")
+    # Identical PDFs share one chunk set; only new content is ingested
+    chunk_set = await acquire_chunk_set(db, content_hash)
 
-    # Create document record
     doc = Document(
+        id=doc_id,
         user_id=user["sub"],
         filename=file.filename,
         subject=subject,
-        page_count=page_count,
-        status="processing",
+        content_hash=content_hash,
+        chunk_set_id=chunk_set.id,
+        status=chunk_set.status,
+        page_count=chunk_set.page_count,
+        chunk_count=chunk_set.chunk_count,
     )
     db.add(doc)
-    await db.flush()
 
-    # Chunk and store
-    chunks = chunk_text(text)
-    for i, chunk_text_content in enumerate(chunks):
-        chunk = DocumentChunk(
-            document_id=doc.id,
-            chunk_index=i,
-            content=chunk_text_content,
+    job = None
+    if chunk_set.needs_ingest:
+        job = IngestionJob(chunk_set_id=chunk_set.id, user_id=user["sub"], file_path=file_path)
+        db.add(job)
+    await bump_versions(db, user["sub"], DOCUMENTS)
+    await db.commit()
+
+    if job:
+        ingestion_queue.submit(job.id)
+    else:
+        await asyncio.to_thread(_remove_file, file_path)
+
+    return {
+        "id": doc.id,
+        "job_id": job.id if job else None,
+        "filename": doc.filename,
+        "status": doc.status,
+        "deduplicated": job is None,
+    }
+
+
+@router.post("/{document_id}/replace")
+async def replace_document(
+    document_id: str,
+    file: UploadFile = File(...),
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Upload a new version of a document's PDF. Generated material stays with the
+    document; only changed pages are re-ingested, and the pages, flashcards and
+    quiz questions affected are reported (here, or on the job once it finishes).
+    """
+    if not file.filename or not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+
+    doc = await db.get(Document, document_id)
+    if not doc or doc.user_id != user["sub"]:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    settings = get_settings()
+    file_path = os.path.join(settings.upload_dir, f"{new_id()}.pdf")
+    try:
+        content_hash = await asyncio.to_thread(
+            _store_upload, file.file, file_path, settings.max_upload_mb * 1024 * 1024
         )
-        db.add(chunk)
+    except ValueError as exc:
+        await asyncio.to_thread(_remove_file, file_path)
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    if content_hash == doc.content_hash:
+        await asyncio.to_thread(_remove_file, file_path)
+        return {"id": doc.id, "job_id": None, "status": doc.status, "unchanged": True, "replacement": None}
+
+    # The document keeps its current set until the new one is complete, so no reference is taken yet
+    chunk_set = await acquire_chunk_set(db, content_hash, refs=0)
+    old_set_id = doc.chunk_set_id
+    doc.filename = file.filename
+    await bump_versions(db, user["sub"], DOCUMENTS)
 
-    doc.chunk_count = len(chunks)
-    doc.status = "ready"
+    if chunk_set.needs_ingest:
+        job = IngestionJob(
+            chunk_set_id=chunk_set.id,
+            user_id=user["sub"],
+            file_path=file_path,
+            document_id=doc.id,
+            base_chunk_set_id=old_set_id,
+        )
+        db.add(job)
+        await db.commit()
+        ingestion_queue.submit(job.id)
+        return {"id": doc.id, "job_id": job.id, "status": doc.status, "unchanged": False, "replacement": None}
 
+    # This version was already uploaded (possibly by someone else): switch over now
+    await asyncio.to_thread(_remove_file, file_path)
+    replacement = None
+    if old_set_id and chunk_set.status == "ready":
+        replacement = await _diff_chunk_sets(db, doc.id, old_set_id, chunk_set.id)
+    await retain_chunk_set(db, chunk_set.id)
+    doc.chunk_set_id = chunk_set.id
+    doc.content_hash = content_hash
+    doc.status = chunk_set.status
+    doc.page_count = chunk_set.page_count
+    doc.chunk_count = chunk_set.chunk_count
+    if old_set_id:
+        await release_chunk_set(db, old_set_id)
     await db.commit()
-    await db.refresh(doc)
+    return {"id": doc.id, "job_id": None, "status": doc.status, "unchanged": False, "replacement": replacement}
+
+
+async def _diff_chunk_sets(db: AsyncSession, document_id: str, old_set_id: str, new_set_id: str) -> dict | None:
+    """What changed between two ingested sets, for a replacement that needed no ingest."""
+    hashes = dict(
+        (await db.execute(select(ChunkSet.id, ChunkSet.page_hashes).where(ChunkSet.id.in_([old_set_id, new_set_id]))))
+        .tuples()
+        .all()
+    )
+    rows = (
+        await db.execute(
+            select(DocumentChunk.id, DocumentChunk.chunk_index, DocumentChunk.page_start, DocumentChunk.page_end)
+            .where(DocumentChunk.chunk_set_id == old_set_id)
+        )
+    ).all()
+    if not hashes.get(old_set_id) or not hashes.get(new_set_id) or any(row.page_start is None for row in rows):
+        return None
+
+    plan = plan_revision(
+        hashes[old_set_id], hashes[new_set_id], [OldChunk(r.id, r.chunk_index, r.page_start, r.page_end) for r in rows]
+    )
+    dropped = {row.id for row in rows} - {chunk.id for chunk in plan.kept}
+    return {
+        "incremental": True,
+        "page_count": len(hashes[new_set_id]),
+        "pages_changed": plan.pages_changed,
+        "pages_removed": plan.pages_removed,
+        **await find_affected(db, document_id, old_set_id, dropped),
+    }
+
+
+@router.get("/{document_id}/status")
+async def get_document_status(
+    document_id: str,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Report ingestion status and progress for a document."""
+    doc = await db.get(Document, document_id)
+    if not doc or doc.user_id != user["sub"]:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    # The latest job for the document's set, or a replacement still building the next one
+    result = await db.execute(
+        select(IngestionJob)
+        .where(or_(IngestionJob.chunk_set_id == doc.chunk_set_id, IngestionJob.document_id == doc.id))
+        .order_by(IngestionJob.created_at.desc())
+        .limit(1)
+    )
+    job = result.scalar_one_or_none()
 
     return {
         "id": doc.id,
-        "filename": doc.filename,
-        "page_count": page_count,
-        "chunk_count": len(chunks),
         "status": doc.status,
+        "page_count": doc.page_count,
+        "chunk_count": doc.chunk_count,
+        "job": {
+            "id": job.id,
+            "status": job.status,
+            "stage": job.stage,
+            "progress": job.progress,
+            "attempts": job.attempts,
+            "error": job.error,
+            "replacement": job.result,
+        } if job else None,
     }
+
+
+@router.get("/{document_id}/search")
+async def search_document(
+    document_id: str,
+    q: str,
+    top_k: int | None = None,
+    token_budget: int | None = None,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Return the chunks of a document most relevant to a query, in document order."""
+    doc = await db.get(Document, document_id)
+    if not doc or doc.user_id != user["sub"]:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    if not doc.chunk_set_id:
+        return []
+
+    chunks = await retrieve_chunks(db, doc.chunk_set_id, q, top_k, token_budget)
+    return [
+        {
+            "chunk_index": c.chunk_index,
+            "content": c.content,
+            "distance": c.distance,
+            "page_start": c.page_start,
+            "page_end": c.page_end,
+        }
+        for c in chunks
+    ]
+
+
+@router.delete("/{document_id}")
+async def delete_document(
+    document_id: str,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Delete a document and everything generated from it, releasing its shared chunks."""
+    doc = await db.get(Document, document_id)
+    if not doc or doc.user_id != user["sub"]:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    chunk_set_id = doc.chunk_set_id
+    # Generated artifacts go with it via ON DELETE CASCADE
+    await db.execute(delete(Document).where(Document.id == document_id))
+    if chunk_set_id:
+        await release_chunk_set(db, chunk_set_id)
+    await bump_versions(db, user["sub"], DOCUMENTS, FLASHCARDS, QUIZZES)
+    await db.commit()
+
+    return {"id": document_id, "deleted": True}
@@ -1,32 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from pydantic import BaseModel
 
 from app.core.database import get_db
 from app.core.auth import get_current_user
-from app.models.models import Flashcard
-from app.services.spaced_repetition import sm2
+from app.models.models import Flashcard, utcnow
+from app.services.collection_versions import FLASHCARDS, bump_versions, not_modified
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, fetch_page
+from app.services.spaced_repetition import forecast_reviews, sm2
+from app.services.topic_stats import card_outcome, record_outcomes
 
 router = APIRouter(prefix="/flashcards", tags=["flashcards"])
 
 
+MAX_BATCH_REVIEWS = 1000
+
+
 class ReviewRequest(BaseModel):
     quality: int  # 0-5
 
 
+class BatchReviewItem(BaseModel):
+    card_id: str
+    quality: int  # 0-5
+    reviewed_at: datetime | None = None  # when the card was rated (offline clients); default now
+
+
+class BatchReviewRequest(BaseModel):
+    reviews: list[BatchReviewItem]
+
+
 @router.get("")
 async def list_flashcards(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """List all flashcards for the current user."""
-    result = await db.execute(
-        select(Flashcard)
-        .where(Flashcard.user_id == user["sub"])
-        .order_by(Flashcard.next_review.asc())
-    )
-    cards = result.scalars().all()
+    """List the current user's flashcards by next review date, one page at a time. Supports If-None-Match."""
+    if (cached := await not_modified(request, response, db, user["sub"], FLASHCARDS)) is not None:
+        return cached
+    try:
+        cards, next_cursor = await fetch_page(
+            db,
+            select(
+                Flashcard.id,
+                Flashcard.front,
+                Flashcard.back,
+                Flashcard.topic,
+                Flashcard.ease_factor,
+                Flashcard.interval_days,
+                Flashcard.next_review,
+            ).where(Flashcard.user_id == user["sub"]),
+            Flashcard.next_review,
+            Flashcard.id,
+            cursor,
+            limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return [
         {
             "id": c.id,
@@ -41,6 +82,77 @@ async def list_flashcards(
     ]
 
 
+@router.get("/due")
+async def due_flashcards(
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    document_id: str | None = None,
+    topic: str | None = None,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """The review queue: the next `limit` cards due now, most overdue first."""
+    stmt = select(Flashcard.id, Flashcard.front, Flashcard.back, Flashcard.topic, Flashcard.next_review).where(
+        Flashcard.user_id == user["sub"], Flashcard.next_review <= utcnow()
+    )
+    if document_id is not None:
+        stmt = stmt.where(Flashcard.document_id == document_id)
+    if topic is not None:
+        stmt = stmt.where(Flashcard.topic == topic)
+
+    result = await db.execute(stmt.order_by(Flashcard.next_review.asc(), Flashcard.id.asc()).limit(limit))
+    return [
+        {
+            "id": c.id,
+            "front": c.front,
+            "back": c.back,
+            "topic": c.topic,
+            "next_review": c.next_review.isoformat(),
+        }
+        for c in result.all()
+    ]
+
+
+@router.get("/forecast")
+async def review_forecast(
+    days: int = Query(30, ge=1, le=365),
+    recall_rate: float = Query(0.9, ge=0, le=1),
+    new_recall_rate: float = Query(0.75, ge=0, le=1),
+    document_id: str | None = None,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Expected reviews per day over the next `days` days, simulating SM-2 under the given recall rates."""
+    stmt = select(Flashcard.ease_factor, Flashcard.interval_days, Flashcard.repetitions, Flashcard.next_review).where(
+        Flashcard.user_id == user["sub"]
+    )
+    if document_id is not None:
+        stmt = stmt.where(Flashcard.document_id == document_id)
+    rows = (await db.execute(stmt)).all()
+
+    now = utcnow()
+    ease, interval, reps, next_review = zip(*rows) if rows else ((), (), (), ())
+    due_in_days = np.array([(t - now).total_seconds() for t in next_review], dtype=np.float64) // 86400
+    expected = await asyncio.to_thread(
+        forecast_reviews,
+        np.array(ease, dtype=np.float64),
+        np.array(interval, dtype=np.int64),
+        np.array(reps, dtype=np.int64),
+        due_in_days.astype(np.int64),
+        days,
+        recall_rate,
+        new_recall_rate,
+    )
+
+    today = now.date()
+    return {
+        "cards": len(rows),
+        "days": [
+            {"date": (today + timedelta(days=i)).isoformat(), "reviews": round(float(n), 1)}
+            for i, n in enumerate(expected)
+        ],
+    }
+
+
 @router.post("/{flashcard_id}/review")
 async def review_flashcard(
     flashcard_id: str,
@@ -68,6 +180,8 @@ async def review_flashcard(
     card.repetitions = result.repetitions
     card.next_review = result.next_review
 
+    await record_outcomes(db, user["sub"], [card_outcome(card.topic, body.quality, utcnow())])
+    await bump_versions(db, user["sub"], FLASHCARDS)
     await db.commit()
 
     return {
@@ -77,3 +191,75 @@ async def review_flashcard(
         "repetitions": card.repetitions,
         "next_review": card.next_review.isoformat(),
     }
+
+
+@router.post("/review/batch")
+async def review_flashcards_batch(
+    body: BatchReviewRequest,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Apply a whole review session at once. Reviews of cards the user does not own are reported, not applied."""
+    if len(body.reviews) > MAX_BATCH_REVIEWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_REVIEWS} reviews per batch")
+    if any(not 0 <= r.quality <= 5 for r in body.reviews):
+        raise HTTPException(status_code=400, detail="Quality must be 0-5")
+
+    now = utcnow()
+    card_ids = {r.card_id for r in body.reviews}
+    result = await db.execute(
+        select(
+            Flashcard.id, Flashcard.topic, Flashcard.ease_factor, Flashcard.interval_days, Flashcard.repetitions
+        ).where(Flashcard.id.in_(card_ids), Flashcard.user_id == user["sub"])
+    )
+    rows = result.all()
+    topics = {row.id: row.topic for row in rows}
+    states = {row.id: {k: v for k, v in row._asdict().items() if k != "topic"} for row in rows}
+    outcomes = []
+
+    # Replay in the order the ratings were given, so repeated reviews of a card chain correctly
+    def reviewed_at(r: BatchReviewItem) -> datetime:
+        if r.reviewed_at is None:
+            return now
+        at = r.reviewed_at if r.reviewed_at.tzinfo else r.reviewed_at.replace(tzinfo=timezone.utc)
+        return min(at, now)
+
+    for review in sorted(body.reviews, key=reviewed_at):
+        state = states.get(review.card_id)
+        if state is None:
+            continue
+        outcome = sm2(
+            quality=review.quality,
+            repetitions=state["repetitions"],
+            ease_factor=state["ease_factor"],
+            interval_days=state["interval_days"],
+            reviewed_at=reviewed_at(review),
+        )
+        outcomes.append(card_outcome(topics[review.card_id], review.quality, reviewed_at(review)))
+        state.update(
+            ease_factor=outcome.ease_factor,
+            interval_days=outcome.interval_days,
+            repetitions=outcome.repetitions,
+            next_review=outcome.next_review,
+        )
+
+    updated = [state for state in states.values() if "next_review" in state]
+    if updated:
+        await db.execute(update(Flashcard), updated)  # one executemany UPDATE by primary key
+        await bump_versions(db, user["sub"], FLASHCARDS)
+    await record_outcomes(db, user["sub"], outcomes)
+    await db.commit()
+
+    return {
+        "updated": [
+            {
+                "id": state["id"],
+                "ease_factor": state["ease_factor"],
+                "interval_days": state["interval_days"],
+                "repetitions": state["repetitions"],
+                "next_review": state["next_review"].isoformat(),
+            }
+            for state in updated
+        ],
+        "not_found": sorted(card_ids - states.keys()),
+    }
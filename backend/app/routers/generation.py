@@ -1,29 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import logging
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete
 
-from app.core.database import get_db
+from app.core.config import get_settings
+from app.core.database import get_db, async_session
 from app.core.auth import get_current_user
-from app.models.models import Document, DocumentChunk, StudyGuide, Flashcard, Quiz
-from app.services.ai_service import generate_study_guide, generate_flashcards, generate_quiz
+from app.models.models import (
+    BulkGenerationItem,
+    BulkGenerationJob,
+    Document,
+    StudyGuide,
+    Flashcard,
+    Quiz,
+    utcnow,
+)
+from app.services.ai_service import (
+    GENERATION_KINDS,
+    generate_study_guide,
+    generate_flashcards,
+    generate_quiz,
+    stream_study_guide,
+    stream_flashcards,
+    stream_quiz,
+    study_guide_title,
+    track_usage,
+)
+from app.services.bulk_generation import (
+    bulk_generation_queue,
+    generate_material,
+    job_report,
+    load_chunks,
+    ready_document_ids,
+)
+from app.services.collection_versions import FLASHCARDS, QUIZZES, bump_versions
+from app.services.generation_cache import cache_key, generation_cache
+from app.services.retrieval import retrieve_chunks
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/generate", tags=["generation"])
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 
-async def _get_document_chunks(doc_id: str, user_id: str, db: AsyncSession) -> tuple[Document, list[str]]:
-    """Fetch a document and its chunks, ensuring ownership."""
+async def _get_document_chunks(
+    doc_id: str, user_id: str, db: AsyncSession, query: str | None = None
+) -> tuple[Document, list[str]]:
+    """Fetch a document and its chunks (or only the most relevant ones for `query`), ensuring ownership."""
     doc = await db.get(Document, doc_id)
     if not doc or doc.user_id != user_id:
         raise HTTPException(status_code=404, detail="Document not found")
     if doc.status != "ready":
         raise HTTPException(status_code=400, detail="Document is still processing")
 
-    result = await db.execute(
-        select(DocumentChunk)
-        .where(DocumentChunk.document_id == doc_id)
-        .order_by(DocumentChunk.chunk_index)
-    )
-    chunks = [c.content for c in result.scalars().all()]
+    if query:
+        retrieved = await retrieve_chunks(db, doc.chunk_set_id, query)
+        if retrieved:
+            return doc, [c.content for c in retrieved]
+        # Documents ingested before embeddings existed fall through to the full text
+
+    chunks = await load_chunks(db, doc.chunk_set_id)
     if not chunks:
         raise HTTPException(status_code=400, detail="No content found in document")
 
@@ -33,12 +76,20 @@ async def _get_document_chunks(doc_id: str, user_id: str, db: AsyncSession) -> t
 @router.post("/study-guide/{document_id}")
 async def create_study_guide(
     document_id: str,
+    query: str | None = None,
+    refresh: bool = False,
     user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Generate a study guide for a document."""
-    doc, chunks = await _get_document_chunks(document_id, user["sub"], db)
-    result = await generate_study_guide(chunks, doc.subject)
+    """Generate a study guide for a document, optionally focused on a topic/query."""
+    doc, chunks = await _get_document_chunks(document_id, user["sub"], db, query)
+    result = await generation_cache.get_or_generate(
+        db,
+        "study_guide",
+        cache_key("study_guide", chunks, doc.subject),
+        lambda: generate_study_guide(chunks, doc.subject),
+        bypass=refresh,
+    )
 
     guide = StudyGuide(
         document_id=doc.id,
@@ -59,13 +110,21 @@ async def create_study_guide(
 @router.post("/flashcards/{document_id}")
 async def create_flashcards(
     document_id: str,
-    count: int = 20,
+    count: int = Query(20, ge=1, le=200),
+    query: str | None = None,
+    refresh: bool = False,
     user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Generate flashcards for a document."""
-    doc, chunks = await _get_document_chunks(document_id, user["sub"], db)
-    cards_data = await generate_flashcards(chunks, count, doc.subject)
+    """Generate flashcards for a document, optionally focused on a topic/query."""
+    doc, chunks = await _get_document_chunks(document_id, user["sub"], db, query)
+    cards_data = await generation_cache.get_or_generate(
+        db,
+        "flashcards",
+        cache_key("flashcards", chunks, doc.subject, count),
+        lambda: generate_flashcards(chunks, count, doc.subject),
+        bypass=refresh,
+    )
 
     cards = []
     for card in cards_data:
@@ -79,6 +138,7 @@ async def create_flashcards(
         db.add(fc)
         cards.append(fc)
 
+    await bump_versions(db, user["sub"], FLASHCARDS)
     await db.commit()
 
     return [
@@ -96,13 +156,21 @@ async def create_flashcards(
 @router.post("/quiz/{document_id}")
 async def create_quiz(
     document_id: str,
-    count: int = 10,
+    count: int = Query(10, ge=1, le=100),
+    query: str | None = None,
+    refresh: bool = False,
     user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Generate a quiz for a document."""
-    doc, chunks = await _get_document_chunks(document_id, user["sub"], db)
-    quiz_data = await generate_quiz(chunks, count, doc.subject)
+    """Generate a quiz for a document, optionally focused on a topic/query."""
+    doc, chunks = await _get_document_chunks(document_id, user["sub"], db, query)
+    quiz_data = await generation_cache.get_or_generate(
+        db,
+        "quiz",
+        cache_key("quiz", chunks, doc.subject, count),
+        lambda: generate_quiz(chunks, count, doc.subject),
+        bypass=refresh,
+    )
 
     quiz = Quiz(
         document_id=doc.id,
@@ -111,6 +179,7 @@ async def create_quiz(
         questions=quiz_data["questions"],
     )
     db.add(quiz)
+    await bump_versions(db, user["sub"], QUIZZES)
     await db.commit()
     await db.refresh(quiz)
 
@@ -119,3 +188,298 @@ async def create_quiz(
         "title": quiz.title,
         "question_count": len(quiz_data["questions"]),
     }
+
+
+@router.post("/all/{document_id}")
+async def create_all(
+    document_id: str,
+    flashcard_count: int = Query(20, ge=1, le=200),
+    question_count: int = Query(10, ge=1, le=100),
+    refresh: bool = False,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Generate a study guide, flashcards and a quiz for a document in one go.
+    The three generations run concurrently over one cached copy of the
+    material; the response reports the tokens used, including cache reads
+    and writes.
+    """
+    doc, chunks = await _get_document_chunks(document_id, user["sub"], db)
+    with track_usage() as usage:
+        material = await generate_material(
+            db, doc, user["sub"], chunks, GENERATION_KINDS, flashcard_count, question_count, refresh
+        )
+    await db.commit()
+
+    guide, quiz = material.study_guide, material.quiz
+    return {
+        "study_guide": {"id": guide.id, "title": guide.title, "content_markdown": guide.content_markdown},
+        "flashcards": [
+            {
+                "id": c.id,
+                "front": c.front,
+                "back": c.back,
+                "topic": c.topic,
+                "next_review": c.next_review.isoformat(),
+            }
+            for c in material.flashcards
+        ],
+        "quiz": {"id": quiz.id, "title": quiz.title, "question_count": len(quiz.questions)},
+        "cached": material.cached,
+        "usage": asdict(usage),
+    }
+
+
+# --- Bulk generation (every document of a subject) ---
+
+
+class BulkGenerationRequest(BaseModel):
+    subject: str
+    kinds: list[str] = list(GENERATION_KINDS)
+    flashcard_count: int = Field(20, ge=1, le=200)
+    question_count: int = Field(10, ge=1, le=100)
+    concurrency: int | None = Field(None, ge=1)  # documents at a time; capped by bulk_generation_max_concurrency
+    refresh: bool = False  # regenerate documents that already have current material
+
+
+@router.post("/bulk")
+async def create_bulk_generation(
+    body: BulkGenerationRequest,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Queue generation for every ready document of a subject. Runs in the
+    background and resumes after a restart; poll GET /generate/bulk/{job_id}.
+    """
+    if not body.kinds or set(body.kinds) - set(GENERATION_KINDS):
+        raise HTTPException(status_code=400, detail=f"kinds must be some of {', '.join(GENERATION_KINDS)}")
+
+    document_ids = await ready_document_ids(db, user["sub"], body.subject)
+    if not document_ids:
+        raise HTTPException(status_code=404, detail="No ready documents for this subject")
+
+    settings = get_settings()
+    job = BulkGenerationJob(
+        user_id=user["sub"],
+        subject=body.subject,
+        kinds=[kind for kind in GENERATION_KINDS if kind in body.kinds],
+        flashcard_count=body.flashcard_count,
+        question_count=body.question_count,
+        concurrency=min(
+            body.concurrency or settings.bulk_generation_concurrency, settings.bulk_generation_max_concurrency
+        ),
+        refresh=body.refresh,
+        total=len(document_ids),
+        items=[BulkGenerationItem(document_id=doc_id, position=n) for n, doc_id in enumerate(document_ids)],
+    )
+    db.add(job)
+    await db.commit()
+    bulk_generation_queue.submit(job.id)
+    return await job_report(db, job)
+
+
+async def _get_bulk_job(job_id: str, user_id: str, db: AsyncSession) -> BulkGenerationJob:
+    job = await db.get(BulkGenerationJob, job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/bulk/{job_id}")
+async def get_bulk_generation(
+    job_id: str,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Progress of a bulk generation job: document counts, tokens used, throughput and ETA."""
+    return await job_report(db, await _get_bulk_job(job_id, user["sub"], db))
+
+
+@router.post("/bulk/{job_id}/cancel")
+async def cancel_bulk_generation(
+    job_id: str,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stop a bulk generation job. Documents already generated keep their material."""
+    job = await _get_bulk_job(job_id, user["sub"], db)
+    if job.status in ("queued", "running"):
+        job.status = "cancelled"
+        job.finished_at = utcnow()
+        await db.commit()
+    return await job_report(db, job)
+
+
+# --- Streaming (server-sent events) ---
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _event_stream(events: AsyncIterator[str]) -> StreamingResponse:
+    async def guarded():
+        try:
+            async for event in events:
+                yield event
+        except Exception:
+            logger.exception("Streaming generation failed")
+            yield _sse("error", {"detail": "Generation failed"})
+
+    return StreamingResponse(guarded(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def _replay(items: Iterable):
+    for item in items:
+        yield item
+
+
+@router.post("/study-guide/{document_id}/stream")
+async def stream_study_guide_sse(
+    document_id: str,
+    query: str | None = None,
+    refresh: bool = False,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream a study guide as markdown `delta` events, then a `done` event once it is saved."""
+    doc, chunks = await _get_document_chunks(document_id, user["sub"], db, query)
+    key = cache_key("study_guide", chunks, doc.subject)
+    cached = await generation_cache.lookup(db, key, refresh)
+    doc_id, subject = doc.id, doc.subject
+
+    async def events():
+        if cached:
+            result = cached
+            yield _sse("delta", {"text": result["content_markdown"]})
+        else:
+            parts = []
+            async for text in stream_study_guide(chunks, subject):
+                parts.append(text)
+                yield _sse("delta", {"text": text})
+            result = {"title": study_guide_title(subject), "content_markdown": "".join(parts)}
+
+        # The request's session is closed once streaming starts, so persist with our own
+        async with async_session() as session:
+            guide = StudyGuide(document_id=doc_id, title=result["title"], content_markdown=result["content_markdown"])
+            session.add(guide)
+            if not cached:
+                await generation_cache.store(session, "study_guide", key, result)
+            await session.commit()
+
+        yield _sse("done", {"id": guide.id, "title": guide.title})
+
+    return _event_stream(events())
+
+
+@router.post("/flashcards/{document_id}/stream")
+async def stream_flashcards_sse(
+    document_id: str,
+    count: int = Query(20, ge=1, le=200),
+    query: str | None = None,
+    refresh: bool = False,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream flashcards as `flashcard` events, each saved as soon as Claude completes it."""
+    doc, chunks = await _get_document_chunks(document_id, user["sub"], db, query)
+    key = cache_key("flashcards", chunks, doc.subject, count)
+    cached = await generation_cache.lookup(db, key, refresh)
+    doc_id, subject, user_id = doc.id, doc.subject, user["sub"]
+
+    async def events():
+        source = _replay(cached) if cached else stream_flashcards(chunks, count, subject)
+        generated = []
+        async with async_session() as session:
+            async for card in source:
+                fc = Flashcard(
+                    document_id=doc_id,
+                    user_id=user_id,
+                    front=card["front"],
+                    back=card["back"],
+                    topic=card.get("topic"),
+                )
+                session.add(fc)
+                await bump_versions(session, user_id, FLASHCARDS)
+                await session.commit()
+                generated.append(card)
+                yield _sse("flashcard", {
+                    "id": fc.id,
+                    "front": fc.front,
+                    "back": fc.back,
+                    "topic": fc.topic,
+                    "next_review": fc.next_review.isoformat(),
+                })
+
+            if generated and not cached:
+                await generation_cache.store(session, "flashcards", key, generated)
+                await session.commit()
+
+        yield _sse("done", {"count": len(generated)})
+
+    return _event_stream(events())
+
+
+@router.post("/quiz/{document_id}/stream")
+async def stream_quiz_sse(
+    document_id: str,
+    count: int = Query(10, ge=1, le=100),
+    query: str | None = None,
+    refresh: bool = False,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream a quiz: a `quiz` event with its id, then `question` events saved one at a time."""
+    doc, chunks = await _get_document_chunks(document_id, user["sub"], db, query)
+    key = cache_key("quiz", chunks, doc.subject, count)
+    cached = await generation_cache.lookup(db, key, refresh)
+    doc_id, subject, user_id = doc.id, doc.subject, user["sub"]
+
+    async def events():
+        if cached:
+            source = _replay((cached["title"], q) for q in cached["questions"])
+        else:
+            source = stream_quiz(chunks, count, subject)
+
+        async with async_session() as session:
+            quiz = Quiz(
+                document_id=doc_id,
+                user_id=user_id,
+                title=f"Quiz: {subject}" if subject else "Quiz",
+                questions=[],
+            )
+            session.add(quiz)
+            await bump_versions(session, user_id, QUIZZES)
+            await session.commit()
+            yield _sse("quiz", {"id": quiz.id, "title": quiz.title})
+
+            questions = []
+            try:
+                async for title, question in source:
+                    questions.append(question)
+                    quiz.questions = list(questions)
+                    quiz.title = title or quiz.title
+                    await bump_versions(session, user_id, QUIZZES)
+                    await session.commit()
+                    yield _sse("question", {"index": len(questions) - 1, "title": quiz.title, **question})
+            finally:
+                # Don't leave an empty quiz behind, whether the stream came up empty or failed first
+                if not questions:
+                    await session.rollback()
+                    await session.execute(delete(Quiz).where(Quiz.id == quiz.id))
+                    await bump_versions(session, user_id, QUIZZES)
+                    await session.commit()
+
+            if not questions:
+                yield _sse("error", {"detail": "No questions were generated"})
+                return
+
+            if not cached:
+                await generation_cache.store(session, "quiz", key, {"title": quiz.title, "questions": questions})
+                await session.commit()
+
+        yield _sse("done", {"id": quiz.id, "title": quiz.title, "question_count": len(questions)})
+
+    return _event_stream(events())
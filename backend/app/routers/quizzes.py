@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select
 from pydantic import BaseModel
 
 from app.core.database import get_db
 from app.core.auth import get_current_user
-from app.models.models import Quiz, QuizAttempt
+from app.models.models import Quiz, QuizAttempt, utcnow
+from app.services.collection_versions import QUIZZES, bump_versions, not_modified
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, fetch_page
+from app.services.topic_stats import quiz_outcomes, record_outcomes
 
 router = APIRouter(prefix="/quizzes", tags=["quizzes"])
 
@@ -18,25 +21,70 @@ class AttemptRequest(BaseModel):
 
 @router.get("")
 async def list_quizzes(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_questions: bool = False,
     user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """List all quizzes for the current user."""
-    result = await db.execute(
-        select(Quiz)
-        .where(Quiz.user_id == user["sub"])
-        .order_by(Quiz.created_at.desc())
-    )
-    quizzes = result.scalars().all()
-    return [
-        {
+    """
+    List the current user's quizzes, newest first. Questions are left out
+    unless asked for. Supports If-None-Match.
+    """
+    if (cached := await not_modified(request, response, db, user["sub"], QUIZZES)) is not None:
+        return cached
+    columns = [Quiz.id, Quiz.title, Quiz.created_at, func.json_array_length(Quiz.questions).label("question_count")]
+    if include_questions:
+        columns.append(Quiz.questions)
+    try:
+        quizzes, next_cursor = await fetch_page(
+            db,
+            select(*columns).where(Quiz.user_id == user["sub"]),
+            Quiz.created_at,
+            Quiz.id,
+            cursor,
+            limit,
+            descending=True,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    items = []
+    for q in quizzes:
+        item = {
             "id": q.id,
             "title": q.title,
-            "questions": q.questions,
+            "question_count": q.question_count,
             "created_at": q.created_at.isoformat(),
         }
-        for q in quizzes
-    ]
+        if include_questions:
+            item["questions"] = q.questions
+        items.append(item)
+    return items
+
+
+@router.get("/{quiz_id}")
+async def get_quiz(
+    quiz_id: str,
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get a quiz with its questions."""
+    quiz = await db.get(Quiz, quiz_id)
+    if not quiz or quiz.user_id != user["sub"]:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+
+    return {
+        "id": quiz.id,
+        "document_id": quiz.document_id,
+        "title": quiz.title,
+        "questions": quiz.questions,
+        "created_at": quiz.created_at.isoformat(),
+    }
 
 
 @router.post("/{quiz_id}/attempt")
@@ -59,6 +107,8 @@ async def submit_attempt(
         total=body.total,
     )
     db.add(attempt)
+    await record_outcomes(db, user["sub"], quiz_outcomes(quiz.questions, body.answers, utcnow()))
+    await bump_versions(db, user["sub"], QUIZZES)
     await db.commit()
     await db.refresh(attempt)
 
@@ -0,0 +1,68 @@
+"""
+Rebuild the quiz counters of topic_stats and daily_stats from stored quiz attempts.
+
+    python -m app.scripts.backfill_topic_stats [--user USER_ID]
+
+Runs in one transaction: the quiz counters (for everyone, or one user) are
+reset to zero and recomputed by streaming attempts joined to their quiz's
+questions, one user at a time. Flashcard reviews keep no history, so the
+card counters cannot be rebuilt and are left as they are; attempts saved
+without per-question answers are counted and skipped.
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import select, update
+
+from app.core.database import async_session
+from app.models.models import DailyStat, Quiz, QuizAttempt, TopicStat
+from app.services.topic_stats import Outcome, quiz_outcomes, record_outcomes
+
+STREAM_BATCH_SIZE = 1000
+
+
+async def backfill(user_id: str | None = None) -> dict:
+    attempts = skipped = users = 0
+    async with async_session() as db:
+        # Only the quiz counters are rebuilt; record_outcomes adds zero to the card counters
+        for table in (TopicStat, DailyStat):
+            stmt = update(table).values(quiz_correct=0, quiz_total=0)
+            if user_id is not None:
+                stmt = stmt.where(table.user_id == user_id)
+            await db.execute(stmt)
+
+        stmt = (
+            select(QuizAttempt.user_id, QuizAttempt.answers, QuizAttempt.created_at, Quiz.questions)
+            .join(Quiz, Quiz.id == QuizAttempt.quiz_id)
+            .order_by(QuizAttempt.user_id)
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        if user_id is not None:
+            stmt = stmt.where(QuizAttempt.user_id == user_id)
+
+        current_user: str | None = None
+        outcomes: list[Outcome] = []
+        async for row in await db.stream(stmt):
+            if row.user_id != current_user:
+                if outcomes:
+                    await record_outcomes(db, current_user, outcomes)
+                current_user, outcomes = row.user_id, []
+                users += 1
+            attempts += 1
+            if not row.answers:
+                skipped += 1
+                continue
+            outcomes.extend(quiz_outcomes(row.questions or [], row.answers, row.created_at))
+        if outcomes:
+            await record_outcomes(db, current_user, outcomes)
+
+        await db.commit()
+    return {"users": users, "attempts": attempts, "skipped_without_answers": skipped}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", help="only rebuild this user's aggregates")
+    args = parser.parse_args()
+    print(asyncio.run(backfill(args.user)))
@@ -5,30 +5,424 @@ This is the core of the RAG pipeline:
 1. Retrieve relevant chunks for a document
 2. Send them as context to Claude
 3. Parse the structured output into flashcards / quiz / study guide
+
+All calls go through one process-wide AsyncAnthropic client (created in the
+app lifespan) with a keep-alive connection pool, a global concurrency cap and
+jittered exponential backoff on 429 / 529.
+
+Large documents are handled map-reduce style: chunks are packed into
+token-budgeted batches, each batch is sent as its own request (concurrently,
+bounded by a semaphore) and the partial outputs are merged — study-guide
+sections are combined by a final merge call, while flashcards and quiz
+questions are spread across batches in proportion to their size.
+
+The stream_* variants yield output as it is produced: study-guide markdown
+as text deltas, flashcards and quiz questions one object at a time as soon
+as each is complete.
+
+Flashcard and quiz responses are parsed incrementally as well, so a reply
+cut off at max_tokens keeps every complete item. While such a reply has
+fewer items than were asked for, it is sent back (up to its last complete
+item) as the start of Claude's turn for a continuation round; items kept
+from cut-off replies are counted in the usage totals.
+
+Every prompt puts the lecture material first, as its own content block
+marked with cache_control, and the task instructions after it. Generating
+several kinds of material for the same batch therefore pays for the
+material once and reads it from Anthropic's prompt cache afterwards
+(generate_all warms the cache before fanning out). Token usage, including
+cache reads and writes, can be totalled per request with track_usage().
 """
 
-import json
-from anthropic import AsyncAnthropic
+import asyncio
+import logging
+import random
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Collection, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TypeVar
+
+import httpx
+from anthropic import AsyncAnthropic, APIConnectionError, APIStatusError, DefaultAsyncHttpxClient
+from anthropic.types import Message
 from app.core.config import get_settings
+from app.core.metrics import (
+    LLM_CONTINUATIONS,
+    LLM_FIRST_TOKEN_SECONDS,
+    LLM_REQUEST_SECONDS,
+    LLM_RETRIES,
+    LLM_SALVAGED_ITEMS,
+    observe_llm_usage,
+)
+from app.services.json_stream import ObjectStream
+from app.services.tokenizer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+MODEL = "claude-haiku-4-5-20251001"
+PROMPT_VERSION = 2  # bump whenever a prompt template changes, to invalidate cached generations
+MAX_OUTPUT_TOKENS = 4096
+MAX_CONTINUATIONS = 3  # extra rounds for a JSON reply cut off at max_tokens
+RETRYABLE_STATUS_CODES = {429, 529}
+
+T = TypeVar("T")
+
+_client: AsyncAnthropic | None = None
+_llm_semaphore: asyncio.Semaphore | None = None
+
+
+@dataclass
+class Usage:
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    continuations: int = 0  # calls that picked up a reply cut off at max_tokens
+    salvaged_items: int = 0  # complete items kept from cut-off replies
+
+    def add(self, usage) -> None:
+        self.calls += 1
+        self.input_tokens += usage.input_tokens or 0
+        self.output_tokens += usage.output_tokens or 0
+        self.cache_read_tokens += getattr(usage, "cache_read_input_tokens", None) or 0
+        self.cache_write_tokens += getattr(usage, "cache_creation_input_tokens", None) or 0
+
+
+_current_usage: ContextVar[Usage | None] = ContextVar("llm_usage", default=None)
+
+
+@contextmanager
+def track_usage() -> Iterator[Usage]:
+    """Total the usage of every call made inside the block (including tasks it starts)."""
+    usage = Usage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def _record_usage(kind: str, usage) -> None:
+    observe_llm_usage(kind, usage)
+    totals = _current_usage.get()
+    if totals is not None and usage is not None:
+        totals.add(usage)
+
+
+def _record_truncation(kind: str, salvaged: int, continuing: bool) -> None:
+    LLM_SALVAGED_ITEMS.labels(kind).inc(salvaged)
+    if continuing:
+        LLM_CONTINUATIONS.labels(kind).inc()
+    totals = _current_usage.get()
+    if totals is not None:
+        totals.salvaged_items += salvaged
+        totals.continuations += int(continuing)
+
+
+def _build_client() -> AsyncAnthropic:
+    settings = get_settings()
+    return AsyncAnthropic(
+        api_key=settings.anthropic_api_key,
+        base_url=settings.anthropic_base_url or None,
+        max_retries=0,  # retries are handled by create_message
+        timeout=settings.llm_timeout_seconds,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_concurrency,
+                max_keepalive_connections=settings.llm_max_concurrency,
+                keepalive_expiry=60,
+            ),
+        ),
+    )
+
+
+def init_client() -> None:
+    """Create the shared client. Called from the app lifespan."""
+    global _client, _llm_semaphore
+    _client = _build_client()
+    _llm_semaphore = asyncio.Semaphore(get_settings().llm_max_concurrency)
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
 
 
 def get_client() -> AsyncAnthropic:
-    return AsyncAnthropic(api_key=get_settings().anthropic_api_key)
+    """Return the shared client, creating it on first use outside the app (scripts, benchmarks)."""
+    if _client is None:
+        init_client()
+    return _client
 
 
-async def generate_study_guide(chunks: list[str], subject: str | None = None) -> dict:
-    """Generate a structured study guide from document chunks."""
-    context = "\n---\n".join(chunks)
-    subject_hint = f" on the subject of {subject}" if subject else ""
+def _backoff_delay(attempt: int, retry_after: str | None) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's retry-after."""
+    settings = get_settings()
+    ceiling = min(settings.llm_backoff_max_seconds, settings.llm_backoff_base_seconds * 2 ** attempt)
+    delay = random.uniform(0, ceiling)
+    try:
+        return max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        return delay
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float | None:
+    """Seconds to wait before retrying after `exc`, or None if it should be raised."""
+    if attempt >= get_settings().llm_max_retries:
+        return None
+    if isinstance(exc, APIStatusError) and exc.status_code in RETRYABLE_STATUS_CODES:
+        return _backoff_delay(attempt, exc.response.headers.get("retry-after"))
+    if isinstance(exc, APIConnectionError):
+        return _backoff_delay(attempt, None)
+    return None
+
+
+async def create_message(kind: str = "other", **kwargs) -> Message:
+    """messages.create with the global concurrency cap, per-call timeout and retries. `kind` labels metrics."""
+    settings = get_settings()
+    client = get_client()
+    attempt = 0
+    started_at = time.perf_counter()
+    while True:
+        try:
+            async with _llm_semaphore:
+                message = await client.messages.create(timeout=settings.llm_timeout_seconds, **kwargs)
+            LLM_REQUEST_SECONDS.labels(kind, "complete").observe(time.perf_counter() - started_at)
+            _record_usage(kind, message.usage)
+            return message
+        except (APIStatusError, APIConnectionError) as exc:
+            delay = _retry_delay(exc, attempt)
+            if delay is None:
+                raise
+
+        logger.warning("Anthropic call failed (attempt %d), retrying in %.2fs", attempt + 1, delay)
+        LLM_RETRIES.inc()
+        await asyncio.sleep(delay)
+        attempt += 1
 
+
+async def stream_text(kind: str = "other", **kwargs) -> AsyncIterator[str]:
+    """messages.stream yielding text deltas; retries as create_message, but only before the first delta."""
+    settings = get_settings()
     client = get_client()
-    response = await client.messages.create(
-        model="claude-haiku-4-5-20251001",
-        max_tokens=4096,
-        messages=[
-            {
-                "role": "user",
-                "content": f"""Based ONLY on the following lecture material{subject_hint}, create a comprehensive study guide.
+    attempt = 0
+    started_at = time.perf_counter()
+    while True:
+        started = False
+        try:
+            async with _llm_semaphore:
+                async with client.messages.stream(timeout=settings.llm_timeout_seconds, **kwargs) as stream:
+                    async for text in stream.text_stream:
+                        if not started:
+                            LLM_FIRST_TOKEN_SECONDS.labels(kind).observe(time.perf_counter() - started_at)
+                        started = True
+                        yield text
+                    message = await stream.get_final_message()
+            LLM_REQUEST_SECONDS.labels(kind, "stream").observe(time.perf_counter() - started_at)
+            _record_usage(kind, message.usage)
+            return
+        except (APIStatusError, APIConnectionError) as exc:
+            delay = None if started else _retry_delay(exc, attempt)
+            if delay is None:
+                raise
+
+        logger.warning("Anthropic stream failed (attempt %d), retrying in %.2fs", attempt + 1, delay)
+        LLM_RETRIES.inc()
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+# --- Batching ---
+
+
+def batch_chunks(chunks: list[str], max_tokens: int | None = None) -> list[list[str]]:
+    """Pack consecutive chunks into batches of at most `max_tokens` tokens."""
+    max_tokens = max_tokens or get_settings().generation_batch_tokens
+    batches: list[list[str]] = []
+    current: list[str] = []
+    used = 0
+    for chunk in chunks:
+        tokens = count_tokens(chunk)
+        if current and used + tokens > max_tokens:
+            batches.append(current)
+            current, used = [], 0
+        current.append(chunk)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def split_count(count: int, batches: list[list[str]]) -> list[int]:
+    """Distribute `count` items across batches in proportion to their length (largest remainder)."""
+    sizes = [sum(len(c) for c in batch) for batch in batches]
+    total = sum(sizes) or 1
+    shares = [count * size / total for size in sizes]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(len(batches)), key=lambda i: shares[i] - counts[i], reverse=True)
+    for i in by_remainder[: count - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+async def _fan_out(items: list[T], fn: Callable[[T], Awaitable]) -> list:
+    """Run `fn` over items concurrently, at most generation_concurrency at a time."""
+    semaphore = asyncio.Semaphore(get_settings().generation_concurrency)
+
+    async def run(item: T):
+        async with semaphore:
+            return await fn(item)
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+async def _fan_in(streams: list[AsyncIterator[T]]) -> AsyncIterator[T]:
+    """Consume streams concurrently (at most generation_concurrency at a time), yielding items as they arrive."""
+    semaphore = asyncio.Semaphore(get_settings().generation_concurrency)
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    async def pump(stream: AsyncIterator[T]) -> None:
+        try:
+            async with semaphore:
+                async for item in stream:
+                    await queue.put(item)
+            await queue.put(finished)
+        except Exception as exc:
+            await queue.put(exc)
+
+    tasks = [asyncio.create_task(pump(stream)) for stream in streams]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            item = await queue.get()
+            if item is finished:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# --- Claude calls ---
+
+Prompt = str | list[dict]  # user message content: plain text, or content blocks
+
+
+def _with_material(chunks: list[str], instructions: str) -> list[dict]:
+    """Material first as a cacheable block, then the instructions; identical material shares one cache entry."""
+    material = "\n---\n".join(chunks)
+    return [
+        {
+            "type": "text",
+            "text": f"--- LECTURE MATERIAL ---\n{material}\n--- END MATERIAL ---",
+            "cache_control": {"type": "ephemeral"},
+        },
+        {"type": "text", "text": instructions},
+    ]
+
+
+async def _complete(prompt: Prompt, kind: str) -> str:
+    response = await create_message(
+        kind,
+        model=MODEL,
+        max_tokens=MAX_OUTPUT_TOKENS,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    return response.content[0].text
+
+
+def _stream_prompt(prompt: Prompt, kind: str) -> AsyncIterator[str]:
+    return stream_text(
+        kind,
+        model=MODEL,
+        max_tokens=MAX_OUTPUT_TOKENS,
+        messages=[{"role": "user", "content": prompt}],
+    )
+
+
+async def _warm_cache(batches: list[list[str]]) -> None:
+    """Write each batch's material to the prompt cache with a one-token call."""
+
+    async def warm(batch: list[str]) -> None:
+        await create_message(
+            "cache_warm",
+            model=MODEL,
+            max_tokens=1,
+            messages=[{"role": "user", "content": _with_material(batch, "Reply with OK.")}],
+        )
+
+    await _fan_out(batches, warm)
+
+
+async def _stream_objects(prompt: Prompt, kind: str) -> AsyncIterator[tuple[ObjectStream, dict]]:
+    """Yield (parser, object) for each element of the first JSON array in the response."""
+    parser = ObjectStream()
+    async for text in _stream_prompt(prompt, kind):
+        for obj in parser.feed(text):
+            yield parser, obj
+
+
+async def _complete_objects(prompt: Prompt, kind: str, count: int) -> tuple[ObjectStream, list[dict]]:
+    """
+    The objects of the first JSON array in the reply, keeping every complete
+    one even if the reply is cut off at max_tokens. While it is cut off short
+    of `count` objects, the reply up to its last complete object is sent back
+    as the start of Claude's turn and the continuation is parsed on from there.
+    """
+    parser = ObjectStream()
+    objects: list[dict] = []
+    reply = ""
+    for round_no in range(MAX_CONTINUATIONS + 1):
+        messages = [{"role": "user", "content": prompt}]
+        if reply:
+            messages.append({"role": "assistant", "content": reply})
+        response = await create_message(kind, model=MODEL, max_tokens=MAX_OUTPUT_TOKENS, messages=messages)
+        text = "".join(block.text for block in response.content if block.type == "text")
+        completed = parser.feed(text)
+        objects.extend(completed)
+        reply += text
+        if response.stop_reason != "max_tokens" or parser.closed:
+            break
+
+        # Cut off mid-array: stop if it's enough, or if the last round added nothing
+        continuing = (
+            len(objects) < count
+            and parser.resume_point is not None
+            and round_no < MAX_CONTINUATIONS
+            and (round_no == 0 or bool(completed))
+        )
+        _record_truncation(kind, len(completed), continuing)
+        logger.warning(
+            "%s reply hit max_tokens after %d of %d items%s",
+            kind, len(objects), count, ", continuing" if continuing else "",
+        )
+        if not continuing:
+            break
+        # The reply ends right after a "[" or "}", so it has no trailing whitespace (which the API rejects)
+        reply = reply[:parser.resume_point]
+        parser = ObjectStream()
+        parser.feed(reply)
+    return parser, objects
+
+
+def _part_hint(index: int, total: int) -> str:
+    return f" (part {index + 1} of {total} of a longer document)" if total > 1 else ""
+
+
+# --- Study guides ---
+
+
+def _study_guide_prompt(chunks: list[str], subject_hint: str) -> list[dict]:
+    return _with_material(chunks, f"""Based ONLY on the lecture material above{subject_hint}, create a comprehensive study guide.
 
 Structure it with:
 - A clear title
@@ -38,34 +432,96 @@ Structure it with:
 
 Format the output as markdown.
 
---- LECTURE MATERIAL ---
-{context}
---- END MATERIAL ---
+Respond with ONLY the study guide in markdown format. Do not add information beyond what's in the material.""")
+
+
+def _merge_guides_prompt(partials: list[str], subject_hint: str) -> str:
+    sections = "\n\n=== NEXT PART ===\n\n".join(partials)
+    return f"""The following are study guides for consecutive parts of the same lecture material{subject_hint}.
+
+Merge them into ONE comprehensive study guide with:
+- A clear title
+- Key concepts and definitions
+- Important relationships between topics
+- Summary of main points
+
+Remove repetition between parts, keep every distinct concept, and keep the original order of topics.
+
+--- PARTIAL STUDY GUIDES ---
+{sections}
+--- END PARTIAL STUDY GUIDES ---
+
+Respond with ONLY the merged study guide in markdown format. Do not add information beyond what's in the partial guides."""
+
+
+async def _map_study_guides(batches: list[list[str]], subject_hint: str) -> list[str]:
+    async def run(item) -> str:
+        i, batch = item
+        return await _complete(_study_guide_prompt(batch, subject_hint + _part_hint(i, len(batches))), "study_guide")
+
+    return await _fan_out(list(enumerate(batches)), run)
 
-Respond with ONLY the study guide in markdown format. Do not add information beyond what's in the material.""",
-            }
-        ],
-    )
+
+async def _reduce_guides(partials: list[str], subject_hint: str) -> list[str]:
+    """Merge partial guides hierarchically until the rest fit a single merge call."""
+
+    async def merge(group: list[str]) -> str:
+        if len(group) == 1:
+            return group[0]
+        return await _complete(_merge_guides_prompt(group, subject_hint), "study_guide_merge")
+
+    while len(partials) > 1:
+        groups = batch_chunks(partials)
+        if len(groups) == 1:
+            break
+        if len(groups) == len(partials):
+            groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+        partials = await _fan_out(groups, merge)
+    return partials
+
+
+def study_guide_title(subject: str | None) -> str:
+    return f"Study Guide{f': {subject}' if subject else ''}"
+
+
+async def generate_study_guide(chunks: list[str], subject: str | None = None) -> dict:
+    """Generate a structured study guide from document chunks."""
+    subject_hint = f" on the subject of {subject}" if subject else ""
+    partials = await _map_study_guides(batch_chunks(chunks), subject_hint)
+    partials = await _reduce_guides(partials, subject_hint)
+    if len(partials) == 1:
+        content = partials[0]
+    else:
+        content = await _complete(_merge_guides_prompt(partials, subject_hint), "study_guide_merge")
 
     return {
-        "title": f"Study Guide{f': {subject}' if subject else ''}",
-        "content_markdown": response.content[0].text,
+        "title": study_guide_title(subject),
+        "content_markdown": content,
     }
 
 
-async def generate_flashcards(chunks: list[str], count: int = 20, subject: str | None = None) -> list[dict]:
-    """Generate flashcards from document chunks."""
-    context = "\n---\n".join(chunks)
+async def stream_study_guide(chunks: list[str], subject: str | None = None) -> AsyncIterator[str]:
+    """Stream a study guide as markdown deltas. For multi-batch documents only the final merge streams."""
     subject_hint = f" on the subject of {subject}" if subject else ""
+    batches = batch_chunks(chunks)
+    if len(batches) == 1:
+        prompt, kind = _study_guide_prompt(batches[0], subject_hint), "study_guide"
+    else:
+        partials = await _reduce_guides(await _map_study_guides(batches, subject_hint), subject_hint)
+        if len(partials) == 1:
+            yield partials[0]
+            return
+        prompt, kind = _merge_guides_prompt(partials, subject_hint), "study_guide_merge"
+
+    async for text in _stream_prompt(prompt, kind):
+        yield text
 
-    client = get_client()
-    response = await client.messages.create(
-        model="claude-haiku-4-5-20251001",
-        max_tokens=4096,
-        messages=[
-            {
-                "role": "user",
-                "content": f"""Based ONLY on the following lecture material{subject_hint}, generate exactly {count} flashcards for exam preparation.
+
+# --- Flashcards ---
+
+
+def _flashcards_prompt(chunks: list[str], count: int, subject_hint: str) -> list[dict]:
+    return _with_material(chunks, f"""Based ONLY on the lecture material above{subject_hint}, generate exactly {count} flashcards for exam preparation.
 
 Each flashcard should test a specific concept, definition, or relationship from the material.
 
@@ -80,38 +536,78 @@ Example format:
   ...
 ]
 
---- LECTURE MATERIAL ---
-{context}
---- END MATERIAL ---
+Respond with ONLY valid JSON. No markdown fences, no explanation.""")
 
-Respond with ONLY valid JSON. No markdown fences, no explanation.""",
-            }
-        ],
-    )
 
-    text = response.content[0].text.strip()
-    # Strip markdown fences if present
-    if text.startswith("```"):
-        text = text.split("\n", 1)[1]
-    if text.endswith("```"):
-        text = text.rsplit("```", 1)[0]
+class _Deduper:
+    """Accepts items whose `key` hasn't been seen yet (case/whitespace-insensitive)."""
 
-    return json.loads(text.strip())
+    def __init__(self, key: str):
+        self._key = key
+        self._seen: set[str] = set()
 
+    def accept(self, item: dict) -> bool:
+        normalized = " ".join(str(item.get(self._key, "")).lower().split())
+        if normalized in self._seen:
+            return False
+        self._seen.add(normalized)
+        return True
 
-async def generate_quiz(chunks: list[str], count: int = 10, subject: str | None = None) -> dict:
-    """Generate a multiple-choice quiz from document chunks."""
-    context = "\n---\n".join(chunks)
+
+def _dedupe(items: list[dict], key: str, count: int) -> list[dict]:
+    """Drop items whose `key` repeats an earlier one and cap at `count`."""
+    deduper = _Deduper(key)
+    return [item for item in items if deduper.accept(item)][:count]
+
+
+def _plan(chunks: list[str], count: int) -> tuple[int, list[tuple[int, list[str], int]]]:
+    """Split chunks into batches and assign each an item count. Returns (batch_count, [(index, batch, n)])."""
+    batches = batch_chunks(chunks)
+    counts = split_count(count, batches)
+    return len(batches), [(i, batch, n) for i, (batch, n) in enumerate(zip(batches, counts)) if n > 0]
+
+
+async def generate_flashcards(chunks: list[str], count: int = 20, subject: str | None = None) -> list[dict]:
+    """Generate flashcards from document chunks."""
     subject_hint = f" on the subject of {subject}" if subject else ""
+    total, work = _plan(chunks, count)
+
+    async def run(item) -> list[dict]:
+        i, batch, n = item
+        _, cards = await _complete_objects(
+            _flashcards_prompt(batch, n, subject_hint + _part_hint(i, total)), "flashcards", n
+        )
+        return cards
+
+    results = await _fan_out(work, run)
+    return _dedupe([card for cards in results for card in cards], "front", count)
+
+
+async def stream_flashcards(chunks: list[str], count: int = 20, subject: str | None = None) -> AsyncIterator[dict]:
+    """Stream flashcards one at a time as each completes, across all batches."""
+    subject_hint = f" on the subject of {subject}" if subject else ""
+    total, work = _plan(chunks, count)
+    streams = [
+        _stream_objects(_flashcards_prompt(batch, n, subject_hint + _part_hint(i, total)), "flashcards")
+        for i, batch, n in work
+    ]
+
+    deduper = _Deduper("front")
+    emitted = 0
+    async for _, card in _fan_in(streams):
+        if not deduper.accept(card):
+            continue
+        yield card
+        emitted += 1
+        if emitted >= count:
+            return
+
+
+# --- Quizzes ---
 
-    client = get_client()
-    response = await client.messages.create(
-        model="claude-haiku-4-5-20251001",
-        max_tokens=4096,
-        messages=[
-            {
-                "role": "user",
-                "content": f"""Based ONLY on the following lecture material{subject_hint}, generate a multiple-choice quiz with {count} questions.
+
+def _quiz_prompt(chunks: list[str], count: int, subject_hint: str) -> list[dict]:
+    return _with_material(chunks, f"""Based ONLY on the lecture material above{subject_hint}, generate a multiple-choice quiz with {count} questions.
 
 Each question should have 4 options with exactly one correct answer.
 
@@ -129,19 +625,80 @@ Respond with ONLY a JSON object:
   ]
 }}
 
---- LECTURE MATERIAL ---
-{context}
---- END MATERIAL ---
+Respond with ONLY valid JSON. No markdown fences, no explanation.""")
 
-Respond with ONLY valid JSON. No markdown fences, no explanation.""",
-            }
-        ],
-    )
 
-    text = response.content[0].text.strip()
-    if text.startswith("```"):
-        text = text.split("\n", 1)[1]
-    if text.endswith("```"):
-        text = text.rsplit("```", 1)[0]
+async def generate_quiz(chunks: list[str], count: int = 10, subject: str | None = None) -> dict:
+    """Generate a multiple-choice quiz from document chunks."""
+    subject_hint = f" on the subject of {subject}" if subject else ""
+    total, work = _plan(chunks, count)
+
+    async def run(item) -> tuple[str | None, list[dict]]:
+        i, batch, n = item
+        parser, questions = await _complete_objects(
+            _quiz_prompt(batch, n, subject_hint + _part_hint(i, total)), "quiz", n
+        )
+        return parser.title, questions
+
+    results = await _fan_out(work, run)
+    if len(results) == 1 and results[0][0]:
+        title = results[0][0]
+    else:
+        title = f"Quiz: {subject}" if subject else results[0][0] or "Quiz"
+    return {
+        "title": title,
+        "questions": _dedupe([q for _, questions in results for q in questions], "question", count),
+    }
+
+
+async def stream_quiz(
+    chunks: list[str], count: int = 10, subject: str | None = None
+) -> AsyncIterator[tuple[str | None, dict]]:
+    """Stream quiz questions one at a time. Yields (title, question); title is None until Claude has sent one."""
+    subject_hint = f" on the subject of {subject}" if subject else ""
+    total, work = _plan(chunks, count)
+    streams = [
+        _stream_objects(_quiz_prompt(batch, n, subject_hint + _part_hint(i, total)), "quiz")
+        for i, batch, n in work
+    ]
+
+    title = f"Quiz: {subject}" if subject and total > 1 else None
+    deduper = _Deduper("question")
+    emitted = 0
+    async for parser, question in _fan_in(streams):
+        if not deduper.accept(question):
+            continue
+        title = title or parser.title
+        yield title, question
+        emitted += 1
+        if emitted >= count:
+            return
+
 
-    return json.loads(text.strip())
+# --- Everything at once ---
+
+GENERATION_KINDS = ("study_guide", "flashcards", "quiz")
+
+
+async def generate_all(
+    chunks: list[str],
+    subject: str | None = None,
+    kinds: Collection[str] = GENERATION_KINDS,
+    flashcard_count: int = 20,
+    question_count: int = 10,
+) -> dict:
+    """
+    Generate several kinds of material for one document concurrently. The
+    material is written to the prompt cache first, so every generation reads
+    it instead of paying for it again. Returns {kind: result}.
+    """
+    generators = {
+        "study_guide": lambda: generate_study_guide(chunks, subject),
+        "flashcards": lambda: generate_flashcards(chunks, flashcard_count, subject),
+        "quiz": lambda: generate_quiz(chunks, question_count, subject),
+    }
+    kinds = [kind for kind in GENERATION_KINDS if kind in kinds]
+    if len(kinds) > 1:
+        await _warm_cache(batch_chunks(chunks))
+    results = await asyncio.gather(*(generators[kind]() for kind in kinds))
+    return dict(zip(kinds, results))
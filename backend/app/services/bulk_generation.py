@@ -0,0 +1,521 @@
+"""
+Bulk generation — pre-generates material for every document of a subject.
+
+A BulkGenerationJob names the kinds of material to generate and has one
+BulkGenerationItem per ready document of the subject. Workers claim jobs
+with a lease (heartbeat_at), like ingestion jobs, and work through the
+pending items a few documents at a time (the job's concurrency; each
+document's own LLM calls are still bounded by generation_concurrency and the
+client-wide cap). Each document's material is committed in the same
+transaction that marks its item done, so the items are the checkpoint: a job
+that was running when its worker died is claimed again once its lease
+expires and carries on with the items still pending, without duplicating
+what was already saved.
+
+Documents that already have current material of every requested kind
+(created since the document's chunks last changed) are skipped unless the
+job asks for a refresh.
+"""
+
+import asyncio
+import logging
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, field, fields
+from datetime import timedelta
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.database import async_session
+from app.core.instrumentation import untrack
+from app.core.metrics import BULK_GENERATION_DOCUMENTS
+from app.models.models import (
+    BulkGenerationItem,
+    BulkGenerationJob,
+    ChunkSet,
+    Document,
+    DocumentChunk,
+    Flashcard,
+    Quiz,
+    StudyGuide,
+    utcnow,
+)
+from app.services.ai_service import GENERATION_KINDS, Usage, generate_all, track_usage
+from app.services.collection_versions import FLASHCARDS, QUIZZES, bump_versions
+from app.services.generation_cache import cache_key, generation_cache
+
+logger = logging.getLogger(__name__)
+
+MATERIAL_MODELS = {"study_guide": StudyGuide, "flashcards": Flashcard, "quiz": Quiz}
+
+
+# --- Generating one document's material ---
+
+
+@dataclass
+class GeneratedMaterial:
+    study_guide: StudyGuide | None = None
+    flashcards: list[Flashcard] = field(default_factory=list)
+    quiz: Quiz | None = None
+    cached: list[str] = field(default_factory=list)  # kinds served from the generation cache
+
+
+async def ready_document_ids(db: AsyncSession, user_id: str, subject: str) -> list[str]:
+    result = await db.execute(
+        select(Document.id)
+        .where(Document.user_id == user_id, Document.subject == subject, Document.status == "ready")
+        .order_by(Document.created_at, Document.id)
+    )
+    return list(result.scalars().all())
+
+
+async def load_chunks(db: AsyncSession, chunk_set_id: str) -> list[str]:
+    result = await db.execute(
+        select(DocumentChunk.content)
+        .where(DocumentChunk.chunk_set_id == chunk_set_id)
+        .order_by(DocumentChunk.chunk_index)
+    )
+    return list(result.scalars().all())
+
+
+@dataclass
+class MaterialPlan:
+    """Cache keys and cached results for one document's material, looked up before generating."""
+    subject: str | None
+    keys: dict[str, str]
+    cached: dict[str, dict]
+    flashcard_count: int
+    question_count: int
+
+
+async def plan_material(
+    db: AsyncSession,
+    subject: str | None,
+    chunks: list[str],
+    kinds=GENERATION_KINDS,
+    flashcard_count: int = 20,
+    question_count: int = 10,
+    refresh: bool = False,
+) -> MaterialPlan:
+    keys = {
+        "study_guide": cache_key("study_guide", chunks, subject),
+        "flashcards": cache_key("flashcards", chunks, subject, flashcard_count),
+        "quiz": cache_key("quiz", chunks, subject, question_count),
+    }
+    keys = {kind: key for kind, key in keys.items() if kind in kinds}
+    cached = {kind: await generation_cache.lookup(db, key, refresh) for kind, key in keys.items()}
+    return MaterialPlan(
+        subject, keys, {kind: result for kind, result in cached.items() if result is not None},
+        flashcard_count, question_count,
+    )
+
+
+async def run_plan(plan: MaterialPlan, chunks: list[str]) -> dict[str, dict]:
+    """Generate the kinds the cache didn't have. Needs no session, so none is held during the LLM calls."""
+    return await generate_all(
+        chunks,
+        plan.subject,
+        kinds=[kind for kind in plan.keys if kind not in plan.cached],
+        flashcard_count=plan.flashcard_count,
+        question_count=plan.question_count,
+    )
+
+
+async def add_material(
+    db: AsyncSession, plan: MaterialPlan, generated: dict[str, dict], document_id: str, user_id: str
+) -> GeneratedMaterial:
+    """Cache what was generated and add the material to the session; the caller commits."""
+    for kind, result in generated.items():
+        await generation_cache.store(db, kind, plan.keys[kind], result)
+    results = {**plan.cached, **generated}
+    material = GeneratedMaterial(cached=list(plan.cached))
+
+    if "study_guide" in results:
+        material.study_guide = StudyGuide(
+            document_id=document_id,
+            title=results["study_guide"]["title"],
+            content_markdown=results["study_guide"]["content_markdown"],
+        )
+        db.add(material.study_guide)
+    if "flashcards" in results:
+        material.flashcards = [
+            Flashcard(
+                document_id=document_id,
+                user_id=user_id,
+                front=card["front"],
+                back=card["back"],
+                topic=card.get("topic"),
+            )
+            for card in results["flashcards"]
+        ]
+        db.add_all(material.flashcards)
+    if "quiz" in results:
+        material.quiz = Quiz(
+            document_id=document_id,
+            user_id=user_id,
+            title=results["quiz"]["title"],
+            questions=results["quiz"]["questions"],
+        )
+        db.add(material.quiz)
+
+    listed = [collection for kind, collection in (("flashcards", FLASHCARDS), ("quiz", QUIZZES)) if kind in results]
+    await bump_versions(db, user_id, *listed)
+    return material
+
+
+async def generate_material(
+    db: AsyncSession,
+    doc: Document,
+    user_id: str,
+    chunks: list[str],
+    kinds=GENERATION_KINDS,
+    flashcard_count: int = 20,
+    question_count: int = 10,
+    refresh: bool = False,
+) -> GeneratedMaterial:
+    """
+    Generate `kinds` of material for `doc` in one go (reusing cached results)
+    and add it to the session; the caller commits.
+    """
+    plan = await plan_material(db, doc.subject, chunks, kinds, flashcard_count, question_count, refresh)
+    return await add_material(db, plan, await run_plan(plan, chunks), doc.id, user_id)
+
+
+async def has_current_material(db: AsyncSession, doc: Document, kinds) -> bool:
+    """Whether `doc` has material of every kind in `kinds` made since its content last changed."""
+    since = doc.created_at
+    if doc.chunk_set_id:
+        # A replaced document points at a newer set; material made before that is stale
+        set_created = await db.scalar(select(ChunkSet.created_at).where(ChunkSet.id == doc.chunk_set_id))
+        if set_created and set_created > since:
+            since = set_created
+    for kind in kinds:
+        model = MATERIAL_MODELS[kind]
+        found = await db.scalar(
+            select(model.id).where(model.document_id == doc.id, model.created_at >= since).limit(1)
+        )
+        if found is None:
+            return False
+    return True
+
+
+# --- Job runner ---
+
+
+class BulkGenerationQueue:
+    def __init__(self):
+        self._semaphore: asyncio.Semaphore | None = None
+        self._active: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._poller: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._semaphore = asyncio.Semaphore(get_settings().bulk_generation_max_jobs)
+        self._poller = asyncio.create_task(self._poll_forever())
+
+    async def stop(self) -> None:
+        # Cancelled jobs keep status "running" and are re-claimed after their lease expires
+        tasks = [*self._tasks, self._poller] if self._poller else list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def submit(self, job_id: str) -> None:
+        """Schedule a job on this worker (no-op if it is already scheduled here)."""
+        if job_id in self._active:
+            return
+        self._active.add(job_id)
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _poll_forever(self) -> None:
+        settings = get_settings()
+        while True:
+            try:
+                for job_id in await self._claimable_job_ids():
+                    self.submit(job_id)
+            except Exception:
+                logger.exception("Bulk generation poll failed")
+            await asyncio.sleep(settings.bulk_generation_poll_seconds)
+
+    async def _claimable_job_ids(self) -> list[str]:
+        async with async_session() as db:
+            result = await db.execute(
+                select(BulkGenerationJob.id)
+                .where(_claimable())
+                .order_by(BulkGenerationJob.created_at)
+                .limit(50)
+            )
+            return list(result.scalars().all())
+
+    async def _run(self, job_id: str) -> None:
+        untrack()  # submit() may be called from a request, whose context this task copied
+        try:
+            async with self._semaphore:
+                await self._process(job_id)
+        finally:
+            self._active.discard(job_id)
+
+    async def _process(self, job_id: str) -> None:
+        settings = get_settings()
+        claim = await _claim(job_id)
+        if claim is None:
+            return  # finished, cancelled, or claimed by another worker
+
+        if claim.attempts > settings.bulk_generation_max_attempts:
+            await _finish(job_id, "error", error="Too many failed attempts")
+            return
+
+        cancelled = asyncio.Event()
+        heartbeat = asyncio.create_task(_heartbeat(job_id, cancelled))
+        try:
+            await _run_items(claim, cancelled)
+            if not cancelled.is_set():
+                await _finish(job_id, "done")
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("Bulk generation job %s failed", job_id)
+            if claim.attempts >= settings.bulk_generation_max_attempts:
+                await _finish(job_id, "error", error=str(exc))
+            else:
+                await _update_job(job_id, status="queued", error=str(exc))
+        finally:
+            heartbeat.cancel()
+
+
+def _claimable():
+    stale = utcnow() - timedelta(seconds=get_settings().bulk_generation_lease_seconds)
+    return or_(
+        BulkGenerationJob.status == "queued",
+        and_(BulkGenerationJob.status == "running", BulkGenerationJob.heartbeat_at < stale),
+    )
+
+
+async def _claim(job_id: str):
+    """Atomically mark a job as running on this worker. Returns None if it isn't claimable."""
+    now = utcnow()
+    async with async_session() as db:
+        result = await db.execute(
+            update(BulkGenerationJob)
+            .where(BulkGenerationJob.id == job_id, _claimable())
+            .values(
+                status="running",
+                attempts=BulkGenerationJob.attempts + 1,
+                started_at=now,
+                heartbeat_at=now,
+                updated_at=now,
+            )
+            .returning(
+                BulkGenerationJob.id,
+                BulkGenerationJob.user_id,
+                BulkGenerationJob.kinds,
+                BulkGenerationJob.flashcard_count,
+                BulkGenerationJob.question_count,
+                BulkGenerationJob.concurrency,
+                BulkGenerationJob.refresh,
+                BulkGenerationJob.attempts,
+            )
+        )
+        claim = result.first()
+        await db.commit()
+    return claim
+
+
+async def _heartbeat(job_id: str, cancelled: asyncio.Event) -> None:
+    """Renew the lease until the job stops running; sets `cancelled` if it was cancelled meanwhile."""
+    interval = get_settings().bulk_generation_lease_seconds / 3
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with async_session() as db:
+                result = await db.execute(
+                    update(BulkGenerationJob)
+                    .where(BulkGenerationJob.id == job_id, BulkGenerationJob.status == "running")
+                    .values(heartbeat_at=utcnow(), updated_at=utcnow())
+                    .returning(BulkGenerationJob.id)
+                )
+                running = result.first() is not None
+                await db.commit()
+        except Exception:
+            # Keep renewing: if the lease lapsed, another worker would start the same job
+            logger.exception("Heartbeat for bulk generation job %s failed", job_id)
+            continue
+        if not running:
+            cancelled.set()
+            return
+
+
+async def _update_job(job_id: str, **values) -> None:
+    async with async_session() as db:
+        await db.execute(
+            update(BulkGenerationJob).where(BulkGenerationJob.id == job_id).values(updated_at=utcnow(), **values)
+        )
+        await db.commit()
+
+
+async def _run_items(claim, cancelled: asyncio.Event) -> None:
+    """Work through the job's pending documents, `claim.concurrency` at a time, until none are left."""
+    async with async_session() as db:
+        result = await db.execute(
+            select(BulkGenerationItem.document_id)
+            .where(BulkGenerationItem.job_id == claim.id, BulkGenerationItem.status == "pending")
+            .order_by(BulkGenerationItem.position)
+        )
+        pending = deque(result.scalars().all())
+
+    async def worker() -> None:
+        while pending and not cancelled.is_set():
+            document_id = pending.popleft()
+            if not await _run_item(claim, document_id):
+                pending.append(document_id)  # failed with attempts left: retry after the rest
+
+    await asyncio.gather(*(worker() for _ in range(min(claim.concurrency, len(pending)))))
+
+
+async def _run_item(claim, document_id: str) -> bool:
+    """Generate one document's material and checkpoint it. Returns False if it should be retried."""
+    item = and_(BulkGenerationItem.job_id == claim.id, BulkGenerationItem.document_id == document_id)
+    try:
+        # Sessions are only held around the reads and the checkpoint, never across the LLM calls
+        plan = chunks = None
+        async with async_session() as db:
+            doc = await db.get(Document, document_id)
+            if doc is None or doc.status != "ready" or doc.chunk_set_id is None:
+                pass  # deleted, or being re-ingested since the job was queued
+            elif claim.refresh or not await has_current_material(db, doc, claim.kinds):
+                chunks = await load_chunks(db, doc.chunk_set_id)
+                if chunks:
+                    plan = await plan_material(
+                        db, doc.subject, chunks, claim.kinds,
+                        claim.flashcard_count, claim.question_count, claim.refresh,
+                    )
+
+        status, usage, generated = "skipped", None, None
+        if plan is not None:
+            with track_usage() as totals:
+                generated = await run_plan(plan, chunks)
+            status, usage = "done", asdict(totals)
+
+        async with async_session() as db:
+            if generated is not None:
+                # The document may have been deleted during generation; the lock keeps it until commit
+                if await db.scalar(
+                    select(Document.id).where(Document.id == document_id).with_for_update(key_share=True)
+                ) is None:
+                    return True
+                await add_material(db, plan, generated, document_id, claim.user_id)
+
+            # The material and the checkpoint are committed together, and only once per item
+            checkpoint = await db.execute(
+                update(BulkGenerationItem)
+                .where(item, BulkGenerationItem.status == "pending")
+                .values(status=status, usage=usage, error=None, finished_at=utcnow())
+                .returning(BulkGenerationItem.document_id)
+            )
+            if checkpoint.first() is None:
+                await db.rollback()
+                return True
+            # A job that keeps making progress is not failing, however often its worker restarts
+            await db.execute(update(BulkGenerationJob).where(BulkGenerationJob.id == claim.id).values(attempts=1))
+            await db.commit()
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        logger.exception("Bulk generation of document %s (job %s) failed", document_id, claim.id)
+        async with async_session() as db:
+            attempts = await db.scalar(
+                update(BulkGenerationItem)
+                .where(item)
+                .values(attempts=BulkGenerationItem.attempts + 1, error=str(exc))
+                .returning(BulkGenerationItem.attempts)
+            )
+            if attempts is None:
+                return True  # the document was deleted
+            give_up = attempts >= get_settings().bulk_generation_max_attempts
+            if give_up:
+                await db.execute(
+                    update(BulkGenerationItem)
+                    .where(item, BulkGenerationItem.status == "pending")
+                    .values(status="error", finished_at=utcnow())
+                )
+            await db.commit()
+        if give_up:
+            BULK_GENERATION_DOCUMENTS.labels("error").inc()
+        return give_up
+
+    BULK_GENERATION_DOCUMENTS.labels(status).inc()
+    return True
+
+
+async def _finish(job_id: str, status: str, error: str | None = None) -> None:
+    async with async_session() as db:
+        # A job cancelled while it ran stays cancelled
+        await db.execute(
+            update(BulkGenerationJob)
+            .where(BulkGenerationJob.id == job_id, BulkGenerationJob.status == "running")
+            .values(status=status, error=error, finished_at=utcnow(), updated_at=utcnow())
+        )
+        await db.commit()
+
+
+# --- Reporting ---
+
+
+async def job_report(db: AsyncSession, job: BulkGenerationJob) -> dict:
+    """Job status with per-status document counts, token usage, throughput and an ETA."""
+    rows = (
+        await db.execute(
+            select(
+                BulkGenerationItem.document_id,
+                BulkGenerationItem.status,
+                BulkGenerationItem.error,
+                BulkGenerationItem.usage,
+                BulkGenerationItem.finished_at,
+            ).where(BulkGenerationItem.job_id == job.id)
+        )
+    ).all()
+    counts = Counter(row.status for row in rows)
+    usage = {name: sum((row.usage or {}).get(name, 0) for row in rows) for name in (f.name for f in fields(Usage))}
+
+    # Throughput over the current run only, counting documents that were actually generated (or failed);
+    # skips are near-instant and would make the ETA optimistic
+    elapsed = per_minute = eta = None
+    if job.started_at:
+        elapsed = ((job.finished_at or utcnow()) - job.started_at).total_seconds()
+        generated = sum(
+            1 for row in rows
+            if row.status in ("done", "error") and row.finished_at and row.finished_at >= job.started_at
+        )
+        if generated and elapsed > 0:
+            per_minute = generated / elapsed * 60
+            if job.status in ("queued", "running"):
+                eta = counts["pending"] / per_minute * 60
+
+    return {
+        "id": job.id,
+        "subject": job.subject,
+        "kinds": job.kinds,
+        "status": job.status,
+        "total": job.total,
+        "pending": counts["pending"],
+        "done": counts["done"],
+        "skipped": counts["skipped"],
+        "failed": counts["error"],
+        "concurrency": job.concurrency,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "elapsed_seconds": round(elapsed, 1) if elapsed is not None else None,
+        "documents_per_minute": round(per_minute, 2) if per_minute is not None else None,
+        "eta_seconds": round(eta) if eta is not None else None,
+        "usage": usage,
+        "failures": [{"document_id": row.document_id, "error": row.error} for row in rows if row.status == "error"],
+    }
+
+
+bulk_generation_queue = BulkGenerationQueue()
@@ -0,0 +1,86 @@
+"""
+Bulk persistence for high-volume rows (document chunks and their embeddings).
+
+On asyncpg this uses binary COPY, one round trip per batch. Other drivers
+fall back to batched multi-row INSERTs. Each batch is committed on its own,
+so a long ingest never holds one giant transaction open.
+"""
+
+import logging
+import time
+from collections.abc import Awaitable, Callable, Iterable, Sequence
+from dataclasses import dataclass
+from itertools import islice
+
+from pgvector.asyncpg import register_vector
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Table, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+@dataclass
+class BulkInsertStats:
+    rows: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+async def bulk_insert(
+    db: AsyncSession,
+    table: Table,
+    columns: Sequence[str],
+    records: Iterable[Sequence],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_batch: Callable[[int], Awaitable[None]] | None = None,
+) -> BulkInsertStats:
+    """
+    Insert `records` (tuples in `columns` order) into `table`, committing after
+    every batch. `on_batch` is awaited with the running row count after each commit.
+    """
+    stats = BulkInsertStats()
+    started = time.perf_counter()
+
+    records = iter(records)
+    while batch := list(islice(records, batch_size)):
+        await _write_batch(db, table, columns, batch)
+        await db.commit()
+        stats.rows += len(batch)
+        stats.batches += 1
+        if on_batch:
+            await on_batch(stats.rows)
+
+    stats.seconds = time.perf_counter() - started
+    logger.info(
+        "Inserted %d rows into %s in %d batches (%.2fs, %.0f rows/s)",
+        stats.rows, table.name, stats.batches, stats.seconds, stats.rows_per_second,
+    )
+    return stats
+
+
+async def _write_batch(db: AsyncSession, table: Table, columns: Sequence[str], batch: list[Sequence]) -> None:
+    conn = await db.connection()
+    if conn.dialect.driver != "asyncpg":
+        await conn.execute(insert(table), [dict(zip(columns, record)) for record in batch])
+        return
+
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+    has_vectors = any(isinstance(table.c[name].type, Vector) for name in columns)
+
+    # COPY is binary, so pgvector's codec is needed for embedding columns. It is
+    # reset afterwards because the ORM binds vectors as text on the same connection.
+    if has_vectors:
+        await register_vector(driver)
+    try:
+        await driver.copy_records_to_table(table.name, records=batch, columns=list(columns))
+    finally:
+        if has_vectors:
+            await driver.reset_type_codec("vector")
@@ -0,0 +1,80 @@
+"""
+Chunk store — reference-counted ChunkSets shared between identical uploads.
+
+Chunks belong to a ChunkSet keyed by the sha256 of the PDF, not to a
+Document. Uploading a PDF that already has a set just takes another
+reference, so extraction, chunking and storage scale with unique material.
+"""
+
+from dataclasses import dataclass
+
+from sqlalchemy import delete, literal_column, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import ChunkSet, IngestionJob, new_id, utcnow
+
+INGEST_CANCELLED = "Cancelled: the document was deleted"
+
+
+@dataclass
+class ChunkSetRef:
+    id: str
+    status: str
+    page_count: int | None
+    chunk_count: int
+    needs_ingest: bool  # True if the caller must enqueue an ingestion job for this set
+
+
+async def acquire_chunk_set(db: AsyncSession, content_hash: str, refs: int = 1) -> ChunkSetRef:
+    """
+    Take `refs` references on the set for `content_hash`, creating it if this
+    content is new. refs=0 only makes sure the set exists (see retain_chunk_set).
+    """
+    stmt = insert(ChunkSet).values(id=new_id(), content_hash=content_hash, status="processing", ref_count=refs)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ChunkSet.content_hash],
+        set_={"ref_count": ChunkSet.ref_count + refs},
+    ).returning(
+        ChunkSet.id,
+        ChunkSet.status,
+        ChunkSet.page_count,
+        ChunkSet.chunk_count,
+        literal_column("xmax = 0").label("inserted"),  # true for a fresh insert, false on conflict
+    )
+    row = (await db.execute(stmt)).one()
+
+    if row.status == "error":
+        # A previous ingest of this content failed — try again with the new upload
+        await db.execute(update(ChunkSet).where(ChunkSet.id == row.id).values(status="processing"))
+        return ChunkSetRef(row.id, "processing", None, 0, needs_ingest=True)
+
+    return ChunkSetRef(row.id, row.status, row.page_count, row.chunk_count or 0, needs_ingest=row.inserted)
+
+
+async def retain_chunk_set(db: AsyncSession, chunk_set_id: str) -> None:
+    """Take a reference on an existing set."""
+    await db.execute(update(ChunkSet).where(ChunkSet.id == chunk_set_id).values(ref_count=ChunkSet.ref_count + 1))
+
+
+async def release_chunk_set(db: AsyncSession, chunk_set_id: str) -> None:
+    """
+    Drop a reference; the set and its chunks are deleted with the last one. An
+    ingest still queued or running for the set is marked cancelled, and its
+    worker finishes it and removes its files once it finds the set gone.
+    """
+    remaining = (
+        await db.execute(
+            update(ChunkSet)
+            .where(ChunkSet.id == chunk_set_id)
+            .values(ref_count=ChunkSet.ref_count - 1)
+            .returning(ChunkSet.ref_count)
+        )
+    ).scalar_one_or_none()
+    if remaining is not None and remaining <= 0:
+        await db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.chunk_set_id == chunk_set_id, IngestionJob.status.in_(("queued", "running")))
+            .values(error=INGEST_CANCELLED, updated_at=utcnow())
+        )
+        await db.execute(delete(ChunkSet).where(ChunkSet.id == chunk_set_id, ChunkSet.ref_count <= 0))
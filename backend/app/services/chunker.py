@@ -0,0 +1,150 @@
+"""
+Chunker — token-window chunking without a decode per chunk.
+
+Pages are tokenized a block at a time with tiktoken's threaded batch
+encoder. A per-token byte-length table turns token positions into byte
+offsets (a NumPy cumsum), so each chunk is a slice of the original UTF-8
+text instead of a decode of its tokens, and overlaps are never decoded
+twice. The output is identical to decoding each token window.
+
+Each chunk carries the 1-based range of pages (input texts) it spans, for
+citations.
+
+Optionally a chunk's end is snapped back to the last sentence or slide
+(page) break within its final SNAP_WINDOW fraction, so chunks stop at
+natural boundaries instead of mid-sentence or mid-formula.
+"""
+
+import os
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain, islice
+from typing import NamedTuple
+
+import numpy as np
+
+from app.services.tokenizer import get_encoder
+
+ENCODE_BATCH_PAGES = 64
+ENCODE_THREADS = min(8, os.cpu_count() or 1)
+SNAP_WINDOW = 0.2  # fraction of a chunk, at its end, searched for a break
+SNAP_MODES = ("sentence", "slide")
+
+
+class Chunk(NamedTuple):
+    content: str
+    page_start: int  # 1-based, inclusive
+    page_end: int
+
+
+@dataclass(frozen=True)
+class _TokenTables:
+    """Per-token-id lookups, built once per process from the encoder's vocabulary."""
+
+    byte_lengths: np.ndarray  # int64
+    ends_sentence: np.ndarray  # bool: last non-space byte is . ! or ?
+    ends_newline: np.ndarray  # bool
+    starts_space: np.ndarray  # bool: first byte is whitespace
+
+
+@lru_cache
+def token_tables() -> _TokenTables:
+    enc = get_encoder()
+    size = enc.n_vocab
+    byte_lengths = np.zeros(size, dtype=np.int64)
+    ends_sentence = np.zeros(size, dtype=bool)
+    ends_newline = np.zeros(size, dtype=bool)
+    starts_space = np.zeros(size, dtype=bool)
+    for token in range(size):
+        try:
+            raw = enc.decode_single_token_bytes(token)
+        except KeyError:
+            continue  # unused id
+        byte_lengths[token] = len(raw)
+        stripped = raw.rstrip(b" \t")
+        ends_sentence[token] = stripped[-1:] in (b".", b"!", b"?")
+        ends_newline[token] = raw.endswith(b"\n")
+        starts_space[token] = raw[:1].isspace()
+    return _TokenTables(byte_lengths, ends_sentence, ends_newline, starts_space)
+
+
+def _snap_end(
+    tokens: np.ndarray, start: int, end: int, page_ends: list[int], snap: str, tables: _TokenTables, overlap: int
+) -> int:
+    """Pull `end` back to the last break in the final SNAP_WINDOW of the window; keep it if there is none."""
+    lowest = max(start + overlap + 1, end - int((end - start) * SNAP_WINDOW))
+    breaks = [p for p in page_ends if lowest <= p < end]
+    if snap == "sentence" and end < len(tokens):
+        window = tokens[lowest - 1:end]  # break after token i means the chunk ends at i + 1
+        following = tokens[lowest:end + 1]
+        is_break = tables.ends_newline[window] | (tables.ends_sentence[window] & tables.starts_space[following])
+        hits = np.flatnonzero(is_break)
+        if hits.size:
+            breaks.append(lowest + int(hits[-1]))
+    return max(breaks) if breaks else end
+
+
+def iter_token_chunks(
+    texts: Iterable[str],
+    chunk_size: int,
+    overlap: int,
+    snap: str | None = None,
+) -> Iterator[Chunk]:
+    """Yield overlapping chunks of `chunk_size` tokens from the concatenation of `texts` (one per page)."""
+    if snap is not None and snap not in SNAP_MODES:
+        raise ValueError(f"Unknown snap mode {snap!r}")
+    enc = get_encoder()
+    tables = token_tables()
+
+    tokens = np.zeros(0, dtype=np.int64)  # tokens not yet past the last emitted chunk's start
+    data = b""  # their UTF-8 bytes, exactly
+    page_ends: list[int] = []  # token positions (in `tokens`) where a page ended
+    first_page = 1  # number of the page page_ends[0] belongs to
+    emitted = False
+
+    def pages(start: int, end: int) -> tuple[int, int]:
+        # A token at position t is on the first page ending after t
+        ends = np.asarray(page_ends)
+        last = max(start, end - 1)
+        return (
+            first_page + int(np.searchsorted(ends, start, side="right")),
+            first_page + int(np.searchsorted(ends, last, side="right")),
+        )
+
+    texts = iter(texts)
+    while block := list(islice(texts, ENCODE_BATCH_PAGES)):
+        if ENCODE_THREADS > 1:
+            encoded = enc.encode_ordinary_batch(block, num_threads=ENCODE_THREADS)
+        else:
+            encoded = [enc.encode_ordinary(text) for text in block]
+        position = len(tokens)
+        for page in encoded:
+            position += len(page)
+            page_ends.append(position)
+        added = np.fromiter(chain.from_iterable(encoded), dtype=np.int64, count=position - len(tokens))
+        tokens = np.concatenate([tokens, added])
+        data += "".join(block).encode()
+
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum(tables.byte_lengths[tokens], out=offsets[1:])
+
+        start = 0
+        while len(tokens) - start >= chunk_size:
+            end = start + chunk_size
+            if snap:
+                end = _snap_end(tokens, start, end, page_ends, snap, tables, overlap)
+            content = data[offsets[start]:offsets[end]].decode("utf-8", errors="replace")
+            yield Chunk(content, *pages(start, end))
+            emitted = True
+            start = end - overlap
+
+        tokens = tokens[start:]
+        data = data[offsets[start]:]
+        kept = [p - start for p in page_ends if p > start]
+        first_page += len(page_ends) - len(kept)
+        page_ends = kept
+
+    # Flush the tail unless it is only the overlap of the last chunk
+    if len(tokens) and (not emitted or len(tokens) > overlap):
+        yield Chunk(data.decode("utf-8", errors="replace"), *pages(0, len(tokens)))
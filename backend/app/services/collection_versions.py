@@ -0,0 +1,87 @@
+"""
+Collection versions — cheap change detection for the list endpoints.
+
+Every write that can change what GET /documents, /flashcards or /quizzes
+returns for a user bumps that user's counter for the collection, in the same
+transaction as the write. The list endpoints derive a strong ETag from the
+counter and the query string (each page is its own representation) and
+answer a matching If-None-Match with 304 Not Modified after reading only the
+counter row.
+
+The counter is read before the rows, so a response is never older than the
+version in its ETag; a write that lands in between only makes the next
+request miss.
+"""
+
+import hashlib
+from collections.abc import Iterable
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import CollectionVersion, utcnow
+
+DOCUMENTS = "documents"
+FLASHCARDS = "flashcards"
+QUIZZES = "quizzes"
+CACHE_CONTROL = "private, no-cache"  # browsers may keep the list but must revalidate it every time
+
+
+async def bump_versions(db: AsyncSession, user_ids: str | Iterable[str], *collections: str) -> None:
+    """Advance the users' counters for `collections`. Committed with the caller's transaction."""
+    user_ids = sorted({user_ids} if isinstance(user_ids, str) else set(user_ids))
+    if not user_ids or not collections:
+        return
+
+    now = utcnow()
+    # Rows go in key order so concurrent bumps lock them in the same order
+    stmt = insert(CollectionVersion).values(
+        [
+            {"user_id": user_id, "collection": collection, "version": 1, "updated_at": now}
+            for user_id in user_ids
+            for collection in sorted(set(collections))
+        ]
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CollectionVersion.user_id, CollectionVersion.collection],
+            set_={"version": CollectionVersion.version + 1, "updated_at": stmt.excluded.updated_at},
+        )
+    )
+
+
+async def collection_etag(db: AsyncSession, user_id: str, collection: str, request: Request) -> str:
+    version = await db.scalar(
+        select(CollectionVersion.version).where(
+            CollectionVersion.user_id == user_id, CollectionVersion.collection == collection
+        )
+    )
+    query = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    digest = hashlib.sha256(f"{user_id}\n{collection}\n{query}".encode()).hexdigest()[:16]
+    return f'"{version or 0}-{digest}"'
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match compares weakly: a W/ prefix added by a proxy still matches
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+async def not_modified(
+    request: Request, response: Response, db: AsyncSession, user_id: str, collection: str
+) -> Response | None:
+    """
+    Tag `response` with the collection's ETag; return a 304 response to send
+    instead if the client's If-None-Match already has it, else None.
+    """
+    etag = await collection_etag(db, user_id, collection, request)
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return None
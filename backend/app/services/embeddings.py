@@ -0,0 +1,89 @@
+"""
+Embeddings — turns chunk text into vectors for pgvector retrieval.
+
+Runs on CPU, in batches, inside the ingestion workers (and for single queries
+in the API process). The backend is chosen with EMBEDDING_BACKEND:
+
+  hashing                — dependency-free signed feature hashing (default)
+  sentence-transformers  — a local model (EMBEDDING_MODEL), if the package is installed
+
+Vectors are L2-normalised and zero-padded to EMBEDDING_DIM, so models with a
+smaller output size still fit the DocumentChunk.embedding column and cosine
+distances are unchanged.
+"""
+
+import re
+import zlib
+from functools import lru_cache
+from typing import Protocol
+
+import numpy as np
+
+from app.core.config import get_settings
+
+EMBEDDING_DIM = 1536
+EMBED_BATCH_SIZE = 64
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class Embedder(Protocol):
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Return a (len(texts), EMBEDDING_DIM) float32 array of unit vectors."""
+        ...
+
+
+class HashingEmbedder:
+    """Signed feature hashing over word unigrams and bigrams with sublinear term frequency."""
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            if not features:
+                continue
+            # crc32 rather than hash(): it must agree across worker processes
+            hashes = np.fromiter((zlib.crc32(f.encode()) for f in features), dtype=np.uint32, count=len(features))
+            signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+            np.add.at(out[row], hashes % EMBEDDING_DIM, signs)
+        out = np.sign(out) * np.log1p(np.abs(out))
+        return _normalize(out)
+
+
+class SentenceTransformerEmbedder:
+    """A local sentence-transformers model pinned to CPU."""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_name, device="cpu")
+        dim = self._model.get_sentence_embedding_dimension()
+        if dim > EMBEDDING_DIM:
+            raise ValueError(f"Embedding model {model_name} has {dim} dimensions (max {EMBEDDING_DIM})")
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = self._model.encode(
+            texts, batch_size=EMBED_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+        return np.pad(vectors, ((0, 0), (0, EMBEDDING_DIM - vectors.shape[1])))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+@lru_cache
+def get_embedder() -> Embedder:
+    """Build the configured embedder once per process."""
+    settings = get_settings()
+    if settings.embedding_backend == "hashing":
+        return HashingEmbedder()
+    if settings.embedding_backend == "sentence-transformers":
+        return SentenceTransformerEmbedder(settings.embedding_model)
+    raise ValueError(f"Unknown embedding backend: {settings.embedding_backend}")
+
+
+def embed_query(text: str) -> list[float]:
+    return get_embedder().embed([text])[0].tolist()
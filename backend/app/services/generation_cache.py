@@ -0,0 +1,100 @@
+"""
+Generation cache — reuses LLM results for identical generation requests.
+
+Results are keyed by a sha256 over (kind, chunk contents, subject, count,
+prompt template version, model), so any change to the material or prompts
+misses naturally. Lookups go through an in-process LRU with TTL eviction
+first, then the generation_cache table shared by all workers. Lookup
+outcomes and the LRU's size are reported through Prometheus (core/metrics.py).
+"""
+
+import hashlib
+import json
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+from typing import Any
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.metrics import GENERATION_CACHE_LOOKUPS
+from app.models.models import GenerationCacheEntry, utcnow
+from app.services.ai_service import MODEL, PROMPT_VERSION
+
+
+def cache_key(kind: str, chunks: list[str], subject: str | None, count: int | None = None) -> str:
+    digest = hashlib.sha256()
+    params = {"kind": kind, "subject": subject, "count": count, "prompt_version": PROMPT_VERSION, "model": MODEL}
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    for chunk in chunks:
+        digest.update(hashlib.sha256(chunk.encode()).digest())
+    return digest.hexdigest()
+
+
+class GenerationCache:
+    def __init__(self):
+        settings = get_settings()
+        self._memory = TTLCache(settings.generation_cache_memory_entries, settings.generation_cache_memory_ttl_seconds)
+
+    async def get_or_generate(
+        self,
+        db: AsyncSession,
+        kind: str,
+        key: str,
+        generate: Callable[[], Awaitable[Any]],
+        bypass: bool = False,
+    ) -> Any:
+        """Return the cached result for `key`, or call `generate` and store it. `bypass` always regenerates."""
+        result = await self.lookup(db, key, bypass)
+        if result is not None:
+            return result
+
+        result = await generate()
+        await self.store(db, kind, key, result)
+        return result
+
+    async def lookup(self, db: AsyncSession, key: str, bypass: bool = False) -> Any | None:
+        """Return the cached result for `key` from either tier, or None (always None with `bypass`)."""
+        if bypass:
+            GENERATION_CACHE_LOOKUPS.labels("bypass").inc()
+            return None
+
+        result = self._memory.get(key)
+        if result is not None:
+            GENERATION_CACHE_LOOKUPS.labels("memory_hit").inc()
+            return result
+
+        entry = await db.get(GenerationCacheEntry, key)
+        if entry is not None and entry.expires_at > utcnow():
+            GENERATION_CACHE_LOOKUPS.labels("db_hit").inc()
+            self._memory.set(key, entry.result)
+            return entry.result
+
+        GENERATION_CACHE_LOOKUPS.labels("miss").inc()
+        return None
+
+    async def store(self, db: AsyncSession, kind: str, key: str, result: Any) -> None:
+        """Write `result` to both tiers. The database write is committed with the caller's transaction."""
+        self._memory.set(key, result)
+        now = utcnow()
+        values = {
+            "kind": kind,
+            "model": MODEL,
+            "result": result,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=get_settings().generation_cache_ttl_seconds),
+        }
+        await db.execute(
+            insert(GenerationCacheEntry)
+            .values(key=key, **values)
+            .on_conflict_do_update(index_elements=[GenerationCacheEntry.key], set_=values)
+        )
+
+    @property
+    def memory_entries(self) -> int:
+        return len(self._memory)
+
+
+generation_cache = GenerationCache()
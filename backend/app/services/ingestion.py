@@ -0,0 +1,452 @@
+"""
+Ingestion queue — runs PDF extraction and chunking off the request path.
+
+Uploads only store the file and enqueue an IngestionJob row for a new
+ChunkSet (repeat uploads of the same PDF share an existing set and never
+reach the queue). Replacing a document enqueues a job that also names the
+document and its current set: only the changed pages are re-chunked, the
+surviving chunks are carried over, and the document moves to the new set
+when it is complete (see services/revisions.py). Workers claim
+jobs with a lease (heartbeat_at), run the CPU-bound work in a process pool
+and persist the chunks. Jobs that were queued or running when a worker died
+are claimed again by the poll loop once their lease expires.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from sqlalchemy import Integer, String, column, delete, insert, literal, or_, and_, select, update, values
+
+from app.core.config import get_settings
+from app.core.database import async_session
+from app.core.instrumentation import untrack
+from app.core.metrics import INGEST_JOBS_FINISHED, INGEST_STAGE_SECONDS
+from app.models.models import ChunkSet, Document, DocumentChunk, IngestionJob, new_id, utcnow
+from app.services.bulk_insert import bulk_insert
+from app.services.chunk_store import INGEST_CANCELLED, release_chunk_set, retain_chunk_set
+from app.services.collection_versions import DOCUMENTS, bump_versions
+from app.services.pdf_processing import ProcessedPdf, iter_spool, process_pdf, process_pdf_revision
+from app.services.revisions import OldChunk, find_affected
+
+logger = logging.getLogger(__name__)
+
+PERSIST_BATCH_SIZE = 1000
+CHUNK_COLUMNS = ("id", "chunk_set_id", "chunk_index", "content", "page_start", "page_end", "embedding")
+KEPT_BATCH_SIZE = 1000
+
+
+class JobCancelled(Exception):
+    """The job's chunk set was deleted before the job finished; the message says why."""
+
+
+class IngestionQueue:
+    def __init__(self):
+        self._pool: ProcessPoolExecutor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._active: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._poller: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        settings = get_settings()
+        os.makedirs(settings.upload_dir, exist_ok=True)
+        self._pool = ProcessPoolExecutor(max_workers=settings.ingest_max_workers)
+        self._semaphore = asyncio.Semaphore(settings.ingest_max_workers)
+        self._poller = asyncio.create_task(self._poll_forever())
+
+    async def stop(self) -> None:
+        # Cancelled jobs keep status "running" and are re-claimed after their lease expires
+        tasks = [*self._tasks, self._poller] if self._poller else list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, job_id: str) -> None:
+        """Schedule a job on this worker (no-op if it is already scheduled here)."""
+        if job_id in self._active:
+            return
+        self._active.add(job_id)
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _poll_forever(self) -> None:
+        settings = get_settings()
+        while True:
+            try:
+                for job_id in await self._claimable_job_ids():
+                    self.submit(job_id)
+            except Exception:
+                logger.exception("Ingestion poll failed")
+            await asyncio.sleep(settings.ingest_poll_seconds)
+
+    async def _claimable_job_ids(self) -> list[str]:
+        async with async_session() as db:
+            result = await db.execute(
+                select(IngestionJob.id)
+                .where(_claimable())
+                .order_by(IngestionJob.created_at)
+                .limit(50)
+            )
+            return list(result.scalars().all())
+
+    async def _run(self, job_id: str) -> None:
+        untrack()  # submit() may be called from a request, whose context this task copied
+        try:
+            async with self._semaphore:
+                await self._process(job_id)
+        finally:
+            self._active.discard(job_id)
+
+    async def _process(self, job_id: str) -> None:
+        settings = get_settings()
+        claim = await _claim(job_id)
+        if claim is None:
+            return  # finished, or claimed by another worker
+
+        if claim.chunk_set_id is None:
+            # The set was deleted with its last document; _finish records the job as cancelled
+            await _finish(job_id, None, claim.file_path)
+            return
+
+        if claim.attempts > settings.ingest_max_attempts:
+            await _finish(job_id, claim.chunk_set_id, claim.file_path, error="Too many failed attempts")
+            return
+
+        if claim.document_id and await _document_switched(claim.document_id, claim.chunk_set_id):
+            # A previous attempt got as far as moving the document; only the bookkeeping is left
+            await _finish(job_id, claim.chunk_set_id, claim.file_path)
+            return
+
+        heartbeat = asyncio.create_task(_heartbeat(job_id))
+        try:
+            await _update_job(job_id, stage="extracting", progress=0.05)
+            loop = asyncio.get_running_loop()
+            spool_path = _spool_path(claim.file_path)
+            base = await _load_base(claim.base_chunk_set_id) if claim.base_chunk_set_id else None
+            if base:
+                processed = await loop.run_in_executor(
+                    self._pool, process_pdf_revision, claim.file_path, spool_path, *base
+                )
+            else:
+                processed = await loop.run_in_executor(self._pool, process_pdf, claim.file_path, spool_path)
+            for stage, seconds in processed.stage_seconds.items():
+                INGEST_STAGE_SECONDS.labels(stage).observe(seconds)
+
+            started = time.perf_counter()
+            await _persist_chunks(job_id, claim.chunk_set_id, processed, spool_path)
+            if claim.document_id and not await _replace_document(job_id, claim, processed):
+                raise JobCancelled("Cancelled: the document was deleted or replaced again")
+            INGEST_STAGE_SECONDS.labels("persist").observe(time.perf_counter() - started)
+            await _finish(job_id, claim.chunk_set_id, claim.file_path)
+        except JobCancelled as exc:
+            await _finish(job_id, None, claim.file_path, error=str(exc))
+        except ValueError as exc:
+            # Unreadable or empty PDF — retrying won't help
+            await _finish(job_id, claim.chunk_set_id, claim.file_path, error=str(exc))
+        except BrokenProcessPool:
+            logger.error("Ingestion process pool died while running job %s; restarting pool", job_id)
+            self._pool = ProcessPoolExecutor(max_workers=settings.ingest_max_workers)
+            await _update_job(job_id, status="queued")
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("Ingestion job %s failed", job_id)
+            if claim.attempts >= settings.ingest_max_attempts:
+                await _finish(job_id, claim.chunk_set_id, claim.file_path, error=str(exc))
+            else:
+                await _update_job(job_id, status="queued", error=str(exc))
+        finally:
+            heartbeat.cancel()
+
+
+def _claimable():
+    stale = utcnow() - timedelta(seconds=get_settings().ingest_lease_seconds)
+    return or_(
+        IngestionJob.status == "queued",
+        and_(IngestionJob.status == "running", IngestionJob.heartbeat_at < stale),
+    )
+
+
+async def _claim(job_id: str):
+    """Atomically mark a job as running on this worker. Returns None if it isn't claimable."""
+    now = utcnow()
+    async with async_session() as db:
+        result = await db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id, _claimable())
+            .values(status="running", attempts=IngestionJob.attempts + 1, heartbeat_at=now, updated_at=now)
+            .returning(
+                IngestionJob.chunk_set_id,
+                IngestionJob.file_path,
+                IngestionJob.attempts,
+                IngestionJob.document_id,
+                IngestionJob.base_chunk_set_id,
+            )
+        )
+        claim = result.first()
+        await db.commit()
+    return claim
+
+
+async def _heartbeat(job_id: str) -> None:
+    interval = get_settings().ingest_lease_seconds / 3
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await _update_job(job_id, heartbeat_at=utcnow())
+        except Exception:
+            # Keep renewing: if the lease lapsed, another worker would start the same job
+            logger.exception("Heartbeat for ingestion job %s failed", job_id)
+
+
+async def _update_job(job_id: str, **values) -> None:
+    async with async_session() as db:
+        await db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(updated_at=utcnow(), **values))
+        await db.commit()
+
+
+def _spool_path(file_path: str) -> str:
+    return f"{file_path}.chunks.jsonl"
+
+
+async def _persist_chunks(job_id: str, chunk_set_id: str, processed: ProcessedPdf, spool_path: str) -> None:
+    """Bulk-load spooled chunks into the database. Safe to re-run after a partial attempt."""
+    async with async_session() as db:
+        # Held until commit, so the set can't be deleted under the insert; once it has been, stop
+        exists = await db.scalar(select(ChunkSet.id).where(ChunkSet.id == chunk_set_id).with_for_update(key_share=True))
+        if exists is None:
+            raise JobCancelled(INGEST_CANCELLED)
+        await db.execute(delete(DocumentChunk).where(DocumentChunk.chunk_set_id == chunk_set_id))
+        await _set_progress(db, job_id, "persisting", 0.5)
+
+        indexes = processed.chunk_indexes
+        records = (
+            (new_id(), chunk_set_id, indexes[n] if indexes is not None else n, *row)
+            for n, row in enumerate(iter_spool(spool_path))
+        )
+        spooled = len(indexes) if indexes is not None else processed.chunk_count
+
+        async def on_batch(rows: int) -> None:
+            await _set_progress(db, job_id, "persisting", 0.5 + 0.5 * rows / max(spooled, 1))
+
+        await bulk_insert(
+            db, DocumentChunk.__table__, CHUNK_COLUMNS, records,
+            batch_size=PERSIST_BATCH_SIZE, on_batch=on_batch,
+        )
+
+        if processed.kept is None:
+            # Revisions finish the set in _replace_document, together with the chunks they carry over
+            await db.execute(
+                update(ChunkSet)
+                .where(ChunkSet.id == chunk_set_id)
+                .values(
+                    page_count=processed.page_count,
+                    chunk_count=processed.chunk_count,
+                    page_hashes=processed.page_hashes,
+                )
+            )
+        await db.commit()
+
+
+async def _document_switched(document_id: str, chunk_set_id: str) -> bool:
+    async with async_session() as db:
+        current = await db.scalar(select(Document.chunk_set_id).where(Document.id == document_id))
+    return current == chunk_set_id
+
+
+async def _load_base(chunk_set_id: str) -> tuple[list[str], list[OldChunk]] | None:
+    """Page hashes and chunk page ranges of the set being replaced, or None if it can't be diffed."""
+    async with async_session() as db:
+        page_hashes = await db.scalar(select(ChunkSet.page_hashes).where(ChunkSet.id == chunk_set_id))
+        rows = (
+            await db.execute(
+                select(DocumentChunk.id, DocumentChunk.chunk_index, DocumentChunk.page_start, DocumentChunk.page_end)
+                .where(DocumentChunk.chunk_set_id == chunk_set_id)
+            )
+        ).all()
+    # Sets ingested before page tracking have no hashes or page ranges; those get a full ingest
+    if not page_hashes or not rows or any(row.page_start is None for row in rows):
+        return None
+    return page_hashes, [OldChunk(row.id, row.chunk_index, row.page_start, row.page_end) for row in rows]
+
+
+async def _replace_document(job_id: str, claim, processed: ProcessedPdf) -> bool:
+    """
+    Complete the new set with the chunks carried over from the old one, report
+    what changed, and move the document onto the new set, all in one transaction.
+    Returns False if the new set was dropped instead, because the document moved on.
+    """
+    new_set_id, base_set_id = claim.chunk_set_id, claim.base_chunk_set_id
+    kept = processed.kept or []
+    async with async_session() as db:
+        doc = (
+            await db.execute(select(Document).where(Document.id == claim.document_id).with_for_update())
+        ).scalar_one_or_none()
+        base_refs = None
+        if base_set_id:
+            base_refs = await db.scalar(
+                select(ChunkSet.ref_count).where(ChunkSet.id == base_set_id).with_for_update()
+            )
+        # The document may have been deleted or replaced again while this job ran
+        switching = doc is not None and base_refs is not None and doc.chunk_set_id == base_set_id
+
+        result = {
+            "incremental": processed.kept is not None,
+            "page_count": processed.page_count,
+            "pages_changed": processed.pages_changed,
+            "pages_removed": processed.pages_removed,
+            "chunks_kept": len(kept),
+            "chunks_new": len(processed.chunk_indexes or []),
+        }
+        if switching and processed.kept is not None:
+            old_ids = set(
+                (await db.execute(select(DocumentChunk.id).where(DocumentChunk.chunk_set_id == base_set_id)))
+                .scalars()
+                .all()
+            )
+            dropped = old_ids - {chunk.id for chunk, _ in kept}
+            result.update(await find_affected(db, doc.id, base_set_id, dropped))
+
+        for start in range(0, len(kept), KEPT_BATCH_SIZE):
+            batch = kept[start:start + KEPT_BATCH_SIZE]
+            if switching and base_refs == 1:
+                # The old set dies with this transaction, so its rows (and embeddings) just move over
+                await db.execute(
+                    update(DocumentChunk),
+                    [
+                        {
+                            "id": chunk.id,
+                            "chunk_set_id": new_set_id,
+                            "chunk_index": index,
+                            "page_start": chunk.page_start,
+                            "page_end": chunk.page_end,
+                        }
+                        for chunk, index in batch
+                    ],
+                )
+            else:
+                # Still shared: copy the rows, leaving the old set intact
+                mapping = values(
+                    column("old_id", String),
+                    column("new_id", String),
+                    column("chunk_index", Integer),
+                    column("page_start", Integer),
+                    column("page_end", Integer),
+                    name="kept",
+                ).data([(chunk.id, new_id(), index, chunk.page_start, chunk.page_end) for chunk, index in batch])
+                await db.execute(
+                    insert(DocumentChunk).from_select(
+                        CHUNK_COLUMNS,
+                        select(
+                            mapping.c.new_id,
+                            literal(new_set_id),
+                            mapping.c.chunk_index,
+                            DocumentChunk.content,
+                            mapping.c.page_start,
+                            mapping.c.page_end,
+                            DocumentChunk.embedding,
+                        ).join(mapping, DocumentChunk.id == mapping.c.old_id),
+                    )
+                )
+
+        if processed.kept is not None:
+            await db.execute(
+                update(ChunkSet)
+                .where(ChunkSet.id == new_set_id)
+                .values(
+                    page_count=processed.page_count,
+                    chunk_count=processed.chunk_count,
+                    page_hashes=processed.page_hashes,
+                )
+            )
+        if switching:
+            content_hash = await db.scalar(select(ChunkSet.content_hash).where(ChunkSet.id == new_set_id))
+            await retain_chunk_set(db, new_set_id)
+            doc.chunk_set_id = new_set_id
+            doc.content_hash = content_hash
+            await release_chunk_set(db, base_set_id)
+            kept_set = True
+        else:
+            # Nothing will move onto the new set: drop it like a failed replacement's, unless an
+            # upload of the same file has taken a reference meanwhile
+            dropped = await db.execute(
+                delete(ChunkSet).where(ChunkSet.id == new_set_id, ChunkSet.ref_count <= 0).returning(ChunkSet.id)
+            )
+            kept_set = dropped.first() is None
+
+        await db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(result=result))
+        await db.commit()
+    return kept_set
+
+
+async def _set_progress(db, job_id: str, stage: str, progress: float) -> None:
+    await db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id == job_id)
+        .values(stage=stage, progress=progress, heartbeat_at=utcnow(), updated_at=utcnow())
+    )
+    await db.commit()
+
+
+async def _finish(job_id: str, chunk_set_id: str | None, file_path: str, error: str | None = None) -> None:
+    """Close the job and its set. A set that no longer exists means the job was cancelled."""
+    status = "error" if error else "ready"
+    async with async_session() as db:
+        chunk_set = None
+        if chunk_set_id is not None:
+            chunk_set = (
+                await db.execute(
+                    update(ChunkSet)
+                    .where(ChunkSet.id == chunk_set_id)
+                    .values(status=status)
+                    .returning(ChunkSet.page_count, ChunkSet.chunk_count)
+                )
+            ).one_or_none()
+
+        if chunk_set is None:
+            outcome, error = "cancelled", error or INGEST_CANCELLED
+        else:
+            outcome = "error" if error else "done"
+            # Every document sharing this set (including duplicates uploaded meanwhile) follows it
+            owners = await db.execute(
+                update(Document)
+                .where(Document.chunk_set_id == chunk_set_id)
+                .values(status=status, page_count=chunk_set.page_count, chunk_count=chunk_set.chunk_count)
+                .returning(Document.user_id)
+            )
+            await bump_versions(db, owners.scalars().all(), DOCUMENTS)
+            if error:
+                # Only a replacement's set is pending without references (uploads take one each); drop
+                # it and its chunks unless an upload of the same file has taken a reference since
+                await db.execute(delete(ChunkSet).where(ChunkSet.id == chunk_set_id, ChunkSet.ref_count <= 0))
+
+        await db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id)
+            .values(
+                status="error" if error else "done",
+                stage=None,
+                progress=1.0,
+                error=error,
+                updated_at=utcnow(),
+            )
+        )
+        await db.commit()
+    INGEST_JOBS_FINISHED.labels(outcome).inc()
+
+    for path in (file_path, _spool_path(file_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,81 @@
+"""
+Incremental JSON parsing for streamed LLM output.
+
+Claude returns flashcards as a JSON array and quizzes as an object holding a
+"questions" array. ObjectStream watches the text as it arrives and hands back
+each element object of the first array as soon as its closing brace is seen,
+so callers can act on items long before the response finishes.
+
+Because only complete elements are returned, a response cut off part way
+(at max_tokens) still yields everything before the cut, and resume_point
+marks where the text can be picked up again: the reply up to that offset
+can be sent back as the start of Claude's turn to have it carry on.
+"""
+
+import json
+import re
+
+_TITLE_RE = re.compile(r'"title"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+class ObjectStream:
+    """Extract complete objects from the first JSON array in a stream of text fragments."""
+
+    def __init__(self):
+        self.head = ""  # text before the array opens (e.g. the quiz title)
+        self.closed = False  # the array has been closed
+        self.resume_point: int | None = None  # offset just past the array's "[" or its last complete element
+        self._consumed = 0
+        self._depth = 0
+        self._array_depth: int | None = None
+        self._in_string = False
+        self._escape = False
+        self._current: list[str] | None = None  # characters of the object being read
+
+    def feed(self, text: str) -> list[dict]:
+        """Consume a fragment and return the objects it completed."""
+        completed = []
+        for offset, ch in enumerate(text, self._consumed + 1):
+            if self._array_depth is None and not self.closed:
+                self.head += ch
+            if self._current is not None:
+                self._current.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+                if ch == "[" and self._array_depth is None and not self.closed:
+                    self._array_depth = self._depth
+                    self.resume_point = offset
+                elif ch == "{" and self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._current = [ch]
+            elif ch in "]}":
+                if ch == "}" and self._current is not None and self._depth == self._array_depth + 1:
+                    try:
+                        completed.append(json.loads("".join(self._current)))
+                    except json.JSONDecodeError:
+                        pass  # malformed element — skip it rather than lose the rest
+                    self._current = None
+                    self.resume_point = offset
+                elif ch == "]" and self._depth == self._array_depth:
+                    self._array_depth = None
+                    self.closed = True
+                self._depth -= 1
+        self._consumed += len(text)
+        return completed
+
+    @property
+    def title(self) -> str | None:
+        """The "title" field, if it appeared before the array."""
+        match = _TITLE_RE.search(self.head)
+        return json.loads(f'"{match.group(1)}"') if match else None
@@ -0,0 +1,67 @@
+"""
+Keyset pagination for list endpoints.
+
+Pages are ordered by (sort column, id) and the cursor carries the last row's
+pair, so fetching the next page is a range scan on a composite index rather
+than an OFFSET that rereads every earlier row. Cursors are opaque base64
+strings returned in the X-Next-Cursor response header.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: datetime, row_id: str) -> str:
+    raw = json.dumps([sort_value.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return datetime.fromisoformat(sort_value), str(row_id)
+    except (TypeError, ValueError) as e:  # binascii.Error and JSONDecodeError are ValueErrors
+        raise ValueError("Invalid cursor") from e
+
+
+async def fetch_page(
+    db: AsyncSession,
+    stmt: Select,
+    sort_column: InstrumentedAttribute,
+    id_column: InstrumentedAttribute,
+    cursor: str | None,
+    limit: int,
+    descending: bool = False,
+) -> tuple[list[Any], str | None]:
+    """
+    Run `stmt` for one page of at most `limit` rows after `cursor`.
+
+    `stmt` must select `sort_column` and `id_column`. Returns the rows and
+    the cursor for the next page, or None on the last page.
+    """
+    key = tuple_(sort_column, id_column)
+    if cursor is not None:
+        after = decode_cursor(cursor)
+        stmt = stmt.where(key < after if descending else key > after)
+    if descending:
+        stmt = stmt.order_by(sort_column.desc(), id_column.desc())
+    else:
+        stmt = stmt.order_by(sort_column.asc(), id_column.asc())
+
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
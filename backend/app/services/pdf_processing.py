@@ -0,0 +1,258 @@
+"""
+PDF processing — streaming text extraction, token-based chunking and embedding.
+
+The pipeline is a chain of generators (pages -> tokens -> chunks -> embedded
+batches), so memory stays bounded by one page plus one embedding batch
+regardless of document length (pages are tokenized in small blocks, see
+app.services.chunker).
+These functions are CPU-bound and run inside the ingestion process pool,
+so they must stay importable and picklable at module level. Long PDFs are
+extracted by a further pool, one page range per task, with each worker
+opening the file itself and hashing the pages it reads; pages are
+reassembled in order, so every chunk keeps the page range it came from.
+"""
+
+import json
+import time
+from collections import defaultdict, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import TypeVar
+
+import fitz  # PyMuPDF
+
+from app.core.config import get_settings
+from app.services.chunker import Chunk, iter_token_chunks
+from app.services.embeddings import EMBED_BATCH_SIZE, get_embedder
+from app.services.revisions import KeptChunk, OldChunk, page_hash, plan_revision
+
+# Chunking config
+CHUNK_SIZE = 500  # tokens
+CHUNK_OVERLAP = 50  # tokens
+
+T = TypeVar("T")
+
+
+def open_pdf(path: str) -> fitz.Document:
+    try:
+        return fitz.open(path)
+    except Exception:
+        raise ValueError("Could not read PDF")
+
+
+def iter_document_pages(doc: fitz.Document) -> Iterator[str]:
+    """Yield the text of each page of an open document, closing it when done."""
+    try:
+        for page in doc:
+            yield page.get_text() + "\n"
+    finally:
+        doc.close()
+
+
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    """Yield the text of each page of the PDF at `path`, one page at a time."""
+    yield from iter_document_pages(open_pdf(path))
+
+
+def read_page(page: fitz.Page) -> tuple[str, str]:
+    """A page's text and content hash (see services/revisions.py)."""
+    return page.get_text() + "\n", page_hash(page)
+
+
+def iter_document_pages_hashed(doc: fitz.Document) -> Iterator[tuple[str, str]]:
+    """Like iter_document_pages, yielding (text, hash) for each page."""
+    try:
+        for page in doc:
+            yield read_page(page)
+    finally:
+        doc.close()
+
+
+def extract_page_range(path: str, start: int, stop: int) -> list[tuple[str, str]]:
+    """(text, hash) of pages [start, stop) of the PDF at `path` (0-based); runs in an extraction worker."""
+    doc = open_pdf(path)
+    try:
+        return [read_page(doc[number]) for number in range(start, stop)]
+    finally:
+        doc.close()
+
+
+def iter_pdf_pages_sharded(
+    path: str, page_count: int, workers: int, shard_pages: int
+) -> Iterator[tuple[str, str]]:
+    """
+    Yield (text, hash) for each page in order while a pool of `workers`
+    processes extracts ranges of `shard_pages` pages ahead of the consumer.
+    """
+    ranges = iter([(start, min(start + shard_pages, page_count)) for start in range(0, page_count, shard_pages)])
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # Keep two ranges per worker in flight: enough to stay busy, bounded memory
+        pending = deque(pool.submit(extract_page_range, path, *r) for r in islice(ranges, 2 * workers))
+        while pending:
+            pages = pending.popleft().result()
+            if (next_range := next(ranges, None)) is not None:
+                pending.append(pool.submit(extract_page_range, path, *next_range))
+            yield from pages
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_chunks(
+    texts: Iterable[str],
+    chunk_size: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+    snap: str | None = None,
+) -> Iterator[str]:
+    """Tokenize texts incrementally and yield overlapping chunks as soon as they fill."""
+    return (chunk.content for chunk in iter_token_chunks(texts, chunk_size, overlap, snap))
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """Split text into overlapping chunks by token count."""
+    return list(iter_chunks([text], chunk_size, overlap))
+
+
+class _StageClock:
+    """Accumulates wall time per stage; `timed` charges the time spent producing each item of an iterable."""
+
+    def __init__(self):
+        self.seconds: dict[str, float] = defaultdict(float)
+
+    def timed(self, stage: str, items: Iterable[T]) -> Iterator[T]:
+        iterator = iter(items)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.seconds[stage] += time.perf_counter() - started
+            yield item
+
+
+@dataclass
+class ProcessedPdf:
+    page_count: int
+    chunk_count: int
+    stage_seconds: dict[str, float]  # read | extract | tokenize | embed
+    page_hashes: list[str]
+    # Revisions only: old chunks carried over, and the chunk_index of each spooled chunk
+    kept: list[tuple[KeptChunk, int]] | None = None
+    chunk_indexes: list[int] | None = None
+    pages_changed: int = 0
+    pages_removed: int = 0
+
+
+def _spool_chunks(chunks: Iterator[Chunk], spool_path: str, clock: _StageClock) -> list[Chunk]:
+    """Embed `chunks` in batches and write them to `spool_path`; returns them without their content."""
+    embedder = get_embedder()
+    written = []
+    with open(spool_path, "w", encoding="utf-8") as spool:
+        while batch := list(islice(chunks, EMBED_BATCH_SIZE)):
+            started = time.perf_counter()
+            vectors = embedder.embed([chunk.content for chunk in batch])
+            clock.seconds["embed"] += time.perf_counter() - started
+            for chunk, vector in zip(batch, vectors):
+                spool.write(json.dumps([*chunk, vector.tolist()]) + "\n")
+            written.extend(chunk._replace(content="") for chunk in batch)
+    return written
+
+
+def process_pdf(path: str, spool_path: str) -> ProcessedPdf:
+    """
+    Extract, chunk and embed the PDF at `path`, writing [content, page_start,
+    page_end, embedding] rows to `spool_path` as JSON lines.
+    """
+    settings = get_settings()
+    clock = _StageClock()
+    hashes: list[str] = []
+    has_text = False
+
+    started = time.perf_counter()
+    doc = open_pdf(path)
+    clock.seconds["read"] = time.perf_counter() - started
+
+    # Pages are hashed where they are extracted, in the same visit
+    workers = settings.extract_workers
+    if workers > 1 and doc.page_count > settings.extract_shard_pages:
+        shards = -(-doc.page_count // settings.extract_shard_pages)
+        source = iter_pdf_pages_sharded(path, doc.page_count, min(workers, shards), settings.extract_shard_pages)
+        doc.close()
+    else:
+        source = iter_document_pages_hashed(doc)
+
+    def pages() -> Iterator[str]:
+        nonlocal has_text
+        for text, digest in clock.timed("extract", source):
+            hashes.append(digest)
+            has_text = has_text or bool(text.strip())
+            yield text
+
+    # The chunker pulls pages as it goes, so its time includes extraction; subtracted below
+    chunks = clock.timed(
+        "tokenize", iter_token_chunks(pages(), CHUNK_SIZE, CHUNK_OVERLAP, settings.chunk_snap or None)
+    )
+    chunk_count = len(_spool_chunks(chunks, spool_path, clock))
+
+    if not has_text:
+        raise ValueError("PDF contains no extractable text")
+
+    clock.seconds["tokenize"] -= clock.seconds["extract"]
+    return ProcessedPdf(len(hashes), chunk_count, dict(clock.seconds), hashes)
+
+
+def process_pdf_revision(
+    path: str, spool_path: str, old_hashes: list[str], old_chunks: list[OldChunk]
+) -> ProcessedPdf:
+    """
+    Like process_pdf for a new version of an ingested PDF, but extract, chunk
+    and embed only the page spans that changed (see services/revisions.py).
+    """
+    settings = get_settings()
+    clock = _StageClock()
+
+    started = time.perf_counter()
+    doc = open_pdf(path)
+    hashes = [page_hash(page) for page in doc]
+    plan = plan_revision(old_hashes, hashes, old_chunks)
+    clock.seconds["read"] = time.perf_counter() - started
+
+    def span_chunks() -> Iterator[Chunk]:
+        for start, end in plan.spans:
+            texts = clock.timed("extract", (doc[number - 1].get_text() + "\n" for number in range(start, end + 1)))
+            for chunk in iter_token_chunks(texts, CHUNK_SIZE, CHUNK_OVERLAP, settings.chunk_snap or None):
+                yield Chunk(chunk.content, chunk.page_start + start - 1, chunk.page_end + start - 1)
+
+    try:
+        new_chunks = _spool_chunks(clock.timed("tokenize", span_chunks()), spool_path, clock)
+    finally:
+        doc.close()
+    clock.seconds["tokenize"] -= clock.seconds["extract"]
+
+    # Number kept and new chunks together in page order
+    entries = [(c.page_start + c.page_end, 0, n) for n, c in enumerate(plan.kept)]
+    entries += [(c.page_start + c.page_end, 1, n) for n, c in enumerate(new_chunks)]
+    kept, chunk_indexes = [], [0] * len(new_chunks)
+    for index, (_, kind, n) in enumerate(sorted(entries)):
+        if kind == 0:
+            kept.append((plan.kept[n], index))
+        else:
+            chunk_indexes[n] = index
+
+    return ProcessedPdf(
+        len(hashes), len(entries), dict(clock.seconds), hashes,
+        kept=kept, chunk_indexes=chunk_indexes,
+        pages_changed=plan.pages_changed, pages_removed=plan.pages_removed,
+    )
+
+
+def iter_spool(spool_path: str) -> Iterator[tuple[str, int, int, list[float]]]:
+    """Read (content, page_start, page_end, embedding) rows back from a spool file one at a time."""
+    with open(spool_path, encoding="utf-8") as spool:
+        for line in spool:
+            content, page_start, page_end, embedding = json.loads(line)
+            yield content, page_start, page_end, embedding
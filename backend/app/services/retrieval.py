@@ -0,0 +1,68 @@
+"""
+Retrieval — picks the chunks of a document most relevant to a query.
+
+Chunks are ranked by cosine distance between their stored embedding and the
+query embedding (served by the HNSW index on document_chunks.embedding), then
+trimmed to a token budget and returned in document order so the prompt reads
+like the original material.
+"""
+
+import asyncio
+from dataclasses import dataclass
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models.models import DocumentChunk
+from app.services.embeddings import embed_query
+from app.services.tokenizer import count_tokens
+
+
+@dataclass
+class RetrievedChunk:
+    chunk_index: int
+    content: str
+    distance: float
+    page_start: int | None = None
+    page_end: int | None = None
+
+
+async def retrieve_chunks(
+    db: AsyncSession,
+    chunk_set_id: str,
+    query: str,
+    top_k: int | None = None,
+    token_budget: int | None = None,
+) -> list[RetrievedChunk]:
+    """Return up to `top_k` chunks closest to `query` whose total size fits `token_budget`."""
+    settings = get_settings()
+    top_k = top_k or settings.retrieval_top_k
+    token_budget = token_budget or settings.retrieval_token_budget
+
+    query_vector = await asyncio.to_thread(embed_query, query)
+    distance = DocumentChunk.embedding.cosine_distance(query_vector)
+    result = await db.execute(
+        select(
+            DocumentChunk.chunk_index,
+            DocumentChunk.content,
+            distance.label("distance"),
+            DocumentChunk.page_start,
+            DocumentChunk.page_end,
+        )
+        .where(DocumentChunk.chunk_set_id == chunk_set_id, DocumentChunk.embedding.is_not(None))
+        .order_by(distance)
+        .limit(top_k)
+    )
+
+    selected: list[RetrievedChunk] = []
+    used = 0
+    for row in result.all():
+        tokens = count_tokens(row.content)
+        if used + tokens > token_budget:
+            break
+        selected.append(RetrievedChunk(row.chunk_index, row.content, row.distance, row.page_start, row.page_end))
+        used += tokens
+
+    selected.sort(key=lambda c: c.chunk_index)
+    return selected
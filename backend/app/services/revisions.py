@@ -0,0 +1,159 @@
+"""
+Revisions — replacing a document with a new version of the same PDF.
+
+Every ingested ChunkSet stores one hash per page (of the page's content
+stream, which is cheap to read without laying out text). When a document is
+replaced, the old and new page hashes are diffed with difflib; chunks whose
+pages all fall inside an unchanged run are kept as they are (rows and
+embeddings), and only the changed spans are extracted, chunked and embedded
+again. A re-chunked span starts on the last page of the kept chunk before it
+and ends on the first page of the kept chunk after it, so no text is lost at
+the seams (those two pages may appear in two neighbouring chunks, as
+overlaps already do).
+
+Flashcards and quiz questions do not point at chunks, so the ones touching
+changed material are found by embedding them and checking whether their
+nearest chunk in the old version was one that got dropped.
+"""
+
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+
+import fitz  # PyMuPDF
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import DocumentChunk, Flashcard, Quiz
+from app.services.embeddings import get_embedder
+
+
+def page_hash(page: fitz.Page) -> str:
+    return hashlib.sha256(page.read_contents()).hexdigest()
+
+
+@dataclass
+class OldChunk:
+    id: str
+    chunk_index: int
+    page_start: int
+    page_end: int
+
+
+@dataclass
+class KeptChunk:
+    id: str
+    page_start: int  # in the new version
+    page_end: int
+
+
+@dataclass
+class RevisionPlan:
+    kept: list[KeptChunk] = field(default_factory=list)  # in document order
+    spans: list[tuple[int, int]] = field(default_factory=list)  # new pages to re-chunk, 1-based inclusive
+    pages_changed: int = 0  # new pages that replaced or were inserted between old ones
+    pages_removed: int = 0
+
+
+def plan_revision(old_hashes: list[str], new_hashes: list[str], old_chunks: list[OldChunk]) -> RevisionPlan:
+    """Decide which old chunks survive into the new version and which page spans must be re-chunked."""
+    plan = RevisionPlan()
+    old_to_new: dict[int, int] = {}
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_hashes, new_hashes, autojunk=False).get_opcodes():
+        if tag == "equal":
+            old_to_new.update({i1 + k + 1: j1 + k + 1 for k in range(i2 - i1)})
+        else:
+            plan.pages_changed += j2 - j1
+            plan.pages_removed += max(0, (i2 - i1) - (j2 - j1))
+
+    chunks = sorted(old_chunks, key=lambda c: c.chunk_index)
+    kept_old: list[OldChunk] = []
+    for chunk in chunks:
+        start, end = old_to_new.get(chunk.page_start), old_to_new.get(chunk.page_end)
+        # Every page of the chunk must be unchanged and still consecutive
+        if start is not None and end is not None and end - start == chunk.page_end - chunk.page_start and all(
+            page in old_to_new for page in range(chunk.page_start, chunk.page_end + 1)
+        ):
+            plan.kept.append(KeptChunk(chunk.id, start, end))
+            kept_old.append(chunk)
+
+    page_count = len(new_hashes)
+    if not plan.kept:
+        plan.spans = [(1, page_count)] if page_count else []
+        return plan
+
+    spans = []
+    first, last = plan.kept[0], plan.kept[-1]
+    if kept_old[0].chunk_index != chunks[0].chunk_index or first.page_start != 1:
+        spans.append((1, first.page_start))
+    for k in range(1, len(plan.kept)):
+        before, after = kept_old[k - 1], kept_old[k]
+        # Re-chunk between kept neighbours that weren't neighbours, or that pages came or went between
+        if (
+            after.chunk_index != before.chunk_index + 1
+            or plan.kept[k].page_start - plan.kept[k - 1].page_end != after.page_start - before.page_end
+        ):
+            spans.append((plan.kept[k - 1].page_end, plan.kept[k].page_start))
+    trailing_changed = last.page_end != page_count or len(old_hashes) != chunks[-1].page_end
+    if kept_old[-1].chunk_index != chunks[-1].chunk_index or trailing_changed:
+        spans.append((last.page_end, page_count))
+
+    # Neighbouring spans can share a seam page
+    for start, end in sorted(spans):
+        if plan.spans and start <= plan.spans[-1][1]:
+            plan.spans[-1] = (plan.spans[-1][0], max(end, plan.spans[-1][1]))
+        else:
+            plan.spans.append((start, end))
+    return plan
+
+
+async def find_affected(
+    db: AsyncSession, document_id: str, old_chunk_set_id: str, dropped_ids: set[str]
+) -> dict:
+    """Flashcards and quiz questions of `document_id` whose nearest old chunk is in `dropped_ids`."""
+    report = {"flashcard_ids": [], "questions": []}
+    if not dropped_ids:
+        return report
+
+    cards = (
+        await db.execute(
+            select(Flashcard.id, Flashcard.front, Flashcard.back).where(Flashcard.document_id == document_id)
+        )
+    ).all()
+    quizzes = (await db.execute(select(Quiz.id, Quiz.questions).where(Quiz.document_id == document_id))).all()
+    questions = [
+        (quiz.id, index, question.get("question", ""))
+        for quiz in quizzes
+        for index, question in enumerate(quiz.questions or [])
+    ]
+    texts = [f"{card.front}\n{card.back}" for card in cards] + [text for _, _, text in questions]
+    if not texts:
+        return report
+
+    chunks = (
+        await db.execute(
+            select(DocumentChunk.id, DocumentChunk.embedding).where(
+                DocumentChunk.chunk_set_id == old_chunk_set_id, DocumentChunk.embedding.is_not(None)
+            )
+        )
+    ).all()
+    if not chunks:
+        return report
+
+    def nearest() -> np.ndarray:
+        # Both sides are L2-normalised, so the largest dot product is the smallest cosine distance
+        queries = np.asarray(get_embedder().embed(texts), dtype=np.float32)
+        matrix = np.asarray([chunk.embedding for chunk in chunks], dtype=np.float32)
+        return np.argmax(queries @ matrix.T, axis=1)
+
+    dropped = np.array([chunk.id in dropped_ids for chunk in chunks])
+    hits = dropped[await asyncio.to_thread(nearest)]
+    report["flashcard_ids"] = [card.id for card, hit in zip(cards, hits) if hit]
+    report["questions"] = [
+        {"quiz_id": quiz_id, "index": index}
+        for (quiz_id, index, _), hit in zip(questions, hits[len(cards):])
+        if hit
+    ]
+    return report
@@ -13,6 +13,8 @@ Quality ratings:
 from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass
 
+import numpy as np
+
 
 @dataclass
 class SM2Result:
@@ -27,9 +29,11 @@ def sm2(
     repetitions: int,
     ease_factor: float,
     interval_days: int,
+    reviewed_at: datetime | None = None,
 ) -> SM2Result:
     """
     Apply the SM-2 algorithm and return updated scheduling parameters.
+    The next review is scheduled from `reviewed_at` (default: now).
     """
     assert 0 <= quality <= 5, "Quality must be between 0 and 5"
 
@@ -54,7 +58,7 @@ def sm2(
         ease_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)),
     )
 
-    next_review = datetime.now(timezone.utc) + timedelta(days=max(interval_days, 1))
+    next_review = (reviewed_at or datetime.now(timezone.utc)) + timedelta(days=max(interval_days, 1))
 
     return SM2Result(
         ease_factor=ease_factor,
@@ -62,3 +66,83 @@ def sm2(
         repetitions=repetitions,
         next_review=next_review,
     )
+
+
+@dataclass
+class SM2Batch:
+    ease_factor: np.ndarray  # float64
+    interval_days: np.ndarray  # int64
+    repetitions: np.ndarray  # int64
+
+
+def sm2_batch(
+    quality: np.ndarray,
+    repetitions: np.ndarray,
+    ease_factor: np.ndarray,
+    interval_days: np.ndarray,
+) -> SM2Batch:
+    """
+    Vectorized sm2: element i of the result equals sm2() on element i of the
+    inputs. The next review is `max(interval_days, 1)` days after the review.
+    """
+    quality = np.asarray(quality, dtype=np.int64)
+    repetitions = np.asarray(repetitions, dtype=np.int64)
+    ease_factor = np.asarray(ease_factor, dtype=np.float64)
+    interval_days = np.asarray(interval_days, dtype=np.int64)
+    if quality.size and (quality.min() < 0 or quality.max() > 5):
+        raise ValueError("Quality must be between 0 and 5")
+
+    passed = quality >= 3
+    # np.rint rounds half to even, like round() in sm2
+    grown = np.rint(interval_days * ease_factor).astype(np.int64)
+    new_interval = np.where(repetitions == 0, 1, np.where(repetitions == 1, 6, grown))
+
+    lapse = 5 - quality
+    return SM2Batch(
+        ease_factor=np.maximum(1.3, ease_factor + (0.1 - lapse * (0.08 + lapse * 0.02))),
+        interval_days=np.where(passed, new_interval, 0),
+        repetitions=np.where(passed, repetitions + 1, 0),
+    )
+
+
+def forecast_reviews(
+    ease_factor: np.ndarray,
+    interval_days: np.ndarray,
+    repetitions: np.ndarray,
+    due_in_days: np.ndarray,
+    days: int,
+    recall_rate: float = 0.9,
+    new_recall_rate: float = 0.75,
+    runs: int = 5,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Simulate a deck forward `days` days and return the expected number of
+    reviews on each day (averaged over `runs` Monte Carlo runs).
+
+    `due_in_days` is each card's next review as a day offset from today
+    (overdue cards count as 0). A review is recalled (quality 4) with
+    probability `recall_rate`, or `new_recall_rate` for cards that are not
+    yet learned, and otherwise lapses (quality 1).
+    """
+    rng = np.random.default_rng(seed)
+    totals = np.zeros(days, dtype=np.float64)
+    for _ in range(runs):
+        ease = np.asarray(ease_factor, dtype=np.float64).copy()
+        interval = np.asarray(interval_days, dtype=np.int64).copy()
+        reps = np.asarray(repetitions, dtype=np.int64).copy()
+        due = np.maximum(np.asarray(due_in_days, dtype=np.int64), 0)
+
+        for day in range(days):
+            idx = np.flatnonzero(due == day)
+            if idx.size == 0:
+                continue
+            totals[day] += idx.size
+            p_recall = np.where(reps[idx] == 0, new_recall_rate, recall_rate)
+            quality = np.where(rng.random(idx.size) < p_recall, 4, 1)
+            result = sm2_batch(quality, reps[idx], ease[idx], interval[idx])
+            ease[idx] = result.ease_factor
+            interval[idx] = result.interval_days
+            reps[idx] = result.repetitions
+            due[idx] = day + np.maximum(result.interval_days, 1)
+    return totals / runs
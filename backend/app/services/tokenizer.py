@@ -0,0 +1,18 @@
+"""
+Shared tiktoken encoder — building it is expensive, so do it once per process.
+"""
+
+from functools import lru_cache
+
+import tiktoken
+
+ENCODING_NAME = "cl100k_base"
+
+
+@lru_cache
+def get_encoder() -> tiktoken.Encoding:
+    return tiktoken.get_encoding(ENCODING_NAME)
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoder().encode_ordinary(text))
@@ -0,0 +1,83 @@
+"""
+Topic stats — incrementally maintained per-topic and per-day accuracy totals.
+
+Every quiz attempt and flashcard review adds its outcomes to topic_stats and
+daily_stats in the same transaction, with one upsert per table, so analytics
+read a handful of aggregate rows no matter how long the user's history is.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import DailyStat, TopicStat, utcnow
+
+UNCATEGORIZED = "Uncategorized"
+COUNTERS = ("quiz_correct", "quiz_total", "card_correct", "card_total")
+
+
+@dataclass
+class Outcome:
+    topic: str | None
+    correct: bool
+    kind: str  # quiz | card
+    at: datetime
+
+
+def quiz_outcomes(questions: list[dict], answers: list, at: datetime) -> list[Outcome]:
+    """One outcome per answered question; unanswered (None / missing) questions are skipped."""
+    outcomes = []
+    for question, answer in zip(questions, answers):
+        if answer is None:
+            continue
+        outcomes.append(Outcome(question.get("topic"), answer == question.get("correct_index"), "quiz", at))
+    return outcomes
+
+
+def card_outcome(topic: str | None, quality: int, at: datetime) -> Outcome:
+    return Outcome(topic, quality >= 3, "card", at)
+
+
+def _totals(outcomes: list[Outcome], key) -> dict:
+    totals: dict = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for outcome in outcomes:
+        counters = totals[key(outcome)]
+        counters[f"{outcome.kind}_total"] += 1
+        counters[f"{outcome.kind}_correct"] += outcome.correct
+    return totals
+
+
+async def record_outcomes(db: AsyncSession, user_id: str, outcomes: list[Outcome]) -> None:
+    """Add `outcomes` to the user's aggregates. Committed with the caller's transaction."""
+    if not outcomes:
+        return
+
+    now = utcnow()
+    # Rows go in key order so concurrent upserts for one user lock them in the same order
+    by_topic = _totals(outcomes, lambda o: (o.topic or UNCATEGORIZED)[:255])
+    stmt = insert(TopicStat).values(
+        [{"user_id": user_id, "topic": topic, "updated_at": now, **counters} for topic, counters in sorted(by_topic.items())]
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[TopicStat.user_id, TopicStat.topic],
+            set_={
+                **{c: getattr(TopicStat, c) + getattr(stmt.excluded, c) for c in COUNTERS},
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+    )
+
+    by_day = _totals(outcomes, lambda o: o.at.date())
+    stmt = insert(DailyStat).values(
+        [{"user_id": user_id, "day": day, **counters} for day, counters in sorted(by_day.items())]
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[DailyStat.user_id, DailyStat.day],
+            set_={c: getattr(DailyStat, c) + getattr(stmt.excluded, c) for c in COUNTERS},
+        )
+    )
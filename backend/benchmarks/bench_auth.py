@@ -0,0 +1,79 @@
+"""
+Benchmark get_current_user: remote verification per request (fresh client,
+as before), remote over the pooled client, local JWT verification, and the
+verified-token cache.
+
+Runs against a local Supabase stub, so it needs no project or network:
+
+    python -m benchmarks.bench_auth --requests 200 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+
+from app.core import auth
+from app.core.config import get_settings
+from benchmarks.stubs import StubServer, supabase_stub
+
+SECRET = "bench-secret"
+
+
+def make_token(sub: str = "bench-user", ttl: int = 3600) -> str:
+    now = int(time.time())
+    claims = {"sub": sub, "email": f"{sub}@localhost", "aud": "authenticated", "iat": now, "exp": now + ttl}
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+async def fresh_client_per_request(base_url: str, token: str, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{base_url}/auth/v1/user", headers={"Authorization": f"Bearer {token}"})
+            response.json()
+    return time.perf_counter() - started
+
+
+async def via_dependency(token: str, requests: int, cached: bool) -> float:
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    started = time.perf_counter()
+    for _ in range(requests):
+        if not cached:
+            auth._user_cache = None
+        await auth.get_current_user(credentials)
+    return time.perf_counter() - started
+
+
+async def main(requests: int, latency: float) -> None:
+    settings = get_settings()
+    settings.supabase_jwt_secret = SECRET
+    token = make_token()
+    timings = {}
+
+    with StubServer(supabase_stub(latency=latency)) as base_url:
+        settings.supabase_url = base_url
+        timings["remote_fresh_client"] = await fresh_client_per_request(base_url, token, requests)
+
+        settings.auth_mode = "remote"
+        timings["remote_pooled_client"] = await via_dependency(token, requests, cached=False)
+
+        settings.auth_mode = "local"
+        timings["local_uncached"] = await via_dependency(token, requests, cached=False)
+        timings["local_cached"] = await via_dependency(token, requests, cached=True)
+        await auth.close_http_client()
+
+    results = {f"{name}_us_per_request": round(1e6 * seconds / requests, 1) for name, seconds in timings.items()}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated Supabase round trip, seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency))
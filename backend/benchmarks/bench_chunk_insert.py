@@ -0,0 +1,76 @@
+"""
+Benchmark DocumentChunk persistence: per-row ORM inserts vs. bulk COPY.
+
+Needs a migrated database at DATABASE_URL. Each run inserts into a throwaway
+chunk set that is deleted (with its chunks) afterwards.
+
+    python -m benchmarks.bench_chunk_insert --rows 5000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.core.config import get_settings
+from app.models.models import ChunkSet, DocumentChunk, new_id
+from app.services.bulk_insert import bulk_insert
+
+CHUNK_CONTENT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 40  # ~500 tokens
+
+
+async def _with_chunk_set(session_factory, fn):
+    async with session_factory() as db:
+        chunk_set = ChunkSet(content_hash=new_id(), status="ready")
+        db.add(chunk_set)
+        await db.commit()
+        try:
+            return await fn(db, chunk_set.id)
+        finally:
+            await db.execute(delete(ChunkSet).where(ChunkSet.id == chunk_set.id))
+            await db.commit()
+
+
+async def per_row(db, chunk_set_id: str, rows: int) -> float:
+    started = time.perf_counter()
+    for i in range(rows):
+        db.add(DocumentChunk(chunk_set_id=chunk_set_id, chunk_index=i, content=CHUNK_CONTENT))
+    await db.commit()
+    return time.perf_counter() - started
+
+
+async def bulk(db, chunk_set_id: str, rows: int, batch_size: int) -> float:
+    records = ((new_id(), chunk_set_id, i, CHUNK_CONTENT) for i in range(rows))
+    stats = await bulk_insert(
+        db, DocumentChunk.__table__, ("id", "chunk_set_id", "chunk_index", "content"), records,
+        batch_size=batch_size,
+    )
+    return stats.seconds
+
+
+async def main(rows: int, batch_size: int) -> None:
+    engine = create_async_engine(get_settings().database_url)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    results = {}
+    for name, fn in (
+        ("per_row", lambda db, set_id: per_row(db, set_id, rows)),
+        ("bulk", lambda db, set_id: bulk(db, set_id, rows, batch_size)),
+    ):
+        seconds = await _with_chunk_set(session_factory, fn)
+        results[name] = {"rows": rows, "seconds": round(seconds, 4), "rows_per_second": round(rows / seconds, 1)}
+
+    results["speedup"] = round(results["per_row"]["seconds"] / results["bulk"]["seconds"], 2)
+    await engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch_size))
@@ -0,0 +1,122 @@
+"""
+Compare chunking throughput on a synthetic lecture corpus.
+
+  legacy     the original chunk_text: get_encoding per call, encode the whole
+             text, decode every 500-token window
+  streaming  the per-page encode / per-chunk decode generator it was replaced by
+  chunker    app.services.chunker (batch encode, byte-offset slicing), plus
+             its sentence and slide snapping modes
+
+Also checks that the chunker's unsnapped output equals the streaming output,
+and times encoding alone (one thread), which bounds what any chunker can do
+without parallel encoding. Needs no database or network (beyond tiktoken's
+one-off encoding download):
+
+    python -m benchmarks.bench_chunker --pages 1000 --threads 8
+"""
+
+import argparse
+import json
+import random
+import time
+from collections.abc import Callable, Iterable, Iterator
+
+import tiktoken
+
+from app.services import chunker
+from app.services.chunker import token_tables
+from app.services.pdf_processing import CHUNK_OVERLAP, CHUNK_SIZE, iter_chunks
+from app.services.tokenizer import ENCODING_NAME, get_encoder
+from benchmarks.synthetic import lecture_text
+
+
+def legacy_chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    enc = tiktoken.get_encoding(ENCODING_NAME)
+    tokens = enc.encode(text)
+    chunks = []
+    start = 0
+    while start < len(tokens):
+        end = start + chunk_size
+        chunks.append(enc.decode(tokens[start:end]))
+        start += chunk_size - overlap
+    return chunks
+
+
+def streaming_chunks(texts: Iterable[str], chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[str]:
+    enc = get_encoder()
+    buffer: list[int] = []
+    emitted = False
+    for text in texts:
+        buffer.extend(enc.encode_ordinary(text))
+        while len(buffer) >= chunk_size:
+            yield enc.decode(buffer[:chunk_size])
+            buffer = buffer[chunk_size - overlap:]
+            emitted = True
+    if buffer and (not emitted or len(buffer) > overlap):
+        yield enc.decode(buffer)
+
+
+def corpus(pages: int, words_per_page: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        f"Lecture {seed} — slide {n + 1}\n\n" + lecture_text(words_per_page, rng) + "\n"
+        for n in range(pages)
+    ]
+
+
+def best_of(repeats: int, fn: Callable[[], list[str]]) -> tuple[float, list[str]]:
+    best, result = float("inf"), []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main(pages: int, words_per_page: int, repeats: int, threads: int) -> None:
+    chunker.ENCODE_THREADS = threads
+    texts = corpus(pages, words_per_page)
+    tokens = sum(len(t) for t in get_encoder().encode_ordinary_batch(texts))
+
+    started = time.perf_counter()
+    token_tables()  # built once per process; reported separately
+    tables_seconds = time.perf_counter() - started
+
+    runs = {
+        "encode_only": lambda: [get_encoder().encode_ordinary(text) for text in texts],
+        "legacy": lambda: legacy_chunk_text("".join(texts)),
+        "streaming": lambda: list(streaming_chunks(texts)),
+        "chunker": lambda: list(iter_chunks(texts)),
+        "chunker_sentence": lambda: list(iter_chunks(texts, snap="sentence")),
+        "chunker_slide": lambda: list(iter_chunks(texts, snap="slide")),
+    }
+    results, outputs = {}, {}
+    for name, fn in runs.items():
+        seconds, outputs[name] = best_of(repeats, fn)
+        results[name] = {
+            "seconds": round(seconds, 4),
+            "tokens_per_s": round(tokens / seconds),
+            "chunks": len(outputs[name]) if name != "encode_only" else None,
+        }
+    for name in runs:
+        results[name]["speedup_vs_legacy"] = round(results["legacy"]["seconds"] / results[name]["seconds"], 2)
+        results[name]["speedup_vs_streaming"] = round(results["streaming"]["seconds"] / results[name]["seconds"], 2)
+
+    print(json.dumps({
+        "pages": pages,
+        "tokens": tokens,
+        "threads": threads,
+        "token_tables_ms": round(1000 * tables_seconds, 1),
+        "chunker_matches_streaming": outputs["chunker"] == outputs["streaming"],
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--words-per-page", type=int, default=350)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=chunker.ENCODE_THREADS)
+    args = parser.parse_args()
+    main(args.pages, args.words_per_page, args.repeats, args.threads)
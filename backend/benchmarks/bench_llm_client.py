@@ -0,0 +1,76 @@
+"""
+Benchmark the shared, pooled Anthropic client against a fresh client per call.
+
+Runs against the local Anthropic stub, so it needs no API key or network:
+
+    python -m benchmarks.bench_llm_client --calls 100 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from anthropic import AsyncAnthropic
+
+from app.core.config import get_settings
+from app.services import ai_service
+from benchmarks.stubs import StubServer, anthropic_stub
+
+REQUEST = {
+    "model": ai_service.MODEL,
+    "max_tokens": 64,
+    "messages": [{"role": "user", "content": "Create a study guide."}],
+}
+
+
+async def fresh_client_per_call(base_url: str, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        client = AsyncAnthropic(api_key="stub", base_url=base_url)
+        await client.messages.create(**REQUEST)
+    return time.perf_counter() - started
+
+
+async def pooled_client(calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        await ai_service.create_message(**REQUEST)
+    return time.perf_counter() - started
+
+
+async def main(calls: int, latency: float) -> None:
+    settings = get_settings()
+    settings.anthropic_api_key = "stub"
+
+    results = {}
+    with StubServer(anthropic_stub(latency=latency)) as base_url:
+        settings.anthropic_base_url = base_url
+        ai_service.init_client()
+        fresh = await fresh_client_per_call(base_url, calls)
+        pooled = await pooled_client(calls)
+        await ai_service.close_client()
+
+    results["fresh_client_ms_per_call"] = round(1000 * fresh / calls, 2)
+    results["pooled_client_ms_per_call"] = round(1000 * pooled / calls, 2)
+    results["saved_ms_per_call"] = round(1000 * (fresh - pooled) / calls, 2)
+
+    # Every 3rd request answers 529: the pooled path should still succeed via backoff
+    settings.llm_backoff_base_seconds = 0.01
+    with StubServer(anthropic_stub(latency=latency, fail_every=3)) as base_url:
+        settings.anthropic_base_url = base_url
+        ai_service.init_client()
+        started = time.perf_counter()
+        await asyncio.gather(*(ai_service.create_message(**REQUEST) for _ in range(calls)))
+        results["overloaded_stub_seconds"] = round(time.perf_counter() - started, 3)
+        await ai_service.close_client()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub response latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.latency))
@@ -0,0 +1,69 @@
+"""
+Check sm2_batch against the scalar sm2 and time both, plus the review forecast.
+
+Needs no database or network:
+
+    python -m benchmarks.bench_sm2 --cards 10000 --days 100
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.services.spaced_repetition import forecast_reviews, sm2, sm2_batch
+
+
+def random_deck(cards: int, rng: np.random.Generator) -> dict[str, np.ndarray]:
+    return {
+        "quality": rng.integers(0, 6, cards),
+        "repetitions": rng.integers(0, 8, cards),
+        "ease_factor": np.round(rng.uniform(1.3, 3.0, cards), 2),
+        "interval_days": rng.integers(0, 60, cards),
+    }
+
+
+def main(cards: int, days: int) -> None:
+    deck = random_deck(cards, np.random.default_rng(0))
+
+    started = time.perf_counter()
+    scalar = [
+        sm2(int(q), int(r), float(e), int(i))
+        for q, r, e, i in zip(deck["quality"], deck["repetitions"], deck["ease_factor"], deck["interval_days"])
+    ]
+    scalar_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = sm2_batch(**deck)
+    batch_seconds = time.perf_counter() - started
+
+    mismatches = int(sum(
+        s.ease_factor != batch.ease_factor[k]
+        or s.interval_days != batch.interval_days[k]
+        or s.repetitions != batch.repetitions[k]
+        for k, s in enumerate(scalar)
+    ))
+
+    started = time.perf_counter()
+    forecast_reviews(
+        deck["ease_factor"], deck["interval_days"], deck["repetitions"], deck["interval_days"] - 30, days
+    )
+    forecast_seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        "cards": cards,
+        "mismatches": mismatches,
+        "scalar_ms": round(1000 * scalar_seconds, 2),
+        "batch_ms": round(1000 * batch_seconds, 2),
+        "forecast_card_days": cards * days,
+        "forecast_ms": round(1000 * forecast_seconds, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=100)
+    args = parser.parse_args()
+    main(args.cards, args.days)
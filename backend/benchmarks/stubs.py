@@ -0,0 +1,234 @@
+"""
+Local stub HTTP servers that stand in for external APIs during benchmarks.
+
+Each stub is a small FastAPI app run by uvicorn on a background thread (with
+its own event loop) on an ephemeral port, so the code under test talks real
+HTTP without any network access.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class StubServer:
+    """Run an ASGI app on 127.0.0.1 in a background thread: `with StubServer(app) as url: ...`."""
+
+    def __init__(self, app: FastAPI):
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> str:
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        port = self._server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+# --- Anthropic ---
+
+
+def _fake_text(prompt: str, request_no: int, prefill: str = "") -> str:
+    """A plausible reply to `prompt`; with `prefill`, the rest of a reply cut off after its last complete item."""
+    if prompt.endswith("Reply with OK."):
+        return "OK"
+    if match := re.search(r"exactly (\d+) flashcards", prompt):
+        count = int(match.group(1))
+        opening, closing, key = "[", "]", '"front"'
+        items = [
+            f'{{"front": "Stub question {request_no}.{i}?", "back": "Stub answer {i}", "topic": "Stub Topic {i % 5}"}}'
+            for i in range(count)
+        ]
+    elif match := re.search(r"quiz with (\d+) questions", prompt):
+        count = int(match.group(1))
+        opening, closing, key = '{"title": "Quiz: Stub", "questions": [', "]}", '"question"'
+        items = [
+            f'{{"question": "Stub question {request_no}.{i}?", "options": ["A", "B", "C", "D"],'
+            f' "correct_index": {i % 4}, "explanation": "Because.", "topic": "Stub Topic {i % 5}"}}'
+            for i in range(count)
+        ]
+    else:
+        return "# Stub Study Guide\n\n## Key Concepts\n\n- Stub concept\n"
+
+    if not prefill:
+        return opening + ",".join(items) + closing
+    done = prefill.count(key)
+    return ("," if done else "") + ",".join(items[done:]) + closing
+
+
+def _prompt_text(body: dict) -> str:
+    parts = []
+    for message in body.get("messages", []):
+        if message["role"] != "user":
+            continue
+        content = message["content"]
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content)
+    return "\n".join(parts)
+
+
+def _prefill(body: dict) -> str:
+    """The start of the assistant's turn, if the request supplies one."""
+    messages = body.get("messages", [])
+    if not messages or messages[-1]["role"] != "assistant":
+        return ""
+    content = messages[-1]["content"]
+    return content if isinstance(content, str) else "".join(block.get("text", "") for block in content)
+
+
+def _cached_prefix(body: dict) -> tuple[str, int] | None:
+    """
+    The prompt up to and including the last block marked cache_control, as
+    (cache key, text length); raises ValueError for a cache_control the real
+    API would reject.
+    """
+    prefix, cached, length = [body["model"], body.get("system")], None, 0
+    for message in body.get("messages", []):
+        content = message["content"]
+        blocks = [{"type": "text", "text": content}] if isinstance(content, str) else content
+        for block in blocks:
+            prefix.append(block)
+            length += len(block.get("text", "")) + 1
+            control = block.get("cache_control")
+            if control is None:
+                continue
+            if control != {"type": "ephemeral"} or block.get("type") != "text":
+                raise ValueError(f"Unsupported cache_control {control!r} on a {block.get('type')} block")
+            cached = (json.dumps(prefix, sort_keys=True), length)
+    return cached
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps({'type': event, **data})}\n\n"
+
+
+async def _stream_message(message: dict, delay: float):
+    """Replay a complete message as Messages API streaming events, one small text delta at a time."""
+    text = message["content"][0]["text"]
+    start = {**message, "content": [], "stop_reason": None, "usage": {**message["usage"], "output_tokens": 0}}
+    yield _sse("message_start", {"message": start})
+    yield _sse("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+    for i in range(0, len(text), 16):
+        await asyncio.sleep(delay)
+        yield _sse("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": text[i:i + 16]}})
+    yield _sse("content_block_stop", {"index": 0})
+    yield _sse(
+        "message_delta",
+        {"delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+         "usage": {"output_tokens": message["usage"]["output_tokens"]}},
+    )
+    yield _sse("message_stop", {})
+
+
+def anthropic_stub(
+    latency: float = 0.05, fail_every: int = 0, fail_status: int = 529, stream_delay: float = 0.001
+) -> FastAPI:
+    """
+    A Messages API stand-in. Each response takes `latency` seconds (then
+    `stream_delay` per 16-character delta when streaming); if `fail_every` is
+    set, every Nth request fails with `fail_status`. Replies longer than
+    max_tokens (at 4 characters a token) are cut off with stop_reason
+    max_tokens; a prefilled reply is continued after its last complete item.
+    Prompt caching is emulated: the first request with a given cache_control
+    prefix reports it as cache_creation_input_tokens, later ones as
+    cache_read_input_tokens. Requests the real API would reject (malformed
+    cache_control, a prefill ending in whitespace) get a 400.
+    """
+    app = FastAPI()
+    app.state.requests = 0
+    app.state.cache = set()  # sha256 of cached prefixes
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        app.state.requests += 1
+        request_no = app.state.requests
+        body = await request.json()
+        await asyncio.sleep(latency)
+
+        if fail_every and request_no % fail_every == 0:
+            return JSONResponse(
+                status_code=fail_status,
+                content={"type": "error", "error": {"type": "overloaded_error", "message": "Stub overload"}},
+            )
+
+        prompt, prefill = _prompt_text(body), _prefill(body)
+        try:
+            prefix = _cached_prefix(body)
+            if prefill != prefill.rstrip():
+                raise ValueError("final assistant content cannot end with trailing whitespace")
+        except ValueError as exc:
+            return JSONResponse(
+                status_code=400,
+                content={"type": "error", "error": {"type": "invalid_request_error", "message": str(exc)}},
+            )
+        text = _fake_text(prompt, request_no, prefill)
+        stop_reason = "end_turn"
+        if len(text) > body["max_tokens"] * 4:
+            text, stop_reason = text[:body["max_tokens"] * 4], "max_tokens"
+        cache_read = cache_write = 0
+        if prefix is not None:
+            key, length = prefix
+            digest = hashlib.sha256(key.encode()).hexdigest()
+            if digest in app.state.cache:
+                cache_read = length // 4
+            else:
+                cache_write = length // 4
+                app.state.cache.add(digest)
+        message = {
+            "id": f"msg_stub_{request_no}",
+            "type": "message",
+            "role": "assistant",
+            "model": body["model"],
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": max(0, (len(prompt) + len(prefill)) // 4 - cache_read - cache_write),
+                "output_tokens": len(text) // 4,
+                "cache_read_input_tokens": cache_read,
+                "cache_creation_input_tokens": cache_write,
+            },
+        }
+        if body.get("stream"):
+            return StreamingResponse(_stream_message(message, stream_delay), media_type="text/event-stream")
+        return message
+
+    return app
+
+
+# --- Supabase auth ---
+
+
+def supabase_stub(latency: float = 0.02, jwks: dict | None = None) -> FastAPI:
+    """An auth API stand-in: /auth/v1/user answers after `latency` seconds; /jwks.json serves `jwks`."""
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.get("/auth/v1/user")
+    async def user(request: Request):
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            return JSONResponse(status_code=401, content={"msg": "missing token"})
+        return {"id": "stub-user", "email": "stub@localhost"}
+
+    @app.get("/auth/v1/.well-known/jwks.json")
+    async def jwks_json():
+        app.state.requests += 1
+        return jwks or {"keys": []}
+
+    return app
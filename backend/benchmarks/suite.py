@@ -0,0 +1,403 @@
+"""
+Offline benchmark and load-test suite.
+
+Anthropic and Supabase are replaced by local stub servers with configurable
+latency, PDFs and users are synthetic (see benchmarks/synthetic.py), and
+requests go to the app in-process over httpx's ASGI transport, so nothing
+leaves the machine. Scenarios:
+
+  chunking    PDF extraction pages/s and chunking tokens/s on a synthetic PDF
+  generation  map-reduce fan-out against the Anthropic stub: wall time vs calls,
+              prompt-cache tokens for generate_all vs the separate generators, and
+              continuation of a flashcard reply cut off at max_tokens
+  upload      upload throughput and time until ingestion finishes (needs DB)
+  endpoints   p50/p99 of the list (full and 304 revalidation), due-queue,
+              analytics and batch review endpoints under concurrency for a
+              seeded heavy user (needs DB)
+
+The database scenarios need a migrated database at DATABASE_URL and are
+reported as skipped when it is unreachable. Results are JSON tagged with
+the git commit; --compare prints the ratio of every number to a previous run.
+
+    python -m benchmarks.suite --out before.json
+    python -m benchmarks.suite --out after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+from sqlalchemy import text
+
+from app.core.config import get_settings
+from app.core.database import async_session
+from app.main import app
+from app.services import ai_service
+from app.services.ingestion import ingestion_queue
+from app.services.pdf_processing import iter_chunks, iter_pdf_pages, iter_pdf_pages_sharded, process_pdf
+from app.services.tokenizer import count_tokens
+from benchmarks.bench_auth import SECRET, make_token
+from benchmarks.stubs import StubServer, anthropic_stub, supabase_stub
+from benchmarks.synthetic import bench_user_id, delete_user, make_pdf, seed_user
+
+SCENARIOS = ("chunking", "generation", "upload", "endpoints")
+LONG_FLASHCARD_COUNT = 300  # about twice what fits in MAX_OUTPUT_TOKENS with the stub's cards
+
+
+# --- Measurement helpers ---
+
+
+def summarize(latencies: list[float], seconds: float, errors: int = 0) -> dict:
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p90_ms": round(float(np.percentile(ms, 90)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+        "requests_per_second": round(len(latencies) / seconds, 1) if seconds else 0.0,
+    }
+
+
+async def load(fn: Callable[[int], Awaitable[bool]], requests: int, concurrency: int) -> dict:
+    """Call fn(i) `requests` times from `concurrency` workers; fn returns False for a failed request."""
+    latencies: list[float] = []
+    errors = 0
+    next_index = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in next_index:
+            started = time.perf_counter()
+            ok = await fn(i)
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+@asynccontextmanager
+async def api_client(auth_latency: float):
+    """An httpx client for the app, with auth verified against a Supabase stub."""
+    settings = get_settings()
+    with StubServer(supabase_stub(latency=auth_latency)) as supabase_url:
+        settings.supabase_url = supabase_url
+        settings.supabase_jwt_secret = SECRET
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench/api", timeout=300) as client:
+            yield client
+
+
+def auth_headers(user_id: str) -> dict:
+    return {"Authorization": f"Bearer {make_token(user_id)}"}
+
+
+async def database_unavailable() -> str | None:
+    try:
+        async with async_session() as db:
+            await db.execute(text("SELECT 1 FROM flashcards LIMIT 1"))
+    except Exception as exc:  # unreachable server, missing tables, bad credentials
+        return f"{type(exc).__name__}: {str(exc).splitlines()[0][:200]}"
+    return None
+
+
+# --- Scenarios ---
+
+
+def bench_chunking(pages: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lecture.pdf")
+        pdf_bytes = make_pdf(path, pages)
+
+        started = time.perf_counter()
+        texts = list(iter_pdf_pages(path))
+        extract_seconds = time.perf_counter() - started
+
+        settings = get_settings()
+        started = time.perf_counter()
+        sharded = list(iter_pdf_pages_sharded(path, pages, settings.extract_workers, settings.extract_shard_pages))
+        sharded_seconds = time.perf_counter() - started
+        tokens = sum(count_tokens(t) for t in texts)
+
+        started = time.perf_counter()
+        chunks = list(iter_chunks(texts))
+        chunk_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        processed = process_pdf(path, os.path.join(tmp, "lecture.spool"))
+        process_seconds = time.perf_counter() - started
+
+    return {
+        "pages": pages,
+        "pdf_bytes": pdf_bytes,
+        "tokens": tokens,
+        "chunks": len(chunks),
+        "extract_pages_per_second": round(pages / extract_seconds, 1),
+        "extract_sharded_pages_per_second": round(pages / sharded_seconds, 1),
+        "extract_sharded_matches": sharded == texts,
+        "chunk_tokens_per_second": round(tokens / chunk_seconds, 1),
+        "process_pdf_seconds": round(process_seconds, 4),
+        "process_pdf_stage_seconds": {k: round(v, 4) for k, v in processed.stage_seconds.items()},
+    }
+
+
+async def bench_generation(pages: int, latency: float, batch_tokens: list[int]) -> dict:
+    settings = get_settings()
+    settings.anthropic_api_key = "stub"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lecture.pdf")
+        make_pdf(path, pages)
+        chunks = list(iter_chunks(iter_pdf_pages(path)))
+
+    stub = anthropic_stub(latency=latency)
+    results = {"chunks": len(chunks), "stub_latency_ms": latency * 1000}
+    with StubServer(stub) as base_url:
+        settings.anthropic_base_url = base_url
+        ai_service.init_client()
+        for tokens in batch_tokens:
+            settings.generation_batch_tokens = tokens
+            batches = len(ai_service.batch_chunks(chunks))
+            for kind, generate in (
+                ("study_guide", lambda: ai_service.generate_study_guide(chunks, "Benchmarking")),
+                ("flashcards", lambda: ai_service.generate_flashcards(chunks, 40, "Benchmarking")),
+                ("quiz", lambda: ai_service.generate_quiz(chunks, 20, "Benchmarking")),
+                ("all", lambda: ai_service.generate_all(chunks, "Benchmarking", flashcard_count=40, question_count=20)),
+            ):
+                stub.state.cache.clear()  # each run starts cold
+                calls_before = stub.state.requests
+                started = time.perf_counter()
+                with ai_service.track_usage() as usage:
+                    await generate()
+                seconds = time.perf_counter() - started
+                calls = stub.state.requests - calls_before
+                results[f"{kind}_batch_tokens_{tokens}"] = {
+                    "batches": batches,
+                    "llm_calls": calls,
+                    "seconds": round(seconds, 3),
+                    # calls that overlapped on average; 1.0 means fully sequential
+                    "effective_parallelism": round(calls * latency / seconds, 2),
+                    "input_tokens": usage.input_tokens,
+                    "cache_write_tokens": usage.cache_write_tokens,
+                    "cache_read_tokens": usage.cache_read_tokens,
+                }
+
+        # More flashcards than fit in one reply's max_tokens: the cut-off reply is continued
+        settings.generation_batch_tokens = max(batch_tokens)
+        calls_before = stub.state.requests
+        with ai_service.track_usage() as usage:
+            cards = await ai_service.generate_flashcards(chunks, LONG_FLASHCARD_COUNT, "Benchmarking")
+        results["flashcards_over_max_tokens"] = {
+            "requested": LONG_FLASHCARD_COUNT,
+            "returned": len(cards),
+            "llm_calls": stub.state.requests - calls_before,
+            "continuations": usage.continuations,
+            "salvaged_items": usage.salvaged_items,
+        }
+        await ai_service.close_client()
+    return results
+
+
+async def bench_upload(uploads: int, pages: int, concurrency: int, auth_latency: float) -> dict:
+    user_id = bench_user_id()
+    headers = auth_headers(user_id)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"lecture-{i}.pdf") for i in range(uploads)]
+        total_bytes = sum(make_pdf(path, pages, seed=i) for i, path in enumerate(paths))  # distinct content
+
+        await ingestion_queue.start()
+        async with api_client(auth_latency) as client:
+            document_ids = []
+
+            async def upload(i: int) -> bool:
+                with open(paths[i], "rb") as f:
+                    response = await client.post(
+                        "/documents/upload", headers=headers,
+                        files={"file": (f"lecture-{i}.pdf", f, "application/pdf")}, data={"subject": "Benchmarking"},
+                    )
+                if response.status_code == 200:
+                    document_ids.append(response.json()["id"])
+                return response.status_code == 200
+
+            started = time.perf_counter()
+            upload_stats = await load(upload, uploads, concurrency)
+            upload_seconds = time.perf_counter() - started
+
+            pending = set(document_ids)
+            while pending:
+                for doc_id in list(pending):
+                    status = (await client.get(f"/documents/{doc_id}/status", headers=headers)).json()
+                    if status.get("status") in ("ready", "error"):
+                        pending.discard(doc_id)
+                await asyncio.sleep(0.2)
+            ready_seconds = time.perf_counter() - started
+
+            for doc_id in document_ids:
+                await client.delete(f"/documents/{doc_id}", headers=headers)
+        await ingestion_queue.stop()
+
+    return {
+        "uploads": uploads,
+        "pages_per_upload": pages,
+        "upload_requests": upload_stats,
+        "upload_mb_per_second": round(total_bytes / upload_seconds / 1e6, 2),
+        "seconds_until_all_ingested": round(ready_seconds, 2),
+        "ingested_pages_per_second": round(uploads * pages / ready_seconds, 1),
+    }
+
+
+async def bench_endpoints(cards: int, attempts: int, requests: int, concurrency: int, auth_latency: float) -> dict:
+    from app.scripts.backfill_topic_stats import backfill
+
+    user_id = bench_user_id()
+    started = time.perf_counter()
+    async with async_session() as db:
+        seeded = await seed_user(db, user_id, cards, attempts)
+    await backfill(user_id)
+    results = {"cards": cards, "attempts": attempts, "seed_seconds": round(time.perf_counter() - started, 2)}
+
+    headers = auth_headers(user_id)
+    quiz_ids = seeded["quiz_ids"]
+    async with api_client(auth_latency) as client:
+        async with async_session() as db:
+            card_ids = (
+                await db.execute(text("SELECT id FROM flashcards WHERE user_id = :u LIMIT 1000"), {"u": user_id})
+            ).scalars().all()
+
+        def get(path: str) -> Callable[[int], Awaitable[bool]]:
+            async def call(i: int) -> bool:
+                return (await client.get(path, headers=headers)).status_code == 200
+            return call
+
+        def get_not_modified(path: str) -> Callable[[int], Awaitable[bool]]:
+            etag = None
+
+            async def call(i: int) -> bool:
+                nonlocal etag
+                if etag is None:
+                    etag = (await client.get(path, headers=headers)).headers["ETag"]
+                response = await client.get(path, headers={**headers, "If-None-Match": etag})
+                return response.status_code == 304
+            return call
+
+        async def review_batch(i: int) -> bool:
+            reviews = [{"card_id": card_ids[(i * 20 + k) % len(card_ids)], "quality": (i + k) % 6} for k in range(20)]
+            response = await client.post("/flashcards/review/batch", headers=headers, json={"reviews": reviews})
+            return response.status_code == 200
+
+        endpoints = {
+            "list_flashcards": get("/flashcards?limit=50"),
+            "list_flashcards_not_modified": get_not_modified("/flashcards?limit=50"),
+            "due_flashcards": get("/flashcards/due?limit=20"),
+            "list_quizzes": get("/quizzes?limit=50"),
+            "quiz_detail": get(f"/quizzes/{quiz_ids[0]}"),
+            "list_documents": get("/documents"),
+            "list_documents_not_modified": get_not_modified("/documents"),
+            "analytics": get("/analytics"),
+            "review_batch_20": review_batch,
+        }
+        for name, call in endpoints.items():
+            await call(0)  # warm up connections and caches
+            results[name] = await load(call, requests, concurrency)
+
+    async with async_session() as db:
+        await delete_user(db, user_id)
+    return results
+
+
+# --- Output ---
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous, path: str = "") -> list[str]:
+    """Lines of `path: previous -> current (ratio)` for every number present in both runs."""
+    if isinstance(current, dict) and isinstance(previous, dict):
+        lines = []
+        for key in current.keys() & previous.keys():
+            lines.extend(compare(current[key], previous[key], f"{path}.{key}" if path else key))
+        return sorted(lines)
+    if isinstance(current, (int, float)) and isinstance(previous, (int, float)) and not isinstance(current, bool):
+        ratio = f"{current / previous:.2f}x" if previous else "n/a"
+        return [f"{path}: {previous} -> {current} ({ratio})"]
+    return []
+
+
+async def main(args: argparse.Namespace) -> dict:
+    results: dict = {}
+    scenarios = args.scenarios.split(",")
+    if "chunking" in scenarios:
+        results["chunking"] = bench_chunking(args.pages)
+    if "generation" in scenarios:
+        results["generation"] = await bench_generation(args.pages, args.llm_latency, args.batch_tokens)
+
+    db_scenarios = [s for s in ("upload", "endpoints") if s in scenarios]
+    if db_scenarios:
+        reason = await database_unavailable()
+        if reason:
+            for scenario in db_scenarios:
+                results[scenario] = {"skipped": reason}
+        else:
+            if "upload" in scenarios:
+                results["upload"] = await bench_upload(args.uploads, args.pages, args.concurrency, args.auth_latency)
+            if "endpoints" in scenarios:
+                results["endpoints"] = await bench_endpoints(
+                    args.cards, args.attempts, args.requests, args.concurrency, args.auth_latency
+                )
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of the above")
+    parser.add_argument("--pages", type=int, default=50, help="pages per synthetic PDF")
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--cards", type=int, default=10000, help="flashcards seeded for the endpoint user")
+    parser.add_argument("--attempts", type=int, default=10000, help="quiz attempts seeded for the endpoint user")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Anthropic stub latency, seconds")
+    parser.add_argument("--auth-latency", type=float, default=0.02, help="Supabase stub latency, seconds")
+    parser.add_argument("--batch-tokens", type=int, nargs="+", default=[50000, 2000],
+                        help="generation_batch_tokens values to compare")
+    parser.add_argument("--out", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print("\n".join(compare(report["results"], previous["results"])))
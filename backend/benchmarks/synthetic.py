@@ -0,0 +1,129 @@
+"""
+Synthetic data for benchmarks: lecture-like PDFs and seeded users.
+
+Everything is generated from a seed, so runs on different commits see the
+same inputs. Seeded users get a `bench-` id prefix and are removed by
+delete_user().
+"""
+
+import json
+import random
+from datetime import timedelta
+
+import fitz  # PyMuPDF
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import (
+    CollectionVersion,
+    DailyStat,
+    Document,
+    Flashcard,
+    Quiz,
+    QuizAttempt,
+    TopicStat,
+    new_id,
+    utcnow,
+)
+from app.services.bulk_insert import bulk_insert
+
+VOCABULARY = (
+    "algorithm analysis binary cache complexity data entropy function gradient hash index kernel latency "
+    "matrix network optimization protocol query recursion scheduling throughput vector memory process thread "
+    "theorem proof lemma definition example property structure system model equation variable constant"
+).split()
+TOPICS = [f"Topic {i}" for i in range(12)]
+QUESTIONS_PER_QUIZ = 10
+
+
+def lecture_text(words: int, rng: random.Random) -> str:
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 20))
+        sentence = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+
+def make_pdf(path: str, pages: int, words_per_page: int = 350, seed: int = 0) -> int:
+    """Write a `pages`-page PDF of lecture-like text to `path`; returns its size in bytes."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        text = f"Lecture {seed} — slide {number + 1}\n\n" + lecture_text(words_per_page, rng)
+        page.insert_textbox(fitz.Rect(48, 48, page.rect.width - 48, page.rect.height - 48), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+    with open(path, "rb") as f:
+        return len(f.read())
+
+
+def bench_user_id(n: int = 0) -> str:
+    return f"bench-{n}-{new_id()[:8]}"
+
+
+async def seed_user(db: AsyncSession, user_id: str, flashcards: int, attempts: int, seed: int = 0) -> dict:
+    """Give `user_id` one ready document, `flashcards` cards, and quizzes with `attempts` attempts between them."""
+    rng = random.Random(seed)
+    now = utcnow()
+    document_id = new_id()
+    db.add(Document(id=document_id, user_id=user_id, filename="bench.pdf", subject="Benchmarking", status="ready"))
+    await db.commit()
+
+    cards = (
+        (
+            new_id(), document_id, user_id, f"Question {i}?", f"Answer {i}", rng.choice(TOPICS),
+            round(rng.uniform(1.3, 3.0), 2), rng.randint(0, 60), rng.randint(0, 8),
+            now + timedelta(days=rng.randint(-10, 60)), now - timedelta(days=rng.randint(0, 365)),
+        )
+        for i in range(flashcards)
+    )
+    await bulk_insert(
+        db, Flashcard.__table__,
+        ("id", "document_id", "user_id", "front", "back", "topic", "ease_factor", "interval_days", "repetitions",
+         "next_review", "created_at"),
+        cards,
+    )
+
+    quiz_count = max(1, attempts // 10)
+    quizzes = []
+    for q in range(quiz_count):
+        questions = [
+            {"question": f"Q{q}.{i}?", "options": ["A", "B", "C", "D"], "correct_index": rng.randint(0, 3),
+             "explanation": "Because.", "topic": rng.choice(TOPICS)}
+            for i in range(QUESTIONS_PER_QUIZ)
+        ]
+        quizzes.append((new_id(), questions))
+    # JSON columns go through COPY as text
+    await bulk_insert(
+        db, Quiz.__table__, ("id", "document_id", "user_id", "title", "questions", "created_at"),
+        [
+            (quiz_id, document_id, user_id, f"Quiz {q}", json.dumps(questions), now - timedelta(days=q % 365))
+            for q, (quiz_id, questions) in enumerate(quizzes)
+        ],
+    )
+
+    def attempt_rows():
+        for _ in range(attempts):
+            quiz_id, questions = rng.choice(quizzes)
+            answers = [rng.randint(0, 3) for _ in questions]
+            score = sum(a == q["correct_index"] for a, q in zip(answers, questions))
+            created_at = now - timedelta(days=rng.randint(0, 90))
+            yield new_id(), quiz_id, user_id, json.dumps(answers), score, len(questions), created_at
+
+    await bulk_insert(
+        db, QuizAttempt.__table__, ("id", "quiz_id", "user_id", "answers", "score", "total", "created_at"),
+        attempt_rows(),
+    )
+    return {"document_id": document_id, "quiz_ids": [quiz_id for quiz_id, _ in quizzes]}
+
+
+async def delete_user(db: AsyncSession, user_id: str) -> None:
+    """Remove everything seeded for `user_id` (cards, quizzes and attempts cascade from the documents)."""
+    await db.execute(delete(Document).where(Document.user_id == user_id))
+    await db.execute(delete(TopicStat).where(TopicStat.user_id == user_id))
+    await db.execute(delete(DailyStat).where(DailyStat.user_id == user_id))
+    await db.execute(delete(CollectionVersion).where(CollectionVersion.user_id == user_id))
+    await db.commit()
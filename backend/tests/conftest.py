@@ -0,0 +1,22 @@
+import pytest
+import tiktoken
+
+from app.services import chunker
+
+# A few merges on top of the 256 single bytes: enough for multi-token words, and
+# multi-byte characters still split across tokens
+MERGES = [b"th", b"the", b" the", b"in", b"ing", b" a", b"er", b"an", b"on", b".\n", b"  "]
+PATTERN = r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
+
+
+@pytest.fixture
+def encoder(monkeypatch) -> tiktoken.Encoding:
+    """A small byte-level BPE encoder standing in for cl100k_base, which needs a download."""
+    ranks = {bytes([b]): b for b in range(256)}
+    for merge in MERGES:
+        ranks[merge] = len(ranks)
+    enc = tiktoken.Encoding("test", pat_str=PATTERN, mergeable_ranks=ranks, special_tokens={})
+    monkeypatch.setattr(chunker, "get_encoder", lambda: enc)
+    chunker.token_tables.cache_clear()
+    yield enc
+    chunker.token_tables.cache_clear()
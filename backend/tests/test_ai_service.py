@@ -0,0 +1,85 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ai_service
+
+CARDS = [{"front": f"Question {n}?", "back": f"Answer {{{n}}}"} for n in range(6)]
+
+
+def reply(text: str, stop_reason: str) -> SimpleNamespace:
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], stop_reason=stop_reason)
+
+
+@pytest.fixture
+def claude(monkeypatch):
+    """Replays scripted replies and records the messages each call was sent."""
+    calls, replies = [], []
+
+    async def create_message(kind, **kwargs):
+        calls.append(kwargs["messages"])
+        return replies.pop(0)
+
+    monkeypatch.setattr(ai_service, "create_message", create_message)
+    return SimpleNamespace(calls=calls, replies=replies)
+
+
+def complete(count: int):
+    return asyncio.run(ai_service._complete_objects("prompt", "flashcards", count))
+
+
+def test_complete_reply_needs_no_continuation(claude):
+    claude.replies.append(reply(json.dumps(CARDS), "end_turn"))
+    parser, objects = complete(6)
+    assert objects == CARDS
+    assert parser.closed
+    assert len(claude.calls) == 1
+
+
+def test_cut_off_reply_is_continued_and_merged(claude):
+    full = json.dumps(CARDS)
+    cut = full.index(json.dumps(CARDS[3])) + 10  # partway into the fourth card
+    claude.replies.append(reply(full[:cut], "max_tokens"))
+    resume = full.rindex("}", 0, cut) + 1
+    # The continuation starts right after the last complete card, so the cut-off one comes again in full
+    claude.replies.append(reply(full[resume:], "end_turn"))
+
+    parser, objects = complete(6)
+    assert objects == CARDS
+    assert parser.closed
+    assert claude.calls[1] == [
+        {"role": "user", "content": "prompt"},
+        {"role": "assistant", "content": full[:resume]},
+    ]
+
+
+def test_continuations_chain_from_the_full_reply(claude):
+    full = json.dumps(CARDS)
+    ends = [full.index(json.dumps(card)) + len(json.dumps(card)) for card in CARDS]
+    claude.replies.append(reply(full[:ends[1] + 5], "max_tokens"))
+    claude.replies.append(reply(full[ends[1]:ends[3] + 3], "max_tokens"))
+    claude.replies.append(reply(full[ends[3]:], "end_turn"))
+
+    _, objects = complete(6)
+    assert objects == CARDS
+    assert claude.calls[2][1] == {"role": "assistant", "content": full[:ends[3]]}
+
+
+def test_no_continuation_once_enough_objects(claude):
+    full = json.dumps(CARDS)
+    claude.replies.append(reply(full[:full.index(json.dumps(CARDS[4]))], "max_tokens"))
+    _, objects = complete(3)
+    assert objects == CARDS[:4]
+    assert len(claude.calls) == 1
+
+
+def test_gives_up_when_a_continuation_adds_nothing(claude):
+    full = json.dumps(CARDS)
+    resume = full.index(json.dumps(CARDS[1]))  # "[{card 0}, " — cut inside the second card
+    claude.replies.append(reply(full[:resume + 5], "max_tokens"))
+    claude.replies.append(reply('{"front": "never finish', "max_tokens"))
+    _, objects = complete(6)
+    assert objects == CARDS[:1]
+    assert len(claude.calls) == 2
@@ -0,0 +1,93 @@
+import pytest
+
+from app.services import chunker
+from app.services.chunker import SNAP_WINDOW, Chunk, iter_token_chunks
+
+PAGES = [
+    "Entropy measures disorder. The second law says it never decreases!\n",
+    "Slide 2 — naïve Bayes: P(A|B) = P(B|A)·P(A) / P(B). Why? Bayes' rule.\n",
+    "Ünïcödé spans: 日本語のテキスト, émojis 🎓📚, and ∑ᵢ xᵢ² ≥ 0.\n",
+    "",
+    "A short page.",
+    "Another sentence ends here. And another one follows it without a newline",
+    "Final slide: résumé of the lecture — thermodynamics, entropy, and the arrow of time.\n",
+]
+
+
+def decode_windows(enc, texts, chunk_size, overlap, snap=None) -> list[Chunk]:
+    """The chunker's reference behaviour: encode everything, snap by scanning tokens, decode each window."""
+    tokens, page_ends = [], []
+    for text in texts:
+        tokens.extend(enc.encode_ordinary(text))
+        page_ends.append(len(tokens))
+    raw = [enc.decode_single_token_bytes(token) for token in tokens]
+
+    def is_break(position: int) -> bool:
+        # A break after token position - 1
+        last, following = raw[position - 1], raw[position]
+        ends_sentence = last.rstrip(b" \t")[-1:] in (b".", b"!", b"?")
+        return last.endswith(b"\n") or (ends_sentence and following[:1].isspace())
+
+    def snapped(start: int, end: int) -> int:
+        lowest = max(start + overlap + 1, end - int((end - start) * SNAP_WINDOW))
+        breaks = [p for p in page_ends if lowest <= p < end]
+        if snap == "sentence" and end < len(tokens):
+            breaks += [p for p in range(lowest, end + 1) if is_break(p)][-1:]
+        return max(breaks) if breaks else end
+
+    def pages(start: int, end: int) -> tuple[int, int]:
+        last = max(start, end - 1)
+        return (
+            1 + sum(p <= start for p in page_ends),
+            1 + sum(p <= last for p in page_ends),
+        )
+
+    chunks, start = [], 0
+    while len(tokens) - start >= chunk_size:
+        end = start + chunk_size
+        if snap:
+            end = snapped(start, end)
+        chunks.append(Chunk(enc.decode(tokens[start:end]), *pages(start, end)))
+        start = end - overlap
+    if len(tokens) - start and (not chunks or len(tokens) - start > overlap):
+        chunks.append(Chunk(enc.decode(tokens[start:]), *pages(start, len(tokens))))
+    return chunks
+
+
+@pytest.mark.parametrize("chunk_size,overlap", [(7, 2), (16, 5), (40, 10), (500, 50)])
+@pytest.mark.parametrize("snap", [None, "sentence", "slide"])
+def test_matches_decode_per_window(encoder, chunk_size, overlap, snap):
+    assert list(iter_token_chunks(PAGES, chunk_size, overlap, snap)) == decode_windows(
+        encoder, PAGES, chunk_size, overlap, snap
+    )
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+@pytest.mark.parametrize("batch_pages", [1, 2, 64])
+def test_encode_blocks_do_not_change_unsnapped_chunks(encoder, monkeypatch, threads, batch_pages):
+    monkeypatch.setattr(chunker, "ENCODE_THREADS", threads)
+    monkeypatch.setattr(chunker, "ENCODE_BATCH_PAGES", batch_pages)
+    assert list(iter_token_chunks(PAGES * 3, 11, 3)) == decode_windows(encoder, PAGES * 3, 11, 3)
+
+
+def test_multibyte_characters_split_across_tokens(encoder):
+    text = "é🎓日" * 20
+    tokens = encoder.encode_ordinary(text)
+    assert len(tokens) == len(text.encode())  # every byte its own token, so windows cut characters
+    chunks = list(iter_token_chunks([text], 5, 2))
+    assert chunks == decode_windows(encoder, [text], 5, 2)
+    assert any("�" in chunk.content for chunk in chunks)
+
+
+def test_overlap_only_tail_is_not_emitted(encoder):
+    text = "abcdefghij"  # one token per byte: windows [0, 6) and [4, 10), then only the overlap is left
+    assert [c.content for c in iter_token_chunks([text], 6, 2)] == ["abcdef", "efghij"]
+
+
+def test_short_input_is_one_chunk(encoder):
+    assert list(iter_token_chunks(["Hi.", " There"], 500, 50)) == [Chunk("Hi. There", 1, 2)]
+
+
+def test_unknown_snap_mode(encoder):
+    with pytest.raises(ValueError):
+        list(iter_token_chunks(PAGES, 10, 2, "paragraph"))
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from app.services.json_stream import ObjectStream
+
+CARDS = [
+    {"front": "What is entropy?", "back": "A measure of disorder", "topic": "Thermodynamics"},
+    {"front": 'The "second law"', "back": "Entropy {never} decreases [in isolation]", "topic": "Laws"},
+    {"front": "Escapes \\ and \\\" and }{ ][", "back": "Unicode: é — 日本 🎓", "topic": None},
+]
+QUIZ = json.dumps({"title": "Quiz: \"Heat\" {and} [work]", "questions": CARDS}, ensure_ascii=False, indent=2)
+
+
+def feed_in_pieces(text: str, size: int) -> tuple[ObjectStream, list[dict]]:
+    parser, objects = ObjectStream(), []
+    for start in range(0, len(text), size):
+        objects.extend(parser.feed(text[start:start + size]))
+    return parser, objects
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 50, 10_000])
+def test_objects_split_across_deltas(size):
+    parser, objects = feed_in_pieces(json.dumps(CARDS), size)
+    assert objects == CARDS
+    assert parser.closed
+
+
+@pytest.mark.parametrize("size", [1, 5, 10_000])
+def test_quiz_title_and_questions(size):
+    parser, objects = feed_in_pieces(QUIZ, size)
+    assert objects == CARDS
+    assert parser.title == 'Quiz: "Heat" {and} [work]'
+
+
+def test_each_object_is_returned_when_its_brace_arrives():
+    text = json.dumps(CARDS)
+    first_end = text.index("}, {") + 1
+    parser = ObjectStream()
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [CARDS[0]]
+
+
+def test_escaped_quotes_and_braces_inside_strings():
+    text = r'[{"front": "a \"}\" b", "back": "{[\\"}, {"front": "]", "back": "x"}]'
+    assert ObjectStream().feed(text) == [{"front": 'a "}" b', "back": "{[\\"}, {"front": "]", "back": "x"}]
+
+
+def test_prose_and_nested_values():
+    text = 'Sure! Here you go:\n[{"front": "f", "back": "b", "tags": [1, {"x": [2]}]}]\nDone [not parsed]'
+    parser = ObjectStream()
+    assert parser.feed(text) == [{"front": "f", "back": "b", "tags": [1, {"x": [2]}]}]
+    assert parser.closed
+    assert parser.feed('[{"front": "later"}]') == []
+
+
+def test_truncated_last_object():
+    text = json.dumps(CARDS)
+    cut = text[:text.rindex("{") + 20]
+    parser, objects = feed_in_pieces(cut, 4)
+    assert objects == CARDS[:2]
+    assert not parser.closed
+    # Picking up from resume_point continues right after the last complete object
+    assert cut[:parser.resume_point].endswith("}")
+    assert json.loads(cut[:parser.resume_point] + "]") == CARDS[:2]
+
+
+def test_resume_point_before_any_object():
+    parser = ObjectStream()
+    assert parser.feed('{"title": "T", "questions": [{"question": "unfinish') == []
+    assert parser.resume_point is not None
+    assert parser.head.endswith("[")
+    assert parser.title == "T"
+
+
+def test_malformed_element_is_skipped():
+    assert ObjectStream().feed('[{"front": "a",}, {"front": "b"}]') == [{"front": "b"}]
@@ -0,0 +1,45 @@
+import pytest
+
+from app.services.revisions import KeptChunk, OldChunk, plan_revision
+
+
+def per_page(pages: int) -> list[tuple[int, int]]:
+    return [(page, page) for page in range(1, pages + 1)]
+
+
+# old pages, new pages (one letter per page hash), old chunk page ranges,
+# expected kept (old chunk number, new page range), spans, pages changed, pages removed
+CASES = {
+    "unchanged": ("abcd", "abcd", [(1, 2), (2, 3), (3, 4)], [(0, 1, 2), (1, 2, 3), (2, 3, 4)], [], 0, 0),
+    "page changed": ("abcde", "abXde", [(1, 2), (2, 3), (3, 4), (4, 5)], [(0, 1, 2), (3, 4, 5)], [(2, 4)], 1, 0),
+    "inserted at a chunk boundary": ("abcd", "abXcd", [(1, 2), (3, 4)], [(0, 1, 2), (1, 4, 5)], [(2, 4)], 1, 0),
+    "inserted inside a chunk": ("abcd", "abXcd", [(1, 2), (2, 3), (3, 4)], [(0, 1, 2), (2, 4, 5)], [(2, 4)], 1, 0),
+    "page removed": ("abcd", "abd", per_page(4), [(0, 1, 1), (1, 2, 2), (3, 3, 3)], [(2, 3)], 0, 1),
+    "appended": ("ab", "abc", [(1, 2)], [(0, 1, 2)], [(2, 3)], 1, 0),
+    "prepended": ("ab", "Xab", [(1, 2)], [(0, 2, 3)], [(1, 2)], 1, 0),
+    "truncated": ("abcd", "abc", [(1, 2), (3, 4)], [(0, 1, 2)], [(2, 3)], 0, 1),
+    "all changed": ("ab", "XY", [(1, 2)], [], [(1, 2)], 2, 0),
+    "all removed": ("ab", "", [(1, 2)], [], [], 0, 2),
+    "two separate edits": ("abcdef", "aXcdYf", per_page(6), [(0, 1, 1), (2, 3, 3), (3, 4, 4), (5, 6, 6)],
+                           [(1, 3), (4, 6)], 2, 0),
+    "seams merge": ("abcde", "aXcYe", per_page(5), [(0, 1, 1), (2, 3, 3), (4, 5, 5)], [(1, 5)], 2, 0),
+}
+
+
+@pytest.mark.parametrize("old,new,ranges,kept,spans,changed,removed", CASES.values(), ids=CASES.keys())
+def test_plan_revision(old, new, ranges, kept, spans, changed, removed):
+    chunks = [OldChunk(f"c{n}", n, start, end) for n, (start, end) in enumerate(ranges)]
+    # Chunk order comes from chunk_index, not from the order rows arrive in
+    plan = plan_revision(list(old), list(new), chunks[::-1])
+    assert plan.kept == [KeptChunk(f"c{n}", start, end) for n, start, end in kept]
+    assert plan.spans == spans
+    assert (plan.pages_changed, plan.pages_removed) == (changed, removed)
+
+
+def test_every_new_page_is_kept_or_rechunked():
+    old, new = list("abcdefgh"), list("abXcdeYYgh")
+    chunks = [OldChunk(f"c{n}", n, start, end) for n, (start, end) in enumerate([(1, 2), (3, 3), (4, 6), (6, 8)])]
+    plan = plan_revision(old, new, chunks)
+    covered = {page for c in plan.kept for page in range(c.page_start, c.page_end + 1)}
+    covered |= {page for start, end in plan.spans for page in range(start, end + 1)}
+    assert covered == set(range(1, len(new) + 1))
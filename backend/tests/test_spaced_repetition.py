@@ -0,0 +1,56 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from app.services.spaced_repetition import sm2, sm2_batch
+
+STATES = [
+    # (repetitions, ease_factor, interval_days)
+    (0, 2.5, 0),  # new card: 1 day on success
+    (1, 2.5, 1),  # second success: 6 days
+    (2, 2.5, 6),  # then interval * ease
+    (3, 1.3, 10),  # at the ease floor
+    (4, 1.36, 7),  # a failure pulls this below the floor
+    (5, 2.5, 5),  # 12.5 days: round half to even
+    (7, 2.7, 3),  # 8.1 days
+    (9, 3.1, 120),
+]
+
+
+@pytest.mark.parametrize("quality", range(6))
+@pytest.mark.parametrize("repetitions,ease_factor,interval_days", STATES)
+def test_batch_matches_scalar(quality, repetitions, ease_factor, interval_days):
+    expected = sm2(quality, repetitions, ease_factor, interval_days)
+    result = sm2_batch(np.array([quality]), np.array([repetitions]), np.array([ease_factor]), np.array([interval_days]))
+    assert result.repetitions[0] == expected.repetitions
+    assert result.interval_days[0] == expected.interval_days
+    assert result.ease_factor[0] == pytest.approx(expected.ease_factor)
+
+
+def test_whole_batch_matches_scalar_elementwise():
+    cases = [(q, *state) for q, state in itertools.product(range(6), STATES)]
+    quality, repetitions, ease, interval = (np.array(column) for column in zip(*cases))
+    result = sm2_batch(quality, repetitions, ease, interval)
+    for i, case in enumerate(cases):
+        expected = sm2(*case)
+        assert (result.repetitions[i], result.interval_days[i]) == (expected.repetitions, expected.interval_days)
+        assert result.ease_factor[i] == pytest.approx(expected.ease_factor)
+
+
+@pytest.mark.parametrize("quality", [0, 1, 2])
+def test_failure_resets_and_keeps_the_ease_floor(quality):
+    result = sm2_batch(np.array([quality]), np.array([6]), np.array([1.35]), np.array([40]))
+    assert (result.repetitions[0], result.interval_days[0]) == (0, 0)
+    assert result.ease_factor[0] == 1.3
+
+
+def test_empty_batch():
+    result = sm2_batch(np.array([]), np.array([]), np.array([]), np.array([]))
+    assert result.ease_factor.size == result.interval_days.size == result.repetitions.size == 0
+
+
+@pytest.mark.parametrize("quality", [-1, 6])
+def test_quality_out_of_range(quality):
+    with pytest.raises(ValueError):
+        sm2_batch(np.array([3, quality]), np.array([0, 0]), np.array([2.5, 2.5]), np.array([0, 0]))
@@ -18,4 +18,16 @@ api.interceptors.request.use(async (config) => {
   return config;
 });
 
+/** Fetch every page of a cursor-paginated list endpoint. */
+export async function getAllPages<T>(url: string, params: Record<string, unknown> = {}): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | undefined;
+  do {
+    const res = await api.get<T[]>(url, { params: { ...params, cursor, limit: 200 } });
+    items.push(...res.data);
+    cursor = res.headers["x-next-cursor"];
+  } while (cursor);
+  return items;
+}
+
 export default api;
\ No newline at end of file
@@ -1,35 +1,91 @@
+import { useEffect, useState } from "react";
 import { BarChart3 } from "lucide-react";
+import { LineChart, Line, XAxis, YAxis, Tooltip, ResponsiveContainer } from "recharts";
+import api from "../lib/api";
+import type { PerformanceOverTime, TopicPerformance } from "../types";
+
+interface AnalyticsData {
+  topics: TopicPerformance[];
+  over_time: PerformanceOverTime[];
+}
 
 export default function Analytics() {
-  // TODO: fetch real data from /api/analytics
-  // Example of how Recharts will be used:
-  //
-  // import { LineChart, Line, XAxis, YAxis, Tooltip, ResponsiveContainer } from "recharts";
-  // const data = [{ date: "Mon", accuracy: 65 }, { date: "Tue", accuracy: 72 }, ...];
-  //
-  // <ResponsiveContainer width="100%" height={300}>
-  //   <LineChart data={data}>
-  //     <XAxis dataKey="date" />
-  //     <YAxis />
-  //     <Tooltip />
-  //     <Line type="monotone" dataKey="accuracy" stroke="#6366f1" strokeWidth={2} />
-  //   </LineChart>
-  // </ResponsiveContainer>
+  const [data, setData] = useState<AnalyticsData | null>(null);
+  const [loading, setLoading] = useState(true);
+
+  useEffect(() => {
+    api
+      .get("/analytics")
+      .then((res) => setData(res.data))
+      .catch(() => setData(null))
+      .finally(() => setLoading(false));
+  }, []);
+
+  if (loading) {
+    return (
+      <div>
+        <h2 className="text-3xl font-bold mb-6">Performance Analytics</h2>
+        <p className="text-text-muted">Loading...</p>
+      </div>
+    );
+  }
+
+  if (!data || data.topics.length === 0) {
+    return (
+      <div>
+        <h2 className="text-3xl font-bold mb-6">Performance Analytics</h2>
+        <div className="bg-surface-light rounded-xl border border-surface-lighter p-12 text-center">
+          <BarChart3
+            size={48}
+            className="mx-auto mb-3 text-text-muted opacity-50"
+          />
+          <p className="text-text-muted">
+            Complete some flashcards or quizzes to see your performance data.
+          </p>
+          <p className="text-sm text-text-muted mt-2">
+            Accuracy over time · Topic breakdown · Confidence curves
+          </p>
+        </div>
+      </div>
+    );
+  }
 
   return (
     <div>
       <h2 className="text-3xl font-bold mb-6">Performance Analytics</h2>
-      <div className="bg-surface-light rounded-xl border border-surface-lighter p-12 text-center">
-        <BarChart3
-          size={48}
-          className="mx-auto mb-3 text-text-muted opacity-50"
-        />
-        <p className="text-text-muted">
-          Complete some flashcards or quizzes to see your performance data.
-        </p>
-        <p className="text-sm text-text-muted mt-2">
-          Accuracy over time · Topic breakdown · Confidence curves
-        </p>
+
+      <div className="bg-surface-light rounded-xl border border-surface-lighter p-5 mb-6">
+        <h3 className="text-lg font-semibold mb-4">Accuracy over time</h3>
+        <ResponsiveContainer width="100%" height={300}>
+          <LineChart data={data.over_time}>
+            <XAxis dataKey="date" />
+            <YAxis domain={[0, 100]} />
+            <Tooltip />
+            <Line type="monotone" dataKey="accuracy" stroke="#6366f1" strokeWidth={2} />
+          </LineChart>
+        </ResponsiveContainer>
+      </div>
+
+      <div className="bg-surface-light rounded-xl border border-surface-lighter p-5">
+        <h3 className="text-lg font-semibold mb-4">Weak spots</h3>
+        <div className="space-y-3">
+          {data.topics.map((t) => (
+            <div key={t.topic}>
+              <div className="flex justify-between text-sm mb-1">
+                <span>{t.topic}</span>
+                <span className="text-text-muted">
+                  {t.accuracy ?? 0}% · {t.correct}/{t.total}
+                </span>
+              </div>
+              <div className="h-2 bg-surface-lighter rounded-full">
+                <div
+                  className="h-2 bg-primary rounded-full"
+                  style={{ width: `${t.accuracy ?? 0}%` }}
+                />
+              </div>
+            </div>
+          ))}
+        </div>
       </div>
     </div>
   );
@@ -10,7 +10,7 @@ import {
   Loader2,
 } from "lucide-react";
 import type { Document } from "../types";
-import api from "../lib/api";
+import api, { getAllPages } from "../lib/api";
 
 export default function Dashboard() {
   const [documents, setDocuments] = useState<Document[]>([]);
@@ -18,9 +18,8 @@ export default function Dashboard() {
   const [generating, setGenerating] = useState<Record<string, string>>({});
 
   const fetchDocuments = () => {
-    api
-      .get("/documents")
-      .then((res) => setDocuments(res.data))
+    getAllPages<Document>("/documents")
+      .then(setDocuments)
       .catch(() => setDocuments([]))
       .finally(() => setLoading(false));
   };
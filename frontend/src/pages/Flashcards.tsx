@@ -7,8 +7,6 @@ interface Flashcard {
   front: string;
   back: string;
   topic: string | null;
-  ease_factor: number;
-  interval_days: number;
   next_review: string;
 }
 
@@ -21,7 +19,7 @@ export default function Flashcards() {
 
   useEffect(() => {
     api
-      .get("/flashcards")
+      .get("/flashcards/due", { params: { limit: 200 } })
       .then((res) => setCards(res.data))
       .catch(() => setCards([]))
       .finally(() => setLoading(false));
@@ -66,7 +64,7 @@ export default function Flashcards() {
         <h2 className="text-3xl font-bold mb-6">Flashcards</h2>
         <div className="bg-surface-light rounded-xl border border-surface-lighter p-12 text-center">
           <Layers size={48} className="mx-auto mb-3 text-text-muted opacity-50" />
-          <p className="text-text-muted">No flashcards yet.</p>
+          <p className="text-text-muted">No flashcards due for review.</p>
           <p className="text-sm text-text-muted mt-2">
             Go to the Dashboard and click "Generate Flashcards" on a document.
           </p>
@@ -1,6 +1,6 @@
 import { useEffect, useState } from "react";
 import { Brain, CheckCircle, XCircle, ArrowRight } from "lucide-react";
-import api from "../lib/api";
+import api, { getAllPages } from "../lib/api";
 
 interface QuizQuestion {
   question: string;
@@ -10,6 +10,13 @@ interface QuizQuestion {
   topic: string | null;
 }
 
+interface QuizSummary {
+  id: string;
+  title: string;
+  question_count: number;
+  created_at: string;
+}
+
 interface Quiz {
   id: string;
   title: string;
@@ -18,35 +25,38 @@ interface Quiz {
 }
 
 export default function QuizPage() {
-  const [quizzes, setQuizzes] = useState<Quiz[]>([]);
+  const [quizzes, setQuizzes] = useState<QuizSummary[]>([]);
   const [loading, setLoading] = useState(true);
   const [activeQuiz, setActiveQuiz] = useState<Quiz | null>(null);
   const [currentQ, setCurrentQ] = useState(0);
   const [selectedAnswer, setSelectedAnswer] = useState<number | null>(null);
   const [confirmed, setConfirmed] = useState(false);
   const [score, setScore] = useState(0);
+  const [answers, setAnswers] = useState<number[]>([]);
   const [finished, setFinished] = useState(false);
 
   useEffect(() => {
-    api
-      .get("/quizzes")
-      .then((res) => setQuizzes(res.data))
+    getAllPages<QuizSummary>("/quizzes")
+      .then(setQuizzes)
       .catch(() => setQuizzes([]))
       .finally(() => setLoading(false));
   }, []);
 
-  const startQuiz = (quiz: Quiz) => {
+  const startQuiz = async (quizId: string) => {
+    const { data: quiz } = await api.get<Quiz>(`/quizzes/${quizId}`);
     setActiveQuiz(quiz);
     setCurrentQ(0);
     setSelectedAnswer(null);
     setConfirmed(false);
     setScore(0);
+    setAnswers([]);
     setFinished(false);
   };
 
   const confirm = () => {
     if (selectedAnswer === null || !activeQuiz) return;
     setConfirmed(true);
+    setAnswers((a) => [...a, selectedAnswer]);
     if (selectedAnswer === activeQuiz.questions[currentQ].correct_index) {
       setScore((s) => s + 1);
     }
@@ -63,7 +73,7 @@ export default function QuizPage() {
       // Submit attempt
       api
         .post(`/quizzes/${activeQuiz.id}/attempt`, {
-          answers: [],
+          answers,
           score: score + (selectedAnswer === activeQuiz.questions[currentQ].correct_index ? 1 : 0),
           total: activeQuiz.questions.length,
         })
@@ -109,11 +119,11 @@ export default function QuizPage() {
               <div>
                 <p className="font-medium">{quiz.title}</p>
                 <p className="text-sm text-text-muted">
-                  {quiz.questions.length} questions
+                  {quiz.question_count} questions
                 </p>
               </div>
               <button
-                onClick={() => startQuiz(quiz)}
+                onClick={() => startQuiz(quiz.id)}
                 className="bg-primary hover:bg-primary-hover text-white text-sm px-4 py-2 rounded-lg transition-colors"
               >
                 Start Quiz
@@ -139,7 +149,7 @@ export default function QuizPage() {
           </p>
           <div className="flex justify-center gap-3">
             <button
-              onClick={() => startQuiz(activeQuiz)}
+              onClick={() => startQuiz(activeQuiz.id)}
               className="bg-primary hover:bg-primary-hover text-white text-sm px-4 py-2 rounded-lg transition-colors"
             >
               Retry
@@ -86,11 +86,14 @@ export interface TopicPerformance {
   topic: string;
   correct: number;
   total: number;
-  accuracy: number;
+  accuracy: number | null;
+  quiz_accuracy: number | null;
+  card_accuracy: number | null;
 }
 
 export interface PerformanceOverTime {
   date: string;
-  accuracy: number;
+  accuracy: number | null;
   reviews: number;
+  questions: number;
 }